@@ -7,6 +7,7 @@ class AccountsConfig(AppConfig):
     name = 'accounts'
 
     def ready(self):
+        from . import signals  # noqa: F401
         from django.contrib.auth.models import User
         from .models import UserProfile
 
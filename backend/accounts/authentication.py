@@ -1,12 +1,94 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication as SimpleJWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.conf import settings
 import jwt
 
+from estudantes.models import Estudante
+from .permissoes import invalidar_permissoes, permissoes_utilizador
+from .tokens import TokenPre2FA
+
 User = get_user_model()
 
+# Campos do utilizador guardados na cache; a password fica diferida (só é lida
+# da base de dados se for acedida) para não ser copiada para a cache.
+CAMPOS_UTILIZADOR = ('id', 'email', 'username', 'is_active', 'is_staff', 'is_superuser', 'has_2fa', 'last_login')
+
+
+def chave_utilizador(user_id):
+    return f'utilizador:{user_id}'
+
+
+def invalidar_utilizador(user_id):
+    cache.delete(chave_utilizador(user_id))
+    invalidar_permissoes(user_id)
+
+
+def _instantanea(user_id):
+    utilizador = User.objects.select_related('estudante').prefetch_related('groups').get(pk=user_id)
+    estudante = getattr(utilizador, 'estudante', None)
+    return {
+        'campos': {campo: getattr(utilizador, campo) for campo in CAMPOS_UTILIZADOR},
+        'grupos': [(grupo.id, grupo.name) for grupo in utilizador.groups.all()],
+        'estudante': (estudante.id, estudante.Nome) if estudante else None,
+    }
+
+
+def obter_utilizador(user_id):
+    """
+    Devolve o utilizador ``user_id`` a partir de uma cópia em cache (válida
+    durante ``AUTH_CACHE_TIMEOUT`` segundos), sem consultar a base de dados.
+
+    A instância é um ``CustomUser`` normal com os grupos e o estudante já
+    carregados. A cópia é apagada quando o utilizador, os seus grupos ou o
+    seu estudante mudam (accounts.signals).
+    """
+    chave = chave_utilizador(user_id)
+    instantanea = cache.get(chave)
+    if instantanea is None:
+        instantanea = _instantanea(user_id)
+        cache.set(chave, instantanea, settings.AUTH_CACHE_TIMEOUT)
+
+    # from_db espera os valores pela ordem dos campos do modelo.
+    campos = [f.attname for f in User._meta.concrete_fields if f.attname in instantanea['campos']]
+    utilizador = User.from_db('default', campos, [instantanea['campos'][campo] for campo in campos])
+    grupos = utilizador.groups.all()
+    grupos._result_cache = [Group(id=grupo_id, name=nome) for grupo_id, nome in instantanea['grupos']]
+    grupos._prefetch_done = True
+    utilizador._prefetched_objects_cache = {'groups': grupos}
+    if instantanea['estudante']:
+        estudante_id, nome = instantanea['estudante']
+        utilizador._state.fields_cache['estudante'] = Estudante(id=estudante_id, Nome=nome, user_id=utilizador.id)
+    else:
+        utilizador._state.fields_cache['estudante'] = None
+    return utilizador
+
+
+class CachedJWTAuthentication(SimpleJWTAuthentication):
+    """
+    JWTAuthentication do simplejwt que obtém o utilizador da cache
+    (``obter_utilizador``) em vez de fazer uma query por pedido.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise AuthenticationFailed('Token sem identificação de utilizador')
+        try:
+            user = obter_utilizador(user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('Utilizador não encontrado', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('Utilizador inativo', code='user_inactive')
+        return user
+
 class JWTAuthentication(BaseAuthentication):
     """
     Autenticação baseada em JWT extraído do header Authorization.
@@ -20,7 +102,7 @@ class JWTAuthentication(BaseAuthentication):
         try:
             token = auth_header.split(' ')[1]
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            user = User.objects.get(id=payload['user_id'])
+            user = obter_utilizador(payload['user_id'])
             return (user, token)
         except (jwt.ExpiredSignatureError, jwt.DecodeError, User.DoesNotExist):
             raise AuthenticationFailed('Token inválido ou expirado')
@@ -45,3 +127,35 @@ class EmailBackend(ModelBackend):
             return user
 
         return None
+
+
+class Pre2FAAuthentication(CachedJWTAuthentication):
+    """
+    Aceita também o token pre-2FA; usada apenas nas views de ativação do 2FA.
+    """
+    def get_validated_token(self, raw_token):
+        try:
+            return TokenPre2FA(raw_token)
+        except TokenError:
+            return super().get_validated_token(raw_token)
+
+
+class PermissoesEmCacheBackend(ModelBackend):
+    """
+    ModelBackend cujas permissões vêm do conjunto compilado em cache
+    (accounts.permissoes), que inclui ``UserProfile.permissoes_detalhadas``.
+    ``has_perm`` e ``DjangoModelPermissions`` deixam de consultar a base de dados.
+    """
+    def _calcular(self, user_obj):
+        return super().get_all_permissions(user_obj)
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_permissoes_cache'):
+            user_obj._permissoes_cache = permissoes_utilizador(user_obj, self._calcular)
+        return user_obj._permissoes_cache
+
+    async def aget_all_permissions(self, user_obj, obj=None):
+        # Usado por user.ahas_perm() nas views assíncronas.
+        return await sync_to_async(self.get_all_permissions)(user_obj, obj)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from accounts.views import login_user, login_user_async
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede logins por segundo (e por core) na view síncrona, com um número fixo de '
+        'workers, e na view assíncrona com o executor de hashing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=200, help='Número de logins por modo')
+        parser.add_argument('--workers', type=int, default=4, help='Threads que simulam os workers WSGI (modo síncrono)')
+        parser.add_argument('--concorrencia', type=int, default=100, help='Pedidos simultâneos no modo assíncrono')
+
+    def handle(self, *args, **options):
+        password = secrets.token_urlsafe(16)
+        user = User.objects.create_user(email='benchmark-login@exemplo.invalid', password=password)
+        corpo = json.dumps({'email': user.email, 'password': password})
+        fabrica = RequestFactory()
+
+        def pedido():
+            return fabrica.post('/api/accounts/login/', corpo, content_type='application/json')
+
+        try:
+            self.relatorio('síncrono', *self.medir_sync(pedido, options['pedidos'], options['workers']))
+            self.relatorio('assíncrono', *asyncio.run(self.medir_async(pedido, options['pedidos'], options['concorrencia'])))
+        finally:
+            user.delete()
+
+    def medir_sync(self, pedido, total, workers):
+        view = login_user.as_view()
+
+        def login(_):
+            try:
+                return view(pedido()).status_code
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            codigos = list(executor.map(login, range(total)))
+        return codigos, time.perf_counter() - inicio
+
+    async def medir_async(self, pedido, total, concorrencia):
+        view = login_user_async.as_view()
+        limite = asyncio.Semaphore(concorrencia)
+
+        async def login():
+            async with limite:
+                return (await view(pedido())).status_code
+
+        inicio = time.perf_counter()
+        codigos = await asyncio.gather(*(login() for _ in range(total)))
+        return codigos, time.perf_counter() - inicio
+
+    def relatorio(self, modo, codigos, duracao):
+        cores = os.cpu_count() or 1
+        ok = codigos.count(200)
+        self.stdout.write(
+            f'{modo:>10}: {len(codigos)} pedidos, {ok} ok, {codigos.count(503)} x 503, '
+            f'{duracao:.2f}s, {ok / duracao:.1f} logins/s, {ok / duracao / cores:.1f} logins/s/core ({cores} cores)'
+        )
@@ -0,0 +1,80 @@
+"""
+Conjunto compilado de permissões de cada utilizador, guardado na cache.
+
+Junta as permissões diretas do utilizador, as dos seus grupos e as que
+resultam de ``UserProfile.permissoes_detalhadas``. A entrada de um utilizador
+é apagada quando os seus grupos, permissões ou perfil mudam; as alterações às
+permissões de um grupo mudam a geração, o que invalida todas as entradas.
+
+A invalidação só chega aos outros processos com uma cache partilhada
+(``CACHE_BACKEND``); com a cache por processo, cada entrada expira ao fim de
+``PERMISSOES_CACHE_TIMEOUT`` segundos, o atraso máximo com que uma permissão
+retirada deixa de valer nos outros processos.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+ACOES = ('view', 'add', 'change', 'delete')
+
+
+def _todas(app_label, *modelos):
+    return {f'{app_label}.{acao}_{modelo}' for modelo in modelos for acao in ACOES}
+
+
+# Permissões detalhadas escolhidas na gestão de utilizadores do frontend.
+# Valores no formato 'app_label.codename' são aceites diretamente.
+PERMISSOES_DETALHADAS = {
+    'gerir_utilizadores': _todas('accounts', 'customuser', 'userprofile'),
+    'gerir_candidaturas': _todas('candidaturas', 'candidatura'),
+    'visualizar_candidaturas': {'candidaturas.view_candidatura'},
+    'gerir_residentes': _todas('core', 'residente'),
+    'gerir_edificios': _todas('core', 'edificio', 'quarto', 'cama', 'residencia'),
+}
+
+CHAVE_GERACAO = 'permissoes:geracao'
+
+
+def _geracao():
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        geracao = uuid.uuid4().hex
+        cache.add(CHAVE_GERACAO, geracao, None)
+        geracao = cache.get(CHAVE_GERACAO, geracao)
+    return geracao
+
+
+def _chave(user_id):
+    return f'permissoes:{_geracao()}:{user_id}'
+
+
+def permissoes_detalhadas(nomes):
+    permissoes = set()
+    for nome in nomes or ():
+        permissoes |= PERMISSOES_DETALHADAS.get(nome, {nome} if '.' in nome else set())
+    return permissoes
+
+
+def permissoes_utilizador(user, calcular):
+    """
+    Devolve o conjunto de permissões de ``user``. Se não estiver na cache é
+    obtido com ``calcular(user)`` (permissões de modelo) e juntam-se as do perfil.
+    """
+    chave = _chave(user.pk)
+    permissoes = cache.get(chave)
+    if permissoes is None:
+        detalhadas = UserProfile.objects.filter(user_id=user.pk).values_list('permissoes_detalhadas', flat=True).first()
+        permissoes = frozenset(calcular(user) | permissoes_detalhadas(detalhadas))
+        cache.set(chave, permissoes, settings.PERMISSOES_CACHE_TIMEOUT)
+    return permissoes
+
+
+def invalidar_permissoes(user_id):
+    cache.delete(_chave(user_id))
+
+
+def invalidar_todas_permissoes():
+    cache.set(CHAVE_GERACAO, uuid.uuid4().hex, None)
@@ -0,0 +1,76 @@
+"""
+QR codes de ativação do 2FA, guardados na cache por dispositivo TOTP.
+
+A chave inclui um hash do ``config_url`` do dispositivo (que contém o segredo),
+pelo que uma rotação da chave TOTP gera uma chave nova e a imagem antiga deixa
+de ser usada. Numa falha de cache a imagem é renderizada no executor 'qrcode'
+(core.executores), em memória, sem escrever ficheiros.
+
+O executor limita o CPU gasto e o número de renderizações à espera, mas na
+view síncrona (``qrcode_dispositivo``) o worker do pedido fica à espera do
+resultado, até ``QRCODE_TIMEOUT_RENDERIZACAO`` segundos. Só a variante
+assíncrona (``qrcode_dispositivo_async``, servida por backend.asgi) liberta o
+worker durante a renderização.
+"""
+import asyncio
+import base64
+import hashlib
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+from core.executores import executor
+
+FORMATOS = ('png', 'svg')
+
+
+def chave_qrcode(device, formato):
+    resumo = hashlib.sha256(device.config_url.encode()).hexdigest()[:32]
+    return f'qrcode:{device.pk}:{formato}:{resumo}'
+
+
+def renderizar(config_url, formato):
+    """
+    Devolve o PNG em base64 ou o SVG como texto.
+    """
+    if formato == 'svg':
+        return qrcode.make(config_url, image_factory=qrcode.image.svg.SvgPathImage).to_string().decode()
+    buffered = BytesIO()
+    qrcode.make(config_url).save(buffered)
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
+def qrcode_dispositivo(device, formato='png'):
+    """
+    Devolve o QR code do dispositivo no ``formato`` pedido. Pode levantar
+    ``ExecutorSaturado`` quando há demasiadas renderizações em curso, ou
+    ``TimeoutError`` se a renderização demorar demasiado. Numa falha de cache
+    bloqueia a thread que chama até a imagem estar pronta.
+    """
+    chave = chave_qrcode(device, formato)
+    imagem = cache.get(chave)
+    if imagem is None:
+        imagem = executor('qrcode').executar(
+            renderizar, device.config_url, formato, timeout=settings.QRCODE_TIMEOUT_RENDERIZACAO,
+        )
+        cache.set(chave, imagem, settings.QRCODE_CACHE_TIMEOUT)
+    return imagem
+
+
+async def qrcode_dispositivo_async(device, formato='png'):
+    """
+    Como ``qrcode_dispositivo``, mas espera pela renderização sem ocupar o
+    worker. ``device.user`` já tem de estar carregado (o ``config_url`` usa-o).
+    """
+    chave = chave_qrcode(device, formato)
+    imagem = await cache.aget(chave)
+    if imagem is None:
+        imagem = await asyncio.wait_for(
+            executor('qrcode').executar_async(renderizar, device.config_url, formato),
+            settings.QRCODE_TIMEOUT_RENDERIZACAO,
+        )
+        await cache.aset(chave, imagem, settings.QRCODE_CACHE_TIMEOUT)
+    return imagem
@@ -0,0 +1,38 @@
+"""
+Verificação e hashing de passwords no executor 'hashing' (core.executores),
+usados pelas views assíncronas de login e registo. O hashing não ocupa o
+event loop e, com o executor saturado, levanta ``ExecutorSaturado``.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+
+from core.executores import executor
+
+User = get_user_model()
+
+
+async def gerar_hash(password):
+    return await executor('hashing').executar_async(make_password, password)
+
+
+async def autenticar(email, password):
+    """
+    Equivalente assíncrono de ``authenticate(email=..., password=...)``.
+    Devolve o utilizador ativo ou ``None``.
+    """
+    user = await User.objects.filter(email=email).afirst()
+    if user is None:
+        # Mesmo custo que uma password errada, como no ModelBackend, para não
+        # revelar pelo tempo de resposta se o e-mail existe.
+        await gerar_hash(password)
+        return None
+
+    desatualizada = []
+    valida = await executor('hashing').executar_async(check_password, password, user.password, desatualizada.append)
+    if not valida or not user.is_active:
+        return None
+    if desatualizada:
+        # Hash com algoritmo ou iterações antigas: atualiza-o, como check_password faz.
+        user.password = await gerar_hash(password)
+        await user.asave(update_fields=['password'])
+    return user
@@ -42,8 +42,8 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        # Removido 'username' aqui também
-        fields = ['email', 'first_name', 'last_name', 'password', 'password2']
+        # Removido 'username' aqui também; o CustomUser não tem first_name/last_name
+        fields = ['email', 'password', 'password2']
 
     def validate(self, data):
         PASSWORD_FIELD_KEY = 'password'
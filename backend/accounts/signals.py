@@ -0,0 +1,78 @@
+"""
+Invalidação da cópia em cache do utilizador autenticado
+(accounts.authentication.obter_utilizador) e das suas permissões
+(accounts.permissoes).
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from estudantes.models import Estudante
+from .authentication import invalidar_utilizador
+from .models import UserProfile
+from .permissoes import invalidar_todas_permissoes
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def utilizador_alterado(sender, instance, **kwargs):
+    invalidar_utilizador(instance.pk)
+
+
+def _invalidar_membros(grupo):
+    for user_id in User.objects.filter(groups=grupo).values_list('id', flat=True):
+        invalidar_utilizador(user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_alterados(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidar_utilizador(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): depois do clear os membros já não são conhecidos.
+        _invalidar_membros(instance)
+    elif action.startswith('post_') and pk_set:
+        # group.user_set.add(...): instance é o grupo, pk_set os utilizadores.
+        for user_id in pk_set:
+            invalidar_utilizador(user_id)
+
+
+@receiver(pre_delete, sender=Group)
+def grupo_apagado(sender, instance, **kwargs):
+    # As ligações utilizador-grupo são apagadas em cascata, sem m2m_changed.
+    _invalidar_membros(instance)
+    invalidar_todas_permissoes()
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def permissoes_utilizador_alteradas(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidar_utilizador(instance.pk)
+    else:
+        invalidar_todas_permissoes()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permissoes_grupo_alteradas(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidar_todas_permissoes()
+
+
+@receiver(post_delete, sender=Permission)
+def permissao_apagada(sender, **kwargs):
+    invalidar_todas_permissoes()
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def perfil_alterado(sender, instance, **kwargs):
+    invalidar_utilizador(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Estudante)
+def estudante_alterado(sender, instance, **kwargs):
+    invalidar_utilizador(instance.user_id)
@@ -1,3 +1,287 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django_otp.oath import totp
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from rest_framework.test import APIClient
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+
+from estudantes.models import Estudante
+from core.executores import ExecutorSaturado
+from . import permissoes, qrcodes
+from .authentication import CachedJWTAuthentication, obter_utilizador
+from .models import CustomUser, UserProfile
+from .tokens import TokenPre2FA
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='ana@unicv.cv', password='segredo123')
+        self.grupo = Group.objects.create(name='Funcionários')
+        self.user.groups.add(self.grupo)
+        self.estudante = Estudante.objects.create(user=self.user, Nome='Ana Tavares')
+        self.pedido = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def autenticar(self):
+        return CachedJWTAuthentication().authenticate(self.pedido)[0]
+
+    def test_utilizador_vem_da_cache(self):
+        self.autenticar()
+        with self.assertNumQueries(0):
+            user = self.autenticar()
+            self.assertEqual((user.pk, user.email, user.is_active), (self.user.pk, 'ana@unicv.cv', True))
+            self.assertEqual([g.name for g in user.groups.all()], ['Funcionários'])
+            self.assertEqual(user.estudante.id, self.estudante.id)
+        # A password não é guardada na cache; é lida só quando acedida.
+        self.assertTrue(user.check_password('segredo123'))
+
+    def test_desativar_revoga_o_acesso(self):
+        self.autenticar()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar()
+
+    def test_alteracoes_de_grupos_e_estudante(self):
+        self.autenticar()
+        outro = Group.objects.create(name='Administradores')
+        outro.user_set.add(self.user)
+        self.assertEqual({g.name for g in self.autenticar().groups.all()}, {'Funcionários', 'Administradores'})
+
+        self.grupo.delete()
+        self.assertEqual([g.name for g in self.autenticar().groups.all()], ['Administradores'])
+
+        self.estudante.delete()
+        self.assertFalse(hasattr(self.autenticar(), 'estudante'))
+
+
+class PermissoesEmCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='rui@unicv.cv', password='segredo123')
+        self.grupo = Group.objects.create(name='Funcionários')
+        self.grupo.permissions.add(Permission.objects.get(codename='view_cama'))
+        self.user.groups.add(self.grupo)
+        UserProfile.objects.create(user=self.user, permissoes_detalhadas=['visualizar_candidaturas'])
+
+    def test_permissoes_compiladas_sem_queries(self):
+        obter_utilizador(self.user.pk).has_perm('core.view_cama')
+        with self.assertNumQueries(0):
+            user = obter_utilizador(self.user.pk)
+            self.assertTrue(user.has_perm('core.view_cama'))
+            self.assertTrue(user.has_perm('candidaturas.view_candidatura'))
+            self.assertFalse(user.has_perm('core.change_cama'))
+
+    @override_settings(PERMISSOES_CACHE_TIMEOUT=30)
+    def test_entradas_expiram(self):
+        # Uma alteração noutro processo (cache por processo) não apaga a
+        # entrada deste, mas esta expira ao fim de PERMISSOES_CACHE_TIMEOUT.
+        chamadas = []
+
+        def calcular(user):
+            chamadas.append(user.pk)
+            return set()
+
+        permissoes.permissoes_utilizador(self.user, calcular)
+        agora = time.time()
+        with mock.patch('time.time', return_value=agora + 29):
+            permissoes.permissoes_utilizador(self.user, calcular)
+        with mock.patch('time.time', return_value=agora + 31):
+            permissoes.permissoes_utilizador(self.user, calcular)
+        self.assertEqual(len(chamadas), 2)
+
+    def test_invalidacao(self):
+        self.assertFalse(obter_utilizador(self.user.pk).has_perm('core.change_cama'))
+        self.grupo.permissions.add(Permission.objects.get(codename='change_cama'))
+        self.assertTrue(obter_utilizador(self.user.pk).has_perm('core.change_cama'))
+
+        self.user.groups.remove(self.grupo)
+        self.assertFalse(obter_utilizador(self.user.pk).has_perm('core.view_cama'))
+
+        perfil = self.user.profile
+        perfil.permissoes_detalhadas = ['gerir_residentes']
+        perfil.save()
+        user = obter_utilizador(self.user.pk)
+        self.assertTrue(user.has_perm('core.delete_residente'))
+        self.assertFalse(user.has_perm('candidaturas.view_candidatura'))
+
+    def test_relatorio_sem_queries(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        url = reverse('relatorio_camas')
+        self.assertEqual(client.get(url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(url).status_code, 200)
+
+
+class Login2FATests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='ana@unicv.cv', password='segredo123')
+        self.user.groups.add(Group.objects.create(name='Estudantes'))
+        self.client = APIClient()
+
+    def test_fluxo_login_2fa(self):
+        resposta = self.client.post(reverse('login'), {'email': 'ana@unicv.cv', 'password': 'segredo123'})
+        self.assertTrue(resposta.data['requires_2fa'])
+        self.assertNotIn('refresh_token', resposta.data)
+        temporario = resposta.data['access_token']
+        self.assertEqual(OutstandingToken.objects.count(), 0)
+
+        # O token pre-2FA não dá acesso às restantes views...
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {temporario}')
+        self.assertEqual(self.client.get(reverse('user-detail', args=[self.user.pk])).status_code, 401)
+        # ...mas permite ativar o 2FA.
+        self.assertEqual(self.client.post(reverse('generate-2fa')).status_code, 200)
+
+        device = TOTPDevice.objects.get(user=self.user)
+        codigo = totp(device.bin_key, device.step, device.t0, device.digits, device.drift)
+        resposta = self.client.post(reverse('verify-2fa'), {'otp_token': f'{codigo:06d}'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(AccessToken(resposta.data['access'])['groups'], ['Estudantes'])
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(self.client.post(reverse('verify-2fa'), {'otp_token': '000000'}).status_code, 400)
+
+    def test_dispositivo_so_confirmado_com_codigo_valido(self):
+        temporario = self.client.post(reverse('login'), {'email': 'ana@unicv.cv', 'password': 'segredo123'}).data['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {temporario}')
+        self.client.post(reverse('generate-2fa'))
+        self.assertFalse(TOTPDevice.objects.get(user=self.user).confirmed)
+        self.assertEqual(self.client.post(reverse('verify-2fa'), {'otp_token': '000000'}).status_code, 400)
+        self.assertFalse(TOTPDevice.objects.get(user=self.user).confirmed)
+
+    def test_pre_2fa_nao_devolve_segredo_de_dispositivo_confirmado(self):
+        TOTPDevice.objects.create(user=self.user, name='default', confirmed=True)
+        temporario = self.client.post(reverse('login'), {'email': 'ana@unicv.cv', 'password': 'segredo123'}).data['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {temporario}')
+        resposta = self.client.post(reverse('generate-2fa'))
+        self.assertEqual(resposta.status_code, 409)
+        self.assertNotIn('otp_uri', resposta.data)
+        self.assertEqual(TOTPDevice.objects.filter(user=self.user).count(), 1)
+
+    def test_regresso_com_2fa_ativo(self):
+        # Fluxo do frontend (TwoFactorVerification): 409 no QR code, só o código.
+        device = TOTPDevice.objects.create(user=self.user, name='default', confirmed=True)
+        temporario = self.client.post(reverse('login'), {'email': 'ana@unicv.cv', 'password': 'segredo123'}).data['access_token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {temporario}')
+        self.assertEqual(self.client.post(reverse('generate-2fa')).status_code, 409)
+        codigo = totp(device.bin_key, device.step, device.t0, device.digits, device.drift)
+        self.assertEqual(self.client.post(reverse('verify-2fa'), {'otp_token': f'{codigo:06d}'}).status_code, 200)
+
+    def test_token_normal_nao_substitui_pre_2fa(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.assertEqual(self.client.post(reverse('verify-2fa'), {'otp_token': '123456'}).status_code, 401)
+
+
+class QRCode2FATests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='ana@unicv.cv', password='segredo123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_qrcode_em_cache_por_chave_do_dispositivo(self):
+        url = reverse('generate-2fa')
+        with mock.patch.object(qrcodes, 'renderizar', wraps=qrcodes.renderizar) as renderizar:
+            primeiro = self.client.post(url).data['qr_code_base64']
+            self.assertEqual(self.client.post(url).data['qr_code_base64'], primeiro)
+            self.assertEqual(renderizar.call_count, 1)
+
+            device = TOTPDevice.objects.get(user=self.user)
+            device.key = 'aa' * 20
+            device.save()
+            self.assertNotEqual(self.client.post(url).data['qr_code_base64'], primeiro)
+            self.assertEqual(renderizar.call_count, 2)
+
+    def test_qrcode_svg(self):
+        resposta = self.client.post(reverse('generate-2fa') + '?formato=svg')
+        self.assertIn('<svg', resposta.data['qr_code_svg'])
+        self.assertEqual(self.client.post(reverse('generate-2fa') + '?formato=gif').status_code, 400)
+
+    def test_executor_saturado(self):
+        with mock.patch.object(qrcodes, 'executor') as executor:
+            executor.return_value.executar.side_effect = ExecutorSaturado
+            resposta = self.client.post(reverse('generate-2fa'))
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta['Retry-After'], '2')
+
+
+class QRCode2FAAssincronoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='ana@unicv.cv', password='segredo123')
+        self.cabecalho = {'headers': {'Authorization': f'Bearer {TokenPre2FA.for_user(self.user)}'}}
+
+    async def test_qrcode_assincrono(self):
+        url = reverse('generate-2fa-async')
+        self.assertEqual((await self.async_client.post(url)).status_code, 401)
+        resposta = await self.async_client.post(url, **self.cabecalho)
+        self.assertEqual(resposta.status_code, 200)
+        device = await TOTPDevice.objects.select_related('user').aget(user=self.user)
+        self.assertFalse(device.confirmed)
+        self.assertEqual(resposta.json()['otp_uri'], device.config_url)
+        self.assertEqual(resposta.json()['qr_code_base64'], cache.get(qrcodes.chave_qrcode(device, 'png')))
+        resposta = await self.async_client.post(url + '?formato=svg', **self.cabecalho)
+        self.assertIn('<svg', resposta.json()['qr_code_svg'])
+
+    async def test_dispositivo_confirmado(self):
+        await TOTPDevice.objects.acreate(user=self.user, name='default', confirmed=True)
+        resposta = await self.async_client.post(reverse('generate-2fa-async'), **self.cabecalho)
+        self.assertEqual(resposta.status_code, 409)
+        self.assertNotIn('otp_uri', resposta.json())
+
+    async def test_executor_saturado(self):
+        with mock.patch.object(qrcodes, 'executor') as executor:
+            executor.return_value.executar_async.side_effect = ExecutorSaturado
+            resposta = await self.async_client.post(reverse('generate-2fa-async'), **self.cabecalho)
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta['Retry-After'], '2')
+
+
+class LoginAssincronoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        CustomUser.objects.create_user(email='ana@unicv.cv', password='segredo123')
+
+    async def test_login_assincrono(self):
+        url = reverse('login-async')
+        resposta = await self.async_client.post(url, {'email': 'ana@unicv.cv', 'password': 'segredo123'}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(AccessToken(resposta.json()['access_token'], verify=False)['token_type'], 'pre_2fa')
+
+        resposta = await self.async_client.post(url, {'email': 'ana@unicv.cv', 'password': 'errada123'}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 401)
+        resposta = await self.async_client.post(url, {'email': 'rui@unicv.cv', 'password': 'segredo123'}, content_type='application/json')
+        self.assertEqual(resposta.status_code, 401)
+
+    async def test_executor_saturado(self):
+        with mock.patch('accounts.senhas.executor') as executor:
+            executor.return_value.executar_async.side_effect = ExecutorSaturado
+            resposta = await self.async_client.post(
+                reverse('login-async'), {'email': 'ana@unicv.cv', 'password': 'segredo123'}, content_type='application/json',
+            )
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta['Retry-After'], '1')
+
+    async def test_registo_assincrono(self):
+        url = reverse('register-async')
+        dados = {'email': 'rui@unicv.cv', 'password': 'segredo123', 'password2': 'segredo123'}
+        resposta = await self.async_client.post(url, dados, content_type='application/json')
+        self.assertEqual(resposta.status_code, 201)
+        user = await CustomUser.objects.aget(email='rui@unicv.cv')
+        self.assertTrue(user.check_password('segredo123'))
+        resposta = await self.async_client.post(url, dados, content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
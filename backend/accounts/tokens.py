@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class TokenPre2FA(AccessToken):
+    """
+    Token de curta duração emitido após a validação da password e antes do
+    código 2FA. Só contém o id do utilizador e não é registado na tabela de
+    tokens; como o ``token_type`` não é 'access', as views normais recusam-no.
+    """
+    token_type = 'pre_2fa'
+    lifetime = settings.PRE_2FA_TOKEN_DURACAO
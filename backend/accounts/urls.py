@@ -4,9 +4,12 @@ from .views import (
     UserDetail,
     UserCreate,
     register_user,
+    register_user_async,
     login_user,
+    login_user_async,
     CustomTokenObtainPairView,
     generate_2fa_qrcode,
+    generate_2fa_qrcode_async,
     verify_2fa,
     RefreshTokenView,
 )
@@ -20,9 +23,12 @@ urlpatterns = [
 
     # Registro de usuários públicos
     path('register/', register_user.as_view(), name='register'),
+    path('async/register/', register_user_async.as_view(), name='register-async'),
 
     # Login e verificação 2FA
     path('login/', login_user.as_view(), name='login'),
+    # Variante assíncrona (servir com ASGI: backend.asgi:application)
+    path('async/login/', login_user_async.as_view(), name='login-async'),
     path('login/verify-2fa/', verify_2fa.as_view(), name='verify-2fa'),
 
     # JWT token personalizado
@@ -34,4 +40,5 @@ urlpatterns = [
 
     # Geração de QR Code para 2FA
     path('2fa/generate/', generate_2fa_qrcode.as_view(), name='generate-2fa'),
+    path('async/2fa/generate/', generate_2fa_qrcode_async.as_view(), name='generate-2fa-async'),
 ]
@@ -3,18 +3,31 @@ from rest_framework import status, permissions
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from django_otp.plugins.otp_totp.models import TOTPDevice
-from django_otp import devices_for_user
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework.exceptions import AuthenticationFailed
 
-import qrcode
-from io import BytesIO
-import base64
+import asyncio
+import json
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 
 from .serializers import UserSerializer, RegisterSerializer, LoginSerializer, CustomTokenObtainPairSerializer, DetailedUserSerializer
+from .authentication import Pre2FAAuthentication
+from .tokens import TokenPre2FA
+from .qrcodes import FORMATOS, qrcode_dispositivo, qrcode_dispositivo_async
+from .senhas import autenticar, gerar_hash
+from core.executores import ExecutorSaturado
+from core.pagination import resposta_lista
 
 User = get_user_model()
 SECURE_COOKIE = not settings.DEBUG
@@ -29,9 +42,8 @@ class UserList(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request, format=None):
-        utilizadores = User.objects.all()
-        serializer = DetailedUserSerializer(utilizadores, many=True) # Use DetailedUserSerializer aqui
-        return Response(serializer.data)
+        utilizadores = User.objects.select_related('profile')
+        return resposta_lista(self, utilizadores, DetailedUserSerializer)
 
 class UserDetail(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrSelf]
@@ -75,51 +87,181 @@ class login_user(APIView):
             password = serializer.validated_data['password']
             user = authenticate(request, email=email, password=password)
             if user:
-                # Usar seu CustomTokenObtainPairSerializer para gerar o token
-                token_serializer = CustomTokenObtainPairSerializer()
-                token = token_serializer.get_token(user)
-                access_token = str(token.access_token)
-                refresh_token = str(token)
-
-                # Retornar token para frontend e informar necessidade de 2FA
+                # Token pre-2FA: só serve para ativar/verificar o 2FA. O par
+                # final (com grupos) é emitido uma única vez em verify_2fa.
                 return Response({
                     "msg": "Verificação 2FA necessária",
                     "requires_2fa": True,
-                    "access_token": access_token,
-                    "refresh_token": refresh_token,
-                    "user": UserSerializer(user).data
+                    "access_token": str(TokenPre2FA.for_user(user)),
                 }, status=status.HTTP_200_OK)
             return Response({"msg": "Credenciais inválidas"}, status=status.HTTP_401_UNAUTHORIZED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _dados_pedido(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+    return request.POST
+
+
+def _resposta_ocupado():
+    return JsonResponse(
+        {"msg": "Serviço ocupado, tente novamente."},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '1'},
+    )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class register_user_async(View):
+    """
+    Variante assíncrona de register_user, para servidores ASGI (backend.asgi).
+    O hash da password é calculado no executor 'hashing'; quando este está
+    saturado a resposta é 503 com Retry-After.
+    """
+    async def post(self, request):
+        dados = _dados_pedido(request)
+        if dados is None:
+            return JsonResponse({"msg": "JSON inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = RegisterSerializer(data=dados)
+        # A validação consulta a base de dados (e-mail único).
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        dados = dict(serializer.validated_data)
+        dados.pop('password2')
+        try:
+            password = await gerar_hash(dados.pop('password'))
+        except ExecutorSaturado:
+            return _resposta_ocupado()
+        await User(password=password, **dados).asave()
+        return JsonResponse({"msg": "Usuário registrado com sucesso!"}, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class login_user_async(View):
+    """
+    Variante assíncrona de login_user, para servidores ASGI (backend.asgi).
+    A password é verificada no executor 'hashing', sem ocupar o worker; quando
+    o executor está saturado a resposta é 503 com Retry-After.
+    """
+    async def post(self, request):
+        dados = _dados_pedido(request)
+        if dados is None:
+            return JsonResponse({"msg": "JSON inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = LoginSerializer(data=dados)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user = await autenticar(serializer.validated_data['email'], serializer.validated_data['password'])
+        except ExecutorSaturado:
+            return _resposta_ocupado()
+        if user is None:
+            return JsonResponse({"msg": "Credenciais inválidas"}, status=status.HTTP_401_UNAUTHORIZED)
+        return JsonResponse({
+            "msg": "Verificação 2FA necessária",
+            "requires_2fa": True,
+            "access_token": str(TokenPre2FA.for_user(user)),
+        }, status=status.HTTP_200_OK)
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+def _dispositivo_por_ativar(user):
+    """
+    O dispositivo TOTP (por confirmar) a ativar, ou ``None`` se o utilizador
+    já tem um confirmado. Basta a password para obter o token pre-2FA: o
+    segredo de um dispositivo confirmado nunca é devolvido. O dispositivo só
+    fica confirmado no verify_2fa, depois de um código válido.
+    """
+    # Com o utilizador carregado, o config_url não vai à base de dados.
+    devices = list(TOTPDevice.objects.select_related('user').filter(user=user))
+    if any(device.confirmed for device in devices):
+        return None
+    for device in devices:
+        if device.name == 'default':
+            return device
+    return TOTPDevice.objects.create(user=user, name='default', confirmed=False)
+
+
 class generate_2fa_qrcode(APIView):
+    """
+    Numa falha de cache o worker espera pela renderização do QR code (ver
+    accounts.qrcodes); com ASGI use generate_2fa_qrcode_async.
+    """
+    authentication_classes = [Pre2FAAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        user = request.user
-        device, _ = TOTPDevice.objects.get_or_create(user=user, name='default')
-
-        if not device.confirmed:
-            device.confirmed = True
-            device.save()
+        device = _dispositivo_por_ativar(request.user)
+        if device is None:
+            return Response({'error': '2FA já está ativo para este utilizador.'}, status=status.HTTP_409_CONFLICT)
 
-        qr = qrcode.make(device.config_url)
-        buffered = BytesIO()
-        qr.save(buffered)
-        qr_code_base64 = base64.b64encode(buffered.getvalue()).decode()
+        formato = request.query_params.get('formato', 'png')
+        if formato not in FORMATOS:
+            return Response({'error': 'Formato inválido. Use png ou svg.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            imagem = qrcode_dispositivo(device, formato)
+        except (ExecutorSaturado, FuturesTimeoutError):
+            return Response(
+                {'error': 'Serviço ocupado, tente novamente.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '2'},
+            )
 
+        chave = 'qr_code_svg' if formato == 'svg' else 'qr_code_base64'
         return Response({
-            'qr_code_base64': qr_code_base64,
+            chave: imagem,
             'otp_uri': device.config_url
         }, status=status.HTTP_200_OK)
 
 
+@method_decorator(csrf_exempt, name='dispatch')
+class generate_2fa_qrcode_async(View):
+    """
+    Variante assíncrona de generate_2fa_qrcode, para servidores ASGI
+    (backend.asgi): o QR code é renderizado no executor 'qrcode' sem ocupar
+    o worker enquanto espera.
+    """
+    async def post(self, request):
+        try:
+            autenticado = await sync_to_async(Pre2FAAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if autenticado is None:
+            return JsonResponse(
+                {'detail': 'As credenciais de autenticação não foram fornecidas.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        device = await sync_to_async(_dispositivo_por_ativar)(autenticado[0])
+        if device is None:
+            return JsonResponse({'error': '2FA já está ativo para este utilizador.'}, status=status.HTTP_409_CONFLICT)
+
+        formato = request.GET.get('formato', 'png')
+        if formato not in FORMATOS:
+            return JsonResponse({'error': 'Formato inválido. Use png ou svg.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            imagem = await qrcode_dispositivo_async(device, formato)
+        except (ExecutorSaturado, asyncio.TimeoutError, FuturesTimeoutError):
+            return JsonResponse(
+                {'error': 'Serviço ocupado, tente novamente.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '2'},
+            )
+
+        chave = 'qr_code_svg' if formato == 'svg' else 'qr_code_base64'
+        return JsonResponse({chave: imagem, 'otp_uri': device.config_url}, status=status.HTTP_200_OK)
+
+
 class verify_2fa(APIView):
+    # O token pre-2FA do header é validado na própria view.
+    authentication_classes = []
     permission_classes = [AllowAny]
 
     def post(self, request):
@@ -133,19 +275,26 @@ class verify_2fa(APIView):
             return Response({"error": "Token temporário ausente"}, status=status.HTTP_401_UNAUTHORIZED)
 
         try:
-            decoded_token = AccessToken(temp_token)
-            user = User.objects.get(id=decoded_token['user_id'])
-        except Exception:
+            decoded_token = TokenPre2FA(temp_token)
+            # Grupos carregados uma vez, para o token final e para a resposta.
+            user = User.objects.prefetch_related('groups').get(id=decoded_token['user_id'])
+        except (TokenError, KeyError, User.DoesNotExist):
             return Response({"error": "Token temporário inválido"}, status=status.HTTP_401_UNAUTHORIZED)
 
         if not user.is_active:
             return Response({"error": "Usuário inativo"}, status=status.HTTP_401_UNAUTHORIZED)
 
-        for device in devices_for_user(user):
+        # Enquanto não houver um dispositivo confirmado, o código valida (e
+        # confirma) o dispositivo criado no generate_2fa_qrcode.
+        devices = list(TOTPDevice.objects.filter(user=user, confirmed=True))
+        if not devices:
+            devices = TOTPDevice.objects.filter(user=user, confirmed=False)
+        for device in devices:
             if device.verify_token(otp_token):
-                # Gerar token customizado com grupos novamente para o token final
-                token_serializer = CustomTokenObtainPairSerializer()
-                token = token_serializer.get_token(user)
+                if not device.confirmed:
+                    device.confirmed = True
+                    device.save(update_fields=['confirmed'])
+                token = CustomTokenObtainPairSerializer.get_token(user)
 
                 access_token_final = str(token.access_token)
                 refresh_token_final = str(token)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 from django.conf import settings  
@@ -58,7 +59,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.TokenAuthentication',
@@ -66,9 +67,54 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Paginação por cursor. Sem PAGE_SIZE as listagens só são paginadas
+    # quando o cliente envia ?page_size=.
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.PaginacaoCursor',
+    # Filtros e ?ordem= declarados no atributo ``filtragem`` das views
+    # (core.filtros), e JOINs só das relações aninhadas pedidas com ?fields=
+    # e ?expand= (core.expansao).
+    'DEFAULT_FILTER_BACKENDS': ['core.filtros.FiltroDeclarativo', 'core.expansao.RelacoesPedidas'],
+    'PAGE_SIZE': config('PAGINACAO_TAMANHO', default=None, cast=lambda v: int(v) if v else None),
 }
 
+# Limite superior para ?page_size=
+PAGINACAO_TAMANHO_MAXIMO = config('PAGINACAO_TAMANHO_MAXIMO', default=500, cast=int)
+
+# Linhas lidas por query nas listagens em streaming (?stream=1)
+STREAMING_TAMANHO_BLOCO = config('STREAMING_TAMANHO_BLOCO', default=500, cast=int)
+
+# Importação em massa (relatorios.importacao): linhas validadas e inseridas
+# por lote, e número máximo de erros de linha devolvidos.
+IMPORTACAO_TAMANHO_LOTE = config('IMPORTACAO_TAMANHO_LOTE', default=2000, cast=int)
+IMPORTACAO_MAXIMO_ERROS = config('IMPORTACAO_MAXIMO_ERROS', default=1000, cast=int)
+
+# Benchmark dos endpoints (core.benchmark): baseline gravada no repositório e
+# regressões toleradas (p50 > baseline * latencia + folga_ms, queries a mais,
+# resposta > baseline * tamanho). O p95 só é comparado com
+# BENCHMARK_TOLERANCIA_P95, por ser instável com poucas repetições.
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+BENCHMARK_TOLERANCIAS = {
+    'latencia': config('BENCHMARK_TOLERANCIA_LATENCIA', default=1.5, cast=float),
+    'latencia_p95': config('BENCHMARK_TOLERANCIA_P95', default=None, cast=lambda v: float(v) if v else None),
+    'folga_ms': config('BENCHMARK_FOLGA_MS', default=5.0, cast=float),
+    'queries': config('BENCHMARK_TOLERANCIA_QUERIES', default=0, cast=int),
+    'tamanho': config('BENCHMARK_TOLERANCIA_TAMANHO', default=1.1, cast=float),
+}
+
+# Pesquisa aproximada (core.pesquisa): fração dos trigramas de cada palavra
+# da consulta que tem de aparecer numa palavra do texto, e resultados por
+# grupo (?limite=, até PESQUISA_LIMITE_MAXIMO).
+PESQUISA_LIMIAR = config('PESQUISA_LIMIAR', default=0.6, cast=float)
+PESQUISA_LIMITE = config('PESQUISA_LIMITE', default=10, cast=int)
+PESQUISA_LIMITE_MAXIMO = config('PESQUISA_LIMITE_MAXIMO', default=50, cast=int)
+
+# Duração, em segundos, de uma reserva temporária de cama (core.reservas)
+RESERVA_CAMA_DURACAO = config('RESERVA_CAMA_DURACAO', default=300, cast=int)
+
 # Configurações do JWT
+# Validade do token intermédio entre a password e o código 2FA (accounts.tokens).
+PRE_2FA_TOKEN_DURACAO = timedelta(minutes=config('PRE_2FA_TOKEN_MINUTOS', default=5, cast=int))
+
 SIMPLE_JWT = {
     # Tempo de validade dos tokens
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
@@ -120,6 +166,27 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Instrumentação por pedido (core.instrumentacao): cabeçalho Server-Timing com
+# queries, SQL, autenticação, serialização e view, e uma linha de log (JSON)
+# para os pedidos acima de INSTRUMENTACAO_LIMITE_MS com as queries mais lentas.
+INSTRUMENTACAO = config('INSTRUMENTACAO', default=False, cast=bool)
+INSTRUMENTACAO_SERVER_TIMING = config('INSTRUMENTACAO_SERVER_TIMING', default=True, cast=bool)
+INSTRUMENTACAO_LIMITE_MS = config('INSTRUMENTACAO_LIMITE_MS', default=500, cast=int)
+INSTRUMENTACAO_QUERIES_LENTAS = config('INSTRUMENTACAO_QUERIES_LENTAS', default=3, cast=int)
+if INSTRUMENTACAO:
+    MIDDLEWARE.insert(0, 'core.instrumentacao.InstrumentacaoMiddleware')
+
+# Perfil de um pedido, a pedido de staff com X-Perfil: 1 ou ?perfil=1
+# (core.perfilador): CPU, memória e SQL gravados em PERFILADOR_DIRETORIO.
+PERFILADOR = config('PERFILADOR', default=False, cast=bool)
+PERFILADOR_DIRETORIO = Path(config('PERFILADOR_DIRETORIO', default=str(BASE_DIR / 'perfis')))
+PERFILADOR_MAXIMO_ARTEFACTOS = config('PERFILADOR_MAXIMO_ARTEFACTOS', default=100, cast=int)
+if PERFILADOR:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'core.perfilador.PerfiladorMiddleware',
+    )
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -153,6 +220,62 @@ DATABASES = {
     }
 }
 
+# Cache
+# CACHE_BACKEND aceita 'locmem' (por processo), 'file' (partilhada entre os
+# processos do servidor, em CACHE_LOCATION) ou o caminho de outro backend.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': config('CACHE_LOCATION', default='/tmp/residencias-cache' if CACHE_BACKEND == 'file' else 'residencias'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+
+# Validade da cópia em cache do utilizador autenticado (accounts.authentication).
+# A cópia é apagada quando o utilizador muda; com cache por processo, este é o
+# atraso máximo com que uma desativação chega aos outros processos.
+AUTH_CACHE_TIMEOUT = config('AUTH_CACHE_TIMEOUT', default=60, cast=int)
+
+# Validade do conjunto compilado de permissões de cada utilizador (accounts.permissoes).
+# A entrada é apagada quando as permissões mudam, mas com cache por processo
+# ('locmem') só no processo que fez a alteração: nos outros, uma permissão
+# retirada continua a valer durante, no máximo, este número de segundos.
+PERMISSOES_CACHE_TIMEOUT = config('PERMISSOES_CACHE_TIMEOUT', default=30 if CACHE_BACKEND == 'locmem' else 300, cast=int)
+
+# Executores limitados para trabalho de CPU (core.executores): threads e
+# número máximo de tarefas à espera antes de responder 503.
+EXECUTORES = {
+    'qrcode': {
+        'max_workers': config('QRCODE_THREADS', default=2, cast=int),
+        'max_pendentes': config('QRCODE_PENDENTES', default=20, cast=int),
+    },
+    # O PBKDF2 do hashlib liberta o GIL: uma thread por core usa todo o CPU.
+    'hashing': {
+        'max_workers': config('HASHING_THREADS', default=os.cpu_count() or 1, cast=int),
+        'max_pendentes': config('HASHING_PENDENTES', default=200, cast=int),
+    },
+}
+
+# QR codes de ativação do 2FA (accounts.qrcodes): validade na cache e tempo
+# máximo de espera pela renderização, em segundos.
+QRCODE_CACHE_TIMEOUT = config('QRCODE_CACHE_TIMEOUT', default=900, cast=int)
+QRCODE_TIMEOUT_RENDERIZACAO = config('QRCODE_TIMEOUT_RENDERIZACAO', default=10, cast=int)
+
+# Validade máxima dos agregados em cache (core.cache); normalmente são
+# invalidados antes, quando os modelos de que dependem mudam.
+CACHE_AGREGADOS_TIMEOUT = config('CACHE_AGREGADOS_TIMEOUT', default=600, cast=int)
+
+# Validade dos carimbos de versão dos modelos (core.cache), usados nos GET
+# condicionais e no índice de pesquisa em memória. Com cache por processo, uma
+# gravação só renova os carimbos desse processo: os outros podem responder 304
+# com dados antigos durante, no máximo, este número de segundos.
+CACHE_VERSOES_TIMEOUT = config('CACHE_VERSOES_TIMEOUT', default=30 if CACHE_BACKEND == 'locmem' else 3600, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -196,7 +319,8 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 AUTHENTICATION_BACKENDS = [
    # 'accounts.authentication.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
+    # ModelBackend com as permissões (incluindo as detalhadas do perfil) em cache.
+    'accounts.authentication.PermissoesEmCacheBackend',
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -220,6 +344,8 @@ CSRF_COOKIE_SECURE = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 CSRF_COOKIE_SAMESITE = 'Lax'
 CORS_ALLOW_CREDENTIALS = True
+# Id do artefacto de core.perfilador, lido pelo frontend.
+CORS_EXPOSE_HEADERS = ['X-Perfil-Id']
 
 CORS_ALLOW_ALL_ORIGINS = True
 CSRF_TRUSTED_ORIGINS = ['http://localhost:3000']
@@ -0,0 +1,155 @@
+"""
+Alocação em lote de camas às candidaturas aprovadas.
+
+Para cada residência, as candidaturas aprovadas ainda sem residente são
+ordenadas por data de submissão e emparelhadas com as camas livres do
+edifício da residência. O plano é calculado em memória a partir de duas
+queries e aplicado numa única transação com escritas em massa.
+"""
+import time
+from collections import defaultdict
+from itertools import count
+
+from django.db import transaction
+
+from core.cache import invalidar
+from core.models import Cama, Residente
+from core.ocupacao import recalcular_quartos
+from core.reservas import sem_reserva_ativa
+from .models import Candidatura
+
+
+class CamasIndisponiveis(Exception):
+    """Uma cama do plano foi ocupada entretanto; é preciso planear de novo."""
+
+
+class PlanoAlocacao:
+    """
+    Resultado do planeamento: pares ``(candidatura, cama)`` e as candidaturas
+    que ficaram sem cama.
+    """
+
+    def __init__(self, atribuicoes, sem_cama, duracao):
+        self.atribuicoes = atribuicoes
+        self.sem_cama = sem_cama
+        self.duracao = duracao
+        self.aplicado = False
+
+    def resumo(self):
+        return {
+            'aplicado': self.aplicado,
+            'totalAtribuicoes': len(self.atribuicoes),
+            'totalSemCama': len(self.sem_cama),
+            'duracaoMs': round(self.duracao * 1000, 2),
+            'atribuicoes': [
+                {
+                    'candidatura': candidatura.id,
+                    'estudante': candidatura.estudante.Nome,
+                    'residencia': candidatura.residencia.Nome,
+                    'edificio': cama.quarto.edificio.nome,
+                    'quarto': cama.quarto.numero,
+                    'cama': cama.numero,
+                }
+                for candidatura, cama in self.atribuicoes
+            ],
+            'semCama': [candidatura.id for candidatura in self.sem_cama],
+        }
+
+
+def _ordenar_camas(camas, preencher_quartos):
+    """
+    Com ``preencher_quartos`` as camas de quartos já parcialmente ocupados vêm
+    primeiro e as de cada quarto ficam seguidas, para completar um quarto antes
+    de abrir outro. Sem essa regra as camas são distribuídas alternando entre
+    quartos.
+    """
+    if preencher_quartos:
+        return sorted(camas, key=lambda c: (-c.quarto.camas_ocupadas, c.quarto_id, c.numero))
+    posicao = defaultdict(count)
+    ordenadas = sorted(camas, key=lambda c: (c.quarto_id, c.numero))
+    return sorted(ordenadas, key=lambda c: (next(posicao[c.quarto_id]), c.quarto_id))
+
+
+def planear(residencia_ids=None, tipos_quarto=None, preencher_quartos=True):
+    """
+    Calcula o plano de alocação sem escrever na base de dados.
+    """
+    inicio = time.perf_counter()
+    candidaturas = Candidatura.objects.filter(status='aprovado', residente__isnull=True).select_related(
+        'estudante__user', 'residencia'
+    ).order_by('data_submissao', 'id')
+    if residencia_ids:
+        candidaturas = candidaturas.filter(residencia_id__in=residencia_ids)
+    candidaturas = list(candidaturas)
+
+    edificio_ids = {c.residencia.edificio_id for c in candidaturas}
+    camas = Cama.objects.filter(
+        sem_reserva_ativa(), quarto__edificio_id__in=edificio_ids, residente__isnull=True
+    ).select_related('quarto__edificio')
+    if tipos_quarto:
+        camas = camas.filter(quarto__tipo__in=tipos_quarto)
+
+    livres_por_edificio = defaultdict(list)
+    for cama in camas:
+        livres_por_edificio[cama.quarto.edificio_id].append(cama)
+    filas = {
+        edificio_id: iter(_ordenar_camas(livres, preencher_quartos))
+        for edificio_id, livres in livres_por_edificio.items()
+    }
+
+    atribuicoes, sem_cama = [], []
+    for candidatura in candidaturas:
+        cama = next(filas.get(candidatura.residencia.edificio_id, iter(())), None)
+        if cama is None:
+            sem_cama.append(candidatura)
+        else:
+            atribuicoes.append((candidatura, cama))
+    return PlanoAlocacao(atribuicoes, sem_cama, time.perf_counter() - inicio)
+
+
+def aplicar(plano):
+    """
+    Cria os residentes, ocupa as camas e liga as candidaturas numa única transação.
+    Levanta ``CamasIndisponiveis`` se alguma cama deixou de estar livre.
+    """
+    if not plano.atribuicoes:
+        plano.aplicado = True
+        return plano
+
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        cama_ids = [cama.id for _, cama in plano.atribuicoes]
+        livres = set(
+            Cama.objects.select_for_update().filter(
+                sem_reserva_ativa(), id__in=cama_ids, residente__isnull=True
+            ).values_list('id', flat=True)
+        )
+        if len(livres) != len(cama_ids):
+            raise CamasIndisponiveis(f'{len(cama_ids) - len(livres)} cama(s) do plano já não estão livres.')
+
+        residentes = Residente.objects.bulk_create([
+            Residente(nome=candidatura.estudante.Nome, email=candidatura.estudante.user.email, cama=cama)
+            for candidatura, cama in plano.atribuicoes
+        ])
+        camas, candidaturas = [], []
+        for residente, (candidatura, cama) in zip(residentes, plano.atribuicoes):
+            cama.residente = residente
+            cama.status = 'Ocupado'
+            candidatura.residente = residente
+            camas.append(cama)
+            candidaturas.append(candidatura)
+        Cama.objects.bulk_update(camas, ['residente', 'status'], batch_size=500)
+        Candidatura.objects.bulk_update(candidaturas, ['residente'], batch_size=500)
+        # As escritas em massa não disparam sinais: atualiza os contadores
+        # de ocupação e a cache.
+        recalcular_quartos({cama.quarto_id for cama in camas})
+        invalidar(Cama, Residente, Candidatura)
+
+    plano.aplicado = True
+    plano.duracao += time.perf_counter() - inicio
+    return plano
+
+
+def alocar(residencia_ids=None, tipos_quarto=None, preencher_quartos=True, simular=False):
+    plano = planear(residencia_ids, tipos_quarto, preencher_quartos)
+    return plano if simular else aplicar(plano)
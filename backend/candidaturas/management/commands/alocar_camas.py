@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from candidaturas.alocacao import CamasIndisponiveis, alocar
+
+
+class Command(BaseCommand):
+    help = 'Atribui camas livres às candidaturas aprovadas, por residência'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residencia', type=int, action='append', dest='residencias', help='Limita a alocação a esta residência (repetível)')
+        parser.add_argument('--tipo-quarto', action='append', dest='tipos_quarto', choices=['individual', 'duplo', 'triplo'], help='Usa apenas quartos deste tipo (repetível)')
+        parser.add_argument('--distribuir', action='store_true', help='Distribui pelos quartos em vez de completar um quarto antes de abrir outro')
+        parser.add_argument('--dry-run', action='store_true', help='Mostra o plano sem gravar nada')
+
+    def handle(self, *args, **options):
+        try:
+            plano = alocar(
+                residencia_ids=options['residencias'],
+                tipos_quarto=options['tipos_quarto'],
+                preencher_quartos=not options['distribuir'],
+                simular=options['dry_run'],
+            )
+        except CamasIndisponiveis as e:
+            raise CommandError(f'{e} Volte a correr o comando.')
+
+        resumo = plano.resumo()
+        for atribuicao in resumo['atribuicoes']:
+            self.stdout.write(
+                f"Candidatura {atribuicao['candidatura']} ({atribuicao['estudante']}) -> "
+                f"{atribuicao['edificio']} / {atribuicao['quarto']} / cama {atribuicao['cama']}"
+            )
+        if resumo['semCama']:
+            self.stdout.write(self.style.WARNING(f"Sem cama disponível: {resumo['totalSemCama']} candidatura(s)."))
+        estado = 'aplicado' if plano.aplicado else 'simulado (dry-run)'
+        self.stdout.write(self.style.SUCCESS(
+            f"Plano {estado}: {resumo['totalAtribuicoes']} atribuição(ões) em {resumo['duracaoMs']} ms."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0002_alter_candidatura_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidatura',
+            name='data_submissao',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0003_data_submissao_index'),
+        ('core', '0003_contadores_ocupacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidatura',
+            name='residente',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='candidatura', to='core.residente'),
+        ),
+    ]
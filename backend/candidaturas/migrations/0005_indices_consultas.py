@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidaturas', '0004_candidatura_residente'),
+        ('core', '0005_indices_consultas'),
+        ('estudantes', '0002_estudante_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='candidatura',
+            index=models.Index(fields=['status'], name='candidatura_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatura',
+            index=models.Index(fields=['residencia', 'status'], name='candidatura_resid_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='candidatura',
+            index=models.Index(condition=models.Q(('residente__isnull', True), ('status', 'aprovado')), fields=['data_submissao', 'id'], name='candidatura_por_alocar_idx'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from core.models import Residencia
+from core.models import Residencia, Residente
 from estudantes.models import Estudante
 
 class Candidatura(models.Model):
@@ -10,7 +10,7 @@ class Candidatura(models.Model):
         ('em_analise', 'Em Análise'),
     ]
 
-    data_submissao = models.DateTimeField(auto_now_add=True)
+    data_submissao = models.DateTimeField(auto_now_add=True, db_index=True)
     residencia = models.ForeignKey(Residencia, on_delete=models.CASCADE, related_name='candidaturas')
     estudante = models.ForeignKey(Estudante, on_delete=models.CASCADE, related_name='candidaturas')
 
@@ -27,10 +27,29 @@ class Candidatura(models.Model):
         verbose_name='Estado da Candidatura'
     )
 
+    # Residente criado quando a candidatura aprovada recebe uma cama
+    # (ver candidaturas.alocacao).
+    residente = models.OneToOneField(
+        Residente, on_delete=models.SET_NULL, null=True, blank=True, related_name='candidatura'
+    )
+
     class Meta:
         permissions = [
             ('view_outras_candidaturas', 'Can view candidaturas of other students'),
         ]
+        indexes = [
+            # CandidaturasPorEstadoView e listagens por estado
+            models.Index(fields=['status'], name='candidatura_status_idx'),
+            # CandidaturasPorResidenciaView, com ou sem filtro de estado
+            models.Index(fields=['residencia', 'status'], name='candidatura_resid_status_idx'),
+            # Fila da alocação (candidaturas.alocacao.planear): aprovadas sem
+            # residente, por ordem de submissão.
+            models.Index(
+                fields=['data_submissao', 'id'],
+                condition=models.Q(status='aprovado', residente__isnull=True),
+                name='candidatura_por_alocar_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Candidatura de {self.estudante.Nome} para {self.residencia.Nome} ({self.get_status_display()})"
\ No newline at end of file
@@ -1,13 +1,19 @@
 from rest_framework import serializers
 from .models import Candidatura, Residencia, Estudante
+from core.expansao import CamposDinamicosMixin
 from core.models import Quarto, Edificio
+from core.serializers import EdificioSerializer
+
+class ResidenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # O edifício só é aninhado com ?expand=residencia.edificio.
+    expansoes = {'edificio': EdificioSerializer}
+    expandidas_por_omissao = ()
 
-class ResidenciaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Residencia
         fields = '__all__'
 
-class EstudanteSerializer(serializers.ModelSerializer):
+class EstudanteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Estudante
         fields = '__all__'
@@ -31,10 +37,10 @@ class QuartoSerializer(serializers.ModelSerializer):
             f"Capacidade: {obj.capacidade}"
         )
 
-class CandidaturaSerializer(serializers.ModelSerializer):
-    # Para leitura: mostra dados aninhados completos
-    residencia = ResidenciaSerializer(read_only=True)
-    estudante = EstudanteSerializer(read_only=True)
+class CandidaturaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # Para leitura: residência e estudante aninhados (ou só os ids, com
+    # ?expand=; ver core.expansao)
+    expansoes = {'residencia': ResidenciaSerializer, 'estudante': EstudanteSerializer}
 
     # Para escrita: aceita somente IDs para relacionamentos
     residencia_id = serializers.PrimaryKeyRelatedField(
@@ -47,3 +53,11 @@ class CandidaturaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Candidatura
         fields = '__all__'
+        read_only_fields = ['residente']
+
+class AlocacaoSerializer(serializers.Serializer):
+    """Corpo do pedido de alocação de camas (candidaturas.alocacao.alocar)."""
+    residencias = serializers.ListField(child=serializers.IntegerField(), required=False)
+    tipos_quarto = serializers.ListField(child=serializers.ChoiceField(choices=Quarto.TIPO_CHOICES), required=False)
+    preencher_quartos = serializers.BooleanField(default=True)
+    dry_run = serializers.BooleanField(default=False)
@@ -1,3 +1,263 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from core.filtros import Filtragem
+from core.models import Edificio, Quarto, Cama, Residencia
+from estudantes.models import Estudante
+from .alocacao import alocar
+from .models import Candidatura
+
+
+class DadosListagemMixin:
+    """Administrador, edifício e residência, e criação de candidaturas e quartos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(email='admin@unicv.cv', password='segredo123')
+        cls.edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        cls.residencia = Residencia.objects.create(Nome='Residência A', edificio=cls.edificio)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def criar_candidaturas(self, quantidade):
+        inicio = Estudante.objects.count()
+        for i in range(inicio, inicio + quantidade):
+            user = CustomUser.objects.create_user(email=f'estudante{i}@unicv.cv', password='segredo123')
+            estudante = Estudante.objects.create(user=user, Nome=f'Estudante {i}')
+            Candidatura.objects.create(residencia=self.residencia, estudante=estudante)
+
+    def criar_quartos(self, quantidade):
+        inicio = Quarto.objects.count()
+        for i in range(inicio, inicio + quantidade):
+            quarto = Quarto.objects.create(numero=f'A-{i}', capacidade=2, edificio=self.edificio)
+            Cama.objects.create(numero=f'A-{i}-1', quarto=quarto)
+
+
+class ConsultasListagemTests(DadosListagemMixin, TestCase):
+    """
+    Garante que as listagens de candidaturas e quartos executam um número
+    constante de queries, independentemente do número de linhas devolvidas.
+    """
+
+    def assertConsultasConstantes(self, url, criar, esperado):
+        criar(2)
+        with self.assertNumQueries(esperado):
+            self.client.get(url)
+        criar(10)
+        with self.assertNumQueries(esperado):
+            resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        return resposta
+
+    def test_listar_candidaturas(self):
+        resposta = self.assertConsultasConstantes(reverse('lista_candidaturas'), self.criar_candidaturas, 1)
+        self.assertEqual(len(resposta.data), 12)
+
+    def test_candidaturas_por_residencia(self):
+        url = reverse('candidaturas_por_residencia', args=[self.residencia.id])
+        self.assertConsultasConstantes(url, self.criar_candidaturas, 1)
+
+    def test_candidaturas_por_estudante(self):
+        self.criar_candidaturas(1)
+        estudante = Estudante.objects.get()
+        url = reverse('candidaturas_por_estudante', args=[estudante.id])
+        with self.assertNumQueries(1):
+            resposta = self.client.get(url)
+        self.assertEqual(len(resposta.data), 1)
+
+    def test_lista_vagas(self):
+        self.assertConsultasConstantes(reverse('lista_vagas'), self.criar_quartos, 1)
+
+    def test_listar_todos_quartos(self):
+        self.assertConsultasConstantes(reverse('listar_todos_quartos'), self.criar_quartos, 1)
+
+    def test_paginacao_por_cursor(self):
+        self.criar_candidaturas(12)
+        url = reverse('lista_candidaturas') + '?page_size=5'
+        vistos = []
+        while url:
+            with self.assertNumQueries(1):
+                resposta = self.client.get(url)
+            self.assertLessEqual(len(resposta.data['results']), 5)
+            vistos += [c['id'] for c in resposta.data['results']]
+            url = resposta.data['next']
+        self.assertEqual(sorted(vistos), sorted(Candidatura.objects.values_list('id', flat=True)))
+        self.assertEqual(len(vistos), len(set(vistos)))
+
+    @override_settings(STREAMING_TAMANHO_BLOCO=5)
+    def test_listagem_em_streaming(self):
+        self.criar_candidaturas(12)
+        esperado = self.client.get(reverse('lista_candidaturas')).data
+        # Três blocos de 5 linhas + a query que confirma o fim.
+        with self.assertNumQueries(4):
+            resposta = self.client.get(reverse('lista_candidaturas') + '?stream=1')
+            corpo = b''.join(resposta.streaming_content)
+        self.assertEqual(resposta['Content-Type'], 'application/json')
+        self.assertEqual(
+            sorted(json.loads(corpo), key=lambda c: c['id']),
+            sorted(json.loads(json.dumps(esperado)), key=lambda c: c['id']),
+        )
+
+
+class FiltrosListagemTests(DadosListagemMixin, TestCase):
+    """Filtros e ordenação declarados nas listagens (core.filtros)."""
+
+    def setUp(self):
+        super().setUp()
+        self.outra = Residencia.objects.create(Nome='Residência B', edificio=self.edificio)
+        self.criar_candidaturas(6)
+        candidaturas = list(Candidatura.objects.order_by('id'))
+        agora = timezone.now()
+        for i, candidatura in enumerate(candidaturas):
+            Candidatura.objects.filter(pk=candidatura.pk).update(
+                status='pendente' if i % 2 == 0 else 'aprovado',
+                residencia=self.residencia if i < 4 else self.outra,
+                data_submissao=agora - timedelta(days=i * 3),
+            )
+        self.ids = [candidatura.id for candidatura in candidaturas]
+
+    def listar(self, **params):
+        resposta = self.client.get(reverse('lista_candidaturas'), params)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        return resposta.data
+
+    def test_criterios_combinados_e_ordem(self):
+        desde = (timezone.now() - timedelta(days=7)).date().isoformat()
+        with self.assertNumQueries(1):
+            dados = self.listar(status='pendente', residencia=self.residencia.id, data_submissao__gte=desde, ordem='-data_submissao')
+        self.assertEqual([c['id'] for c in dados], [self.ids[0], self.ids[2]])
+
+        dados = self.listar(status__in='pendente,aprovado', residencia__in=f'{self.outra.id}', ordem='data_submissao')
+        self.assertEqual([c['id'] for c in dados], [self.ids[5], self.ids[4]])
+
+    def test_ordem_com_paginacao_por_cursor(self):
+        url = reverse('lista_candidaturas') + '?page_size=4&ordem=data_submissao'
+        vistos = []
+        while url:
+            resposta = self.client.get(url)
+            vistos += [c['id'] for c in resposta.data['results']]
+            url = resposta.data['next']
+        self.assertEqual(vistos, self.ids[::-1])
+
+    @override_settings(STREAMING_TAMANHO_BLOCO=2)
+    def test_streaming_segue_a_ordem_da_paginacao(self):
+        # Empate na data: o desempate pelo id tem de ser o mesmo nos dois modos.
+        Candidatura.objects.filter(pk=self.ids[3]).update(
+            data_submissao=Candidatura.objects.get(pk=self.ids[2]).data_submissao,
+        )
+        for params in ({}, {'ordem': 'data_submissao'}, {'ordem': '-data_submissao'}):
+            paginada, url = [], reverse('lista_candidaturas')
+            pedido = {**params, 'page_size': 4}
+            while url:
+                resposta = self.client.get(url, pedido)
+                paginada += [c['id'] for c in resposta.data['results']]
+                url, pedido = resposta.data['next'], None
+            resposta = self.client.get(reverse('lista_candidaturas'), {**params, 'stream': '1'})
+            streaming = [c['id'] for c in json.loads(b''.join(resposta.streaming_content))]
+            self.assertEqual(streaming, paginada, params)
+
+    def test_filtros_e_ordem_invalidos(self):
+        for params in (
+            {'ordem': 'cni_ou_passaporte_entregue'},
+            {'status__icontains': 'pend'},
+            {'residencia': 'abc'},
+            {'data_submissao__gte': 'ontem'},
+        ):
+            resposta = self.client.get(reverse('lista_candidaturas'), params)
+            self.assertEqual(resposta.status_code, 400, params)
+            self.assertIn('detail', resposta.data)
+
+    def test_views_genericas(self):
+        self.criar_quartos(3)
+        Quarto.objects.filter(numero='A-1').update(tipo='duplo')
+        resposta = self.client.get(reverse('lista_vagas'), {'tipo': 'duplo'})
+        self.assertEqual([q['numero'] for q in resposta.data], ['A-1'])
+        resposta = self.client.get(reverse('listar_todos_quartos'), {'ordem': '-numero'})
+        self.assertEqual([q['numero'] for q in resposta.data], ['A-2', 'A-1', 'A-0'])
+
+    def test_campos_sem_indice_sao_recusados(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Filtragem(Candidatura, {'cni_ou_passaporte_entregue': ('exact',)})
+        with self.assertRaises(ImproperlyConfigured):
+            Filtragem(Quarto, {}, ordenacao=('capacidade',))
+
+    def test_ordenacao_so_por_campos_quase_unicos(self):
+        # Indexado, mas com valores repetidos: o cursor recorreria a OFFSET.
+        with self.assertRaises(ImproperlyConfigured):
+            Filtragem(Cama, {'status': ('exact',)}, ordenacao=('status',))
+        Filtragem(Quarto, {}, ordenacao=('numero',))
+        Filtragem(Candidatura, {}, ordenacao=('data_submissao',))
+        self.assertEqual(self.client.get(reverse('listar_todos_quartos'), {'ordem': 'tipo'}).status_code, 400)
+
+
+class AlocacaoCamasTests(TestCase):
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='admin@unicv.cv', password='segredo123')
+        self.edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        self.residencia = Residencia.objects.create(Nome='Residência A', edificio=self.edificio)
+        self.duplo = Quarto.objects.create(numero='A-1', capacidade=2, edificio=self.edificio, tipo='duplo')
+        self.triplo = Quarto.objects.create(numero='A-2', capacidade=3, edificio=self.edificio, tipo='triplo')
+        for quarto, n in ((self.duplo, 2), (self.triplo, 3)):
+            for i in range(n):
+                Cama.objects.create(numero=str(i + 1), quarto=quarto)
+        self.candidaturas = []
+        for i in range(4):
+            user = CustomUser.objects.create_user(email=f'estudante{i}@unicv.cv', password='segredo123')
+            estudante = Estudante.objects.create(user=user, Nome=f'Estudante {i}')
+            self.candidaturas.append(Candidatura.objects.create(
+                residencia=self.residencia, estudante=estudante, status='aprovado' if i < 3 else 'pendente',
+            ))
+
+    def test_dry_run_nao_grava(self):
+        plano = alocar(simular=True)
+        self.assertEqual(len(plano.atribuicoes), 3)
+        self.assertFalse(plano.aplicado)
+        self.assertFalse(Cama.objects.filter(residente__isnull=False).exists())
+
+    def test_preenche_quartos_antes_de_abrir_outros(self):
+        plano = alocar()
+        self.assertTrue(plano.aplicado)
+        self.assertEqual(sorted(c.quarto_id for _, c in plano.atribuicoes), [self.duplo.id] * 2 + [self.triplo.id])
+        self.assertEqual(Cama.objects.filter(residente__isnull=False, status='Ocupado').count(), 3)
+        self.duplo.refresh_from_db()
+        self.assertEqual(self.duplo.camas_livres, 0)
+        for candidatura in self.candidaturas[:3]:
+            candidatura.refresh_from_db()
+            self.assertEqual(candidatura.residente.cama.residente_id, candidatura.residente_id)
+        # Uma segunda execução não realoca candidaturas já atendidas.
+        self.assertEqual(len(alocar().atribuicoes), 0)
+
+    def test_regra_de_tipo_de_quarto(self):
+        plano = alocar(tipos_quarto=['triplo'])
+        self.assertEqual({c.quarto_id for _, c in plano.atribuicoes}, {self.triplo.id})
+
+    def test_endpoint_de_alocacao(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        resposta = client.post(reverse('alocar_camas'), {'dry_run': True}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['totalAtribuicoes'], 3)
+        self.assertFalse(resposta.data['aplicado'])
+
+    def test_endpoint_valida_o_corpo(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = reverse('alocar_camas')
+        for corpo in ({'residencias': 5}, {'residencias': ['abc']}, {'tipos_quarto': ['suite']}, {'dry_run': 'talvez'}):
+            with self.subTest(corpo=corpo):
+                self.assertEqual(client.post(url, corpo, format='json').status_code, 400)
+        self.assertFalse(Cama.objects.filter(residente__isnull=False).exists())
+        # Em multipart, "false" é falso (e não uma string não vazia).
+        resposta = client.post(url, {'dry_run': 'false', 'preencher_quartos': 'false'})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.data['aplicado'])
@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .views import ListarCandidaturasView, AtualizarEstadoCandidaturaView, MinhaCandidaturaView, CandidaturaDetailView, CandidaturasPorEstadoView , CandidaturasPorEstudanteView , CandidaturasPorResidenciaView , ListaVagasView, ListarTodosQuartosView, QuartoDetailView , AlterarDisponibilidadeQuartoView
+from .views import ListarCandidaturasView, AtualizarEstadoCandidaturaView, MinhaCandidaturaView, CandidaturaDetailView, CandidaturasPorEstadoView , CandidaturasPorEstudanteView , CandidaturasPorResidenciaView , ListaVagasView, ListarTodosQuartosView, QuartoDetailView , AlterarDisponibilidadeQuartoView, AlocarCamasView, CandidaturasPorEstadoAsyncView, MinhaCandidaturaAsyncView
 
 urlpatterns = [
     path('', ListarCandidaturasView.as_view(), name='lista_candidaturas'),
@@ -12,6 +12,10 @@ urlpatterns = [
     path('listar/', ListarCandidaturasView.as_view(), name='listar_candidaturas_cbv'),
     path('atualizar/<int:id>/', AtualizarEstadoCandidaturaView.as_view(), name='atualizar_estado'),
     path('minha/', MinhaCandidaturaView.as_view(), name='minha_candidatura_cbv'),
+    # Variantes assíncronas (ASGI)
+    path('async/estado/', CandidaturasPorEstadoAsyncView.as_view(), name='candidaturas_por_estado_async'),
+    path('async/minha/', MinhaCandidaturaAsyncView.as_view(), name='minha_candidatura_async'),
+    path('alocar/', AlocarCamasView.as_view(), name='alocar_camas'),
     path('vagas/', ListaVagasView.as_view(), name='lista_vagas'),
     path('quartos/', ListarTodosQuartosView.as_view(), name='listar_todos_quartos'),
     path('quartos/<int:pk>/',QuartoDetailView.as_view(), name='editar_quarto'),
@@ -11,17 +11,37 @@ from django.db.models import Count, F
 
 # Importações de modelos e serializers da aplicação 'candidaturas'
 from .models import Candidatura
-from .serializers import CandidaturaSerializer
+from .serializers import AlocacaoSerializer, CandidaturaSerializer
 
 # Importações de modelos e serializers da aplicação 'core'
 from core.models import Quarto, Cama, Residente, Edificio, Residencia as ResidenciaCore
+from estudantes.models import Estudante
 from core.serializers import (
     QuartoSerializer, ResidenciaSerializer as ResidenciaCoreSerializer,
     ResidenteSerializer, EdificioSerializer, CamaSerializer
 )
+from core.filtros import Filtragem
+from core.pagination import PaginacaoCandidaturas, resposta_lista
+from core.condicional import GetCondicionalMixin
+from relatorios.agregados import candidaturas_por_estado, candidaturas_por_estado_async
+from core.assincrono import ViewAssincrona
+from django.http import JsonResponse
+from .alocacao import CamasIndisponiveis, alocar
 
 # CORRIGIDO: Importação explícita de classes de permissão
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions, BasePermission
+from rest_framework.exceptions import PermissionDenied
+
+
+# Relações percorridas pelo CandidaturaSerializer (residência e estudante aninhados).
+# Carregadas com JOIN para que as listagens façam um número constante de queries.
+CANDIDATURA_RELACOES = ('residencia', 'estudante')
+
+# Filtros e ?ordem= das listagens de quartos (ver core.filtros).
+FILTRAGEM_QUARTOS = Filtragem(Quarto, {
+    'tipo': ('exact', 'in'),
+    'edificio': ('exact', 'in'),
+}, ordenacao=('id', 'numero'))
 
 
 class EstudantePermission(BasePermission): # Usando BasePermission diretamente
@@ -35,21 +55,29 @@ class EstudantePermission(BasePermission): # Usando BasePermission diretamente
 
 # ----- VIEWS DE CANDIDATURAS (Classes APIView) -----
 
-class ListarCandidaturasView(APIView):
+class ListarCandidaturasView(GetCondicionalMixin, APIView):
     """
     Lista todas as candidaturas e permite a criação de novas.
     Métodos suportados: GET (listar), POST (criar).
     Requer autenticação e permissões de modelo (view_candidatura para GET, add_candidatura para POST).
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Candidatura, ResidenciaCore, Estudante)
+    queryset = Candidatura.objects.select_related(*CANDIDATURA_RELACOES)
+    filtragem = Filtragem(Candidatura, {
+        'status': ('exact', 'in'),
+        'residencia': ('exact', 'in'),
+        'estudante': ('exact',),
+        'data_submissao': ('gt', 'gte', 'lt', 'lte'),
+    }, ordenacao=('data_submissao', 'id'))
 
     def get(self, request, *args, **kwargs):
         """
-        Recupera a lista de todas as candidaturas.
+        Recupera a lista de todas as candidaturas (paginada com ?page_size=, completa em streaming com ?stream=1).
+        Filtros: ?status=, ?residencia= (e __in), ?estudante=, ?data_submissao__gte=/__lte=;
+        ?ordem=-data_submissao (ver core.filtros).
         """
-        candidaturas = Candidatura.objects.all()
-        serializer = CandidaturaSerializer(candidaturas, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return resposta_lista(self, self.queryset.all(), CandidaturaSerializer, PaginacaoCandidaturas)
 
     def post(self, request, *args, **kwargs):
         """
@@ -75,12 +103,13 @@ class AtualizarEstadoCandidaturaView(APIView):
     Requer autenticação e permissão de alteração (change_candidatura).
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    queryset = Candidatura.objects.select_related(*CANDIDATURA_RELACOES)
 
     def put(self, request, id, *args, **kwargs):
         """
         Atualiza o estado de uma candidatura.
         """
-        candidatura = get_object_or_404(Candidatura, pk=id)
+        candidatura = get_object_or_404(self.queryset, pk=id)
         serializer = CandidaturaSerializer(candidatura, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -88,20 +117,23 @@ class AtualizarEstadoCandidaturaView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class MinhaCandidaturaView(APIView):
+class MinhaCandidaturaView(GetCondicionalMixin, APIView):
     """
     Retorna a candidatura do estudante logado.
     Método suportado: GET.
     Requer que o usuário seja estudante e esteja autenticado.
     """
     permission_classes = [IsAuthenticated, EstudantePermission]
+    modelos_versao = (Candidatura, ResidenciaCore, Estudante)
 
     def get(self, request, *args, **kwargs):
         """
         Recupera a candidatura do estudante autenticado.
         """
         try:
-            minha_candidatura = Candidatura.objects.filter(estudante=request.user.estudante).first()
+            minha_candidatura = Candidatura.objects.select_related(*CANDIDATURA_RELACOES).filter(
+                estudante=request.user.estudante
+            ).first()
             if minha_candidatura:
                 serializer = CandidaturaSerializer(minha_candidatura)
                 return Response(serializer.data, status=status.HTTP_200_OK)
@@ -111,24 +143,26 @@ class MinhaCandidaturaView(APIView):
             return Response({"detail": f"Erro ao buscar candidatura: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CandidaturaDetailView(APIView):
+class CandidaturaDetailView(GetCondicionalMixin, APIView):
     """
     Recupera, atualiza ou deleta uma candidatura específica.
     Métodos suportados: GET, PUT, PATCH, DELETE.
     Permissões: Administrador (via DjangoModelPermissions) ou o próprio estudante dono da candidatura.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Candidatura, ResidenciaCore, Estudante)
+    queryset = Candidatura.objects.select_related(*CANDIDATURA_RELACOES)
 
     def get_object(self, pk):
         """
         Helper para obter o objeto Candidatura e verificar permissões de objeto.
         Levanta PermissionDenied se o usuário não tiver acesso.
         """
-        candidatura = get_object_or_404(Candidatura, pk=pk)
+        candidatura = get_object_or_404(self.queryset, pk=pk)
         if self.request.user.has_perm('candidaturas.view_candidatura') or \
            (hasattr(self.request.user, 'estudante') and candidatura.estudante == self.request.user.estudante):
             return candidatura
-        raise permissions.PermissionDenied({"detail": "Você não tem permissão para acessar esta candidatura."})
+        raise PermissionDenied("Você não tem permissão para acessar esta candidatura.")
 
     def get(self, request, pk, *args, **kwargs):
         """
@@ -169,24 +203,26 @@ class CandidaturaDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class CandidaturasPorResidenciaView(APIView):
+class CandidaturasPorResidenciaView(GetCondicionalMixin, APIView):
     """
     Lista as candidaturas para uma residência específica.
     Método suportado: GET.
     Requer autenticação e permissão de visualização de candidatura.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Candidatura, ResidenciaCore, Estudante)
+    queryset = Candidatura.objects.select_related(*CANDIDATURA_RELACOES)
 
     def get(self, request, residencia_id, *args, **kwargs):
         """
         Recupera as candidaturas associadas a uma residência.
         """
-        candidaturas = Candidatura.objects.filter(residencia_id=residencia_id)
+        candidaturas = self.queryset.filter(residencia_id=residencia_id)
         serializer = CandidaturaSerializer(candidaturas, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CandidaturasPorEstudanteView(APIView):
+class CandidaturasPorEstudanteView(GetCondicionalMixin, APIView):
     """
     Lista as candidaturas de um estudante específico (para admins/funcionários)
     ou a própria candidatura do usuário logado (se for estudante).
@@ -194,6 +230,8 @@ class CandidaturasPorEstudanteView(APIView):
     Requer autenticação e permissão de visualização de candidatura.
     """
     permission_classes = [IsAuthenticated] # DjangoModelPermissions não é necessário aqui para a lógica personalizada
+    modelos_versao = (Candidatura, ResidenciaCore, Estudante)
+    queryset = Candidatura.objects.select_related(*CANDIDATURA_RELACOES)
 
     def get(self, request, estudante_id=None, *args, **kwargs):
         """
@@ -203,84 +241,140 @@ class CandidaturasPorEstudanteView(APIView):
             # Para admins/funcionários visualizarem candidaturas de outros
             if not request.user.has_perm('candidaturas.view_candidatura'):
                 return Response({"detail": "Você não tem permissão para ver candidaturas de outros estudantes."}, status=status.HTTP_403_FORBIDDEN)
-            candidaturas = Candidatura.objects.filter(estudante_id=estudante_id)
+            candidaturas = self.queryset.filter(estudante_id=estudante_id)
             serializer = CandidaturaSerializer(candidaturas, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             # Para o próprio estudante visualizar suas candidaturas
             if not hasattr(request.user, 'estudante'):
                 return Response({"detail": "Usuário não é um estudante."}, status=status.HTTP_400_BAD_REQUEST)
-            candidaturas = Candidatura.objects.filter(estudante=request.user.estudante)
+            candidaturas = self.queryset.filter(estudante=request.user.estudante)
             serializer = CandidaturaSerializer(candidaturas, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CandidaturasPorEstadoView(APIView):
+class CandidaturasPorEstadoView(GetCondicionalMixin, APIView):
     """
     Lista a contagem de candidaturas por estado.
     Método suportado: GET.
     Requer autenticação e permissão de visualização de candidatura.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Candidatura,)
+    queryset = Candidatura.objects.all()
 
     def get(self, request, *args, **kwargs):
         """
         Recupera a contagem de candidaturas agrupadas por estado.
         """
-        estados = Candidatura.objects.values('status').annotate(total=Count('id'))
-        status_counts = [{'status': estado['status'], 'count': estado['total']} for estado in estados]
-        return Response({'statusCounts': status_counts}, status=status.HTTP_200_OK)
+        return Response({'statusCounts': candidaturas_por_estado()}, status=status.HTTP_200_OK)
+
+
+class CandidaturasPorEstadoAsyncView(ViewAssincrona):
+    """
+    Variante assíncrona (ASGI) de CandidaturasPorEstadoView.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        return JsonResponse({'statusCounts': await candidaturas_por_estado_async()})
+
+
+class MinhaCandidaturaAsyncView(ViewAssincrona):
+    """
+    Variante assíncrona (ASGI) de MinhaCandidaturaView.
+    """
+    async def get(self, request, *args, **kwargs):
+        if not hasattr(request.user, 'estudante'):
+            return JsonResponse({"detail": "Você não tem permissão para executar essa ação."}, status=status.HTTP_403_FORBIDDEN)
+        minha_candidatura = await Candidatura.objects.select_related(*CANDIDATURA_RELACOES).filter(
+            estudante_id=request.user.estudante.id
+        ).afirst()
+        if minha_candidatura:
+            return JsonResponse(CandidaturaSerializer(minha_candidatura).data)
+        return JsonResponse({"detail": "Você não possui candidatura."}, status=status.HTTP_404_NOT_FOUND)
+
+
+class AlocarCamasView(APIView):
+    """
+    Atribui camas livres às candidaturas aprovadas de uma vez.
+    Método suportado: POST, com o corpo opcional
+    {"residencias": [ids], "tipos_quarto": [...], "preencher_quartos": true, "dry_run": false}.
+    Requer permissão de alteração de cama e de candidatura.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if not request.user.has_perms(['core.change_cama', 'candidaturas.change_candidatura']):
+            return Response({"detail": "Você não tem permissão para alocar camas."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = AlocacaoSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        dados = serializer.validated_data
+        try:
+            plano = alocar(
+                residencia_ids=dados.get('residencias') or None,
+                tipos_quarto=dados.get('tipos_quarto') or None,
+                preencher_quartos=dados['preencher_quartos'],
+                simular=dados['dry_run'],
+            )
+        except CamasIndisponiveis as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(plano.resumo(), status=status.HTTP_200_OK)
 
 
 # ----- VIEWS DE QUARTOS (Classes APIView) -----
 # Estas classes foram movidas para cá para resolver o problema no seu 'candidaturas/views.py'.
 # Idealmente, se Quarto e Cama pertencem à app 'core', estas views deveriam estar em 'core/views.py'.
 
-class ListaVagasView(ListAPIView):
+class ListaVagasView(GetCondicionalMixin, ListAPIView):
     """
     Retorna a lista de quartos com vagas disponíveis.
     Requer autenticação e permissão de visualização de quarto.
     """
     serializer_class = QuartoSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Quarto, Edificio)
+    filtragem = FILTRAGEM_QUARTOS
 
     def get_queryset(self):
-        return Quarto.objects.annotate(
-            num_residentes=Count('camas__residente', distinct=True)
-        ).filter(capacidade__gt=F('num_residentes'))
+        # Lê o contador materializado em vez de agregar as camas de cada quarto.
+        return Quarto.objects.select_related('edificio').filter(capacidade__gt=F('camas_ocupadas'))
 
-class ListarTodosQuartosView(APIView):
+class ListarTodosQuartosView(GetCondicionalMixin, APIView):
     """
     Retorna a lista de todos os quartos para administradores e funcionários.
     Método suportado: GET.
     Requer autenticação e permissão de visualização de quarto.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Quarto, Edificio)
+    queryset = Quarto.objects.select_related('edificio')
+    filtragem = FILTRAGEM_QUARTOS
 
     def get(self, request, *args, **kwargs):
         """
-        Recupera a lista de todos os quartos.
+        Recupera a lista de todos os quartos (paginada com ?page_size=, filtrada
+        com ?tipo= e ?edificio=).
         """
-        quartos = Quarto.objects.annotate(
-            num_residentes=Count('camas__residente', distinct=True)
-        ).order_by('edificio__nome', 'numero')
-        serializer = QuartoSerializer(quartos, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        quartos = self.queryset.order_by('edificio__nome', 'numero')
+        return resposta_lista(self, quartos, QuartoSerializer)
 
 
-class QuartoDetailView(APIView):
+class QuartoDetailView(GetCondicionalMixin, APIView):
     """
     Recupera, atualiza, atualiza parcialmente ou deleta um quarto específico.
     Métodos suportados: GET, PUT, PATCH, DELETE.
     Requer autenticação e permissões de modelo (view_quarto, change_quarto, delete_quarto).
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Quarto, Edificio)
+    queryset = Quarto.objects.select_related('edificio')
 
     def get_object(self, pk):
         """
         Helper para obter o objeto Quarto ou retornar 404.
         """
-        return get_object_or_404(Quarto, pk=pk)
+        return get_object_or_404(self.queryset, pk=pk)
 
     def get(self, request, pk, *args, **kwargs):
         """
@@ -331,6 +425,7 @@ class AlterarDisponibilidadeQuartoView(APIView):
     Requer autenticação e permissão de alteração de quarto.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    queryset = Quarto.objects.all()
 
     def patch(self, request, pk, *args, **kwargs):
         """
@@ -343,8 +438,7 @@ class AlterarDisponibilidadeQuartoView(APIView):
         if not request.user.has_perm('core.change_quarto'):
             return Response({"detail": "Você não tem permissão para alterar a disponibilidade deste quarto."}, status=status.HTTP_403_FORBIDDEN)
 
-        camas_ocupadas = Cama.objects.filter(quarto=quarto, residente__isnull=False).count()
-        disponivel = quarto.capacidade > camas_ocupadas
+        disponivel = quarto.capacidade > quarto.camas_ocupadas
 
         # Se o modelo Quarto tiver um campo 'disponivel', você pode atualizá-lo aqui.
         # Isso garante que a mudança seja persistida no banco de dados.
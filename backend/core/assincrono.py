@@ -0,0 +1,41 @@
+"""
+Base para views assíncronas (servidas por backend.asgi) fora do DRF, cujo
+APIView só suporta handlers síncronos.
+
+A autenticação usa o mesmo JWT das views DRF (accounts.authentication) e as
+permissões o backend em cache; nos pedidos com cache quente nenhum dos dois
+passos vai à base de dados.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import CachedJWTAuthentication
+from .instrumentacao import medir
+
+
+class ViewAssincrona(View):
+    """
+    View com handlers ``async def`` que exige um utilizador autenticado por JWT
+    e, se ``permissao`` estiver definida, essa permissão.
+    """
+    permissao = None
+    mensagem_sem_permissao = 'Você não tem permissão para executar esta ação.'
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            with medir('auth'):
+                autenticado = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+        if autenticado is None:
+            return JsonResponse(
+                {'detail': 'As credenciais de autenticação não foram fornecidas.'},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        request.user = autenticado[0]
+        if self.permissao and not await request.user.ahas_perm(self.permissao):
+            return JsonResponse({'detail': self.mensagem_sem_permissao}, status=status.HTTP_403_FORBIDDEN)
+        return await super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,353 @@
+"""
+Benchmark dos endpoints da API (accounts, candidaturas e relatorios) sobre
+o conjunto de dados sintético de ``core.sintetico``, com comparação contra
+uma baseline gravada no repositório.
+
+Cada ``Caso`` descreve um pedido a uma rota com nome. Para cada escala os
+dados são gerados numa transação desfeita no fim, e cada pedido corre num
+savepoint também desfeito, por isso todas as repetições (incluindo as que
+escrevem) veem exatamente os mesmos dados. Por omissão a cache é limpa antes
+de cada pedido: as queries medidas são as do caminho sem cache, onde um N+1
+se nota logo.
+
+A latência depende da máquina; o número de queries, o código e o tamanho da
+resposta não, e são por isso os valores mais fiáveis a comparar entre
+ambientes diferentes.
+"""
+import gc
+import math
+import platform
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Union
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django_otp.oath import totp
+from django_otp.plugins.otp_totp.models import TOTPDevice
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.models import CustomUser
+from accounts.tokens import TokenPre2FA
+from candidaturas.models import Candidatura
+from . import reservas, sintetico
+from .models import Edificio, Quarto, Cama, Residente, Residencia
+
+# Módulos de URLs cobertos; todas as rotas com nome precisam de um caso.
+MODULOS_URLS = ('accounts.urls', 'candidaturas.urls', 'relatorios.urls')
+
+VERSAO_BASELINE = 1
+
+SENHA_NOVA = 'benchmark-123'
+
+
+class Dados:
+    """
+    Registos de referência de um conjunto gerado, usados nos argumentos das
+    rotas e nos corpos dos pedidos, e os tokens de cada perfil.
+    """
+
+    def __init__(self):
+        self.admin = CustomUser.objects.create_superuser(email='benchmark-admin@exemplo.invalid', password=None)
+        self.candidatura = Candidatura.objects.select_related('estudante__user').order_by('id').first()
+        self.estudante = self.candidatura.estudante
+        self.aluno = self.estudante.user
+        self.residencia = Residencia.objects.order_by('id').first()
+        self.edificio = Edificio.objects.order_by('id').first()
+        self.quarto = Quarto.objects.order_by('id').first()
+        self.cama = Cama.objects.order_by('id').first()
+        self.cama_livre = Cama.objects.filter(residente__isnull=True).order_by('id').first()
+        self.residente = Residente.objects.order_by('id').first()
+        self.tokens = {
+            'admin': str(AccessToken.for_user(self.admin)),
+            'estudante': str(AccessToken.for_user(self.aluno)),
+        }
+
+
+@dataclass
+class Caso:
+    """
+    Um pedido a medir. ``kwargs``, ``corpo`` e ``token`` são funções de
+    ``Dados``, e ``params`` um dicionário ou também uma função; ``corpo`` e ``token`` correm dentro do savepoint do pedido,
+    por isso podem criar registos (uma reserva, um dispositivo TOTP...).
+    ``utilizador`` é 'admin', 'estudante' ou ``None`` (anónimo).
+    """
+    rota: str
+    metodo: str = 'get'
+    nome: Optional[str] = None
+    kwargs: Optional[Callable] = None
+    params: Union[dict, Callable] = field(default_factory=dict)
+    corpo: Optional[Callable] = None
+    multipart: bool = False
+    utilizador: Optional[str] = 'admin'
+    token: Optional[Callable] = None
+    # Menos repetições nos pedidos que fazem hashing de passwords.
+    repeticoes: Optional[int] = None
+
+    def __post_init__(self):
+        self.nome = self.nome or self.rota
+
+    def pedido(self, dados):
+        url = reverse(self.rota, kwargs=self.kwargs(dados) if self.kwargs else None)
+        params = self.params(dados) if callable(self.params) else self.params
+        token = self.token(dados) if self.token else dados.tokens.get(self.utilizador)
+        return url, params, self.corpo(dados) if self.corpo else None, token
+
+
+def _credenciais(dados):
+    return {'email': dados.aluno.email, 'password': sintetico.SENHA}
+
+
+def _registo(dados):
+    return {'email': 'benchmark-novo@exemplo.invalid', 'password': SENHA_NOVA, 'password2': SENHA_NOVA}
+
+
+def _refresh(dados):
+    return {'refresh': str(RefreshToken.for_user(dados.aluno))}
+
+
+def _pre_2fa(dados):
+    return str(TokenPre2FA.for_user(dados.aluno))
+
+
+def _codigo_2fa(dados):
+    dispositivo = TOTPDevice.objects.create(user=dados.aluno, name='benchmark', confirmed=True)
+    codigo = totp(dispositivo.bin_key, dispositivo.step, dispositivo.t0, dispositivo.digits, dispositivo.drift)
+    return {'otp_token': f'{codigo:0{dispositivo.digits}d}'}
+
+
+def _confirmacao(dados):
+    token, _ = reservas.reservar(dados.cama_livre.pk, dados.admin)
+    return {'token': str(token), 'residente': Residente.objects.create(nome='Benchmark').pk}
+
+
+def _libertacao(dados):
+    token, _ = reservas.reservar(dados.cama_livre.pk, dados.admin)
+    return {'token': str(token)}
+
+
+def _ficheiro_camas(dados):
+    linhas = ''.join(f'{dados.quarto.numero},BENCH-{i}\n' for i in range(100))
+    return {'ficheiro': SimpleUploadedFile('camas.csv', f'quarto,numero\n{linhas}'.encode(), 'text/csv')}
+
+
+def _pk(atributo):
+    return lambda dados: {'pk': getattr(dados, atributo).pk}
+
+
+CASOS = [
+    # ----- accounts -----
+    Caso('user-list'),
+    Caso('user-detail', kwargs=_pk('aluno')),
+    Caso('user-create', 'post', corpo=_registo, repeticoes=3),
+    Caso('register', 'post', corpo=_registo, utilizador=None, repeticoes=3),
+    Caso('register-async', 'post', corpo=_registo, utilizador=None, repeticoes=3),
+    Caso('login', 'post', corpo=_credenciais, utilizador=None, repeticoes=3),
+    Caso('login-async', 'post', corpo=_credenciais, utilizador=None, repeticoes=3),
+    Caso('verify-2fa', 'post', corpo=_codigo_2fa, token=_pre_2fa),
+    Caso('token_obtain_pair', 'post', corpo=_credenciais, utilizador=None, repeticoes=3),
+    Caso('token_refresh_custom', 'post', corpo=_refresh, utilizador=None),
+    Caso('token_refresh_simplejwt', 'post', corpo=_refresh, utilizador=None),
+    Caso('generate-2fa', 'post', token=_pre_2fa),
+    Caso('generate-2fa-async', 'post', token=_pre_2fa),
+
+    # ----- candidaturas -----
+    Caso('lista_candidaturas'),
+    Caso('lista_candidaturas', nome='lista_candidaturas (página)', params={'page_size': 50}),
+    Caso(
+        'lista_candidaturas', nome='lista_candidaturas (filtros)',
+        params=lambda dados: {'status': 'pendente', 'residencia': dados.residencia.pk, 'ordem': '-data_submissao', 'page_size': 50},
+    ),
+    Caso('candidaturas'),
+    Caso('detalhe_candidatura', kwargs=_pk('candidatura')),
+    Caso('candidaturas_por_residencia', kwargs=lambda dados: {'residencia_id': dados.residencia.pk}),
+    Caso('candidaturas_por_estudante', kwargs=lambda dados: {'estudante_id': dados.estudante.pk}),
+    Caso('candidaturas_por_estado'),
+    Caso('listar_candidaturas_cbv'),
+    Caso('atualizar_estado', 'put', kwargs=lambda dados: {'id': dados.candidatura.pk}, corpo=lambda dados: {'status': 'em_analise'}),
+    Caso('minha_candidatura_cbv', utilizador='estudante'),
+    Caso('candidaturas_por_estado_async'),
+    Caso('minha_candidatura_async', utilizador='estudante'),
+    Caso('alocar_camas', 'post', corpo=lambda dados: {}),
+    Caso('lista_vagas'),
+    Caso('listar_todos_quartos'),
+    Caso('editar_quarto', kwargs=_pk('quarto')),
+    Caso('editar_quarto', 'patch', nome='editar_quarto (patch)', kwargs=_pk('quarto'), corpo=lambda dados: {'tipo': 'triplo'}),
+    Caso('excluir_quarto', 'delete', kwargs=_pk('quarto')),
+    Caso('alterar_disponibilidade_quarto', 'patch', kwargs=_pk('quarto'), corpo=lambda dados: {}),
+
+    # ----- relatorios -----
+    Caso('lista_residentes'),
+    Caso('lista_residentes', nome='lista_residentes (página)', params={'page_size': 50}),
+    Caso('detalhe_residente', kwargs=_pk('residente')),
+    Caso('residentes_por_quarto', kwargs=lambda dados: {'quarto_id': dados.quarto.pk}),
+    Caso('total_residentes'),
+    Caso('residentes_por_edificio', params=lambda dados: {'edificio_id': dados.edificio.pk}),
+    Caso('lista_edificios'),
+    Caso('detalhe_edificio', kwargs=_pk('edificio')),
+    Caso('edificios_por_tipo'),
+    Caso('lista_quartos'),
+    Caso('detalhe_quarto', kwargs=_pk('quarto')),
+    Caso('quartos_por_edificio', kwargs=lambda dados: {'edificio_id': dados.edificio.pk}),
+    Caso('quartos_por_tipo', kwargs=lambda dados: {'tipo': 'duplo'}),
+    Caso('relatorio_quartos'),
+    Caso('lista_camas'),
+    Caso('lista_camas', nome='lista_camas (página)', params={'page_size': 50}),
+    Caso('lista_camas', nome='lista_camas (fields)', params={'fields': 'id,numero,status,quarto', 'expand': '', 'page_size': 50}),
+    Caso('detalhe_cama', kwargs=_pk('cama')),
+    Caso('camas_por_quarto', kwargs=lambda dados: {'quarto_id': dados.quarto.pk}),
+    Caso('camas_por_status', kwargs=lambda dados: {'status_param': 'Disponível'}),
+    Caso('relatorio_camas'),
+    Caso('reservar_cama', 'post', kwargs=_pk('cama_livre')),
+    Caso('confirmar_reserva_cama', 'post', kwargs=_pk('cama_livre'), corpo=_confirmacao),
+    Caso('libertar_reserva_cama', 'post', kwargs=_pk('cama_livre'), corpo=_libertacao),
+    Caso('lista_residencias'),
+    Caso('detalhe_residencia', kwargs=_pk('residencia')),
+    Caso('dashboard'),
+    Caso('pesquisa', params=lambda dados: {'q': dados.residente.nome}),
+    # Sem a segunda letra do nome: a pesquisa tem de tolerar o erro.
+    Caso('pesquisa', nome='pesquisa (erro de escrita)', params=lambda dados: {'q': dados.residente.nome[0] + dados.residente.nome[2:]}),
+    Caso('exportar', nome='exportar (candidaturas)', kwargs=lambda dados: {'tipo': 'candidaturas'}),
+    Caso('exportar', nome='exportar (residentes)', kwargs=lambda dados: {'tipo': 'residentes'}),
+    Caso('exportar', nome='exportar (ocupacao-camas xlsx)', kwargs=lambda dados: {'tipo': 'ocupacao-camas'}, params={'formato': 'xlsx'}),
+    Caso('importar', 'post', nome='importar (camas)', kwargs=lambda dados: {'tipo': 'camas'}, corpo=_ficheiro_camas, multipart=True),
+    Caso('total_residentes_async'),
+    Caso('relatorio_quartos_async'),
+    Caso('relatorio_camas_async'),
+    Caso('dashboard_async'),
+]
+
+
+def rotas(modulos=MODULOS_URLS):
+    """Nomes das rotas definidas em ``modulos``, incluindo as de ``include()``."""
+    nomes = set()
+
+    def percorrer(padroes):
+        for padrao in padroes:
+            if isinstance(padrao, URLResolver):
+                percorrer(padrao.url_patterns)
+            elif isinstance(padrao, URLPattern) and padrao.name:
+                nomes.add(padrao.name)
+
+    for modulo in modulos:
+        percorrer(get_resolver(modulo).url_patterns)
+    return nomes
+
+
+def rotas_sem_caso(casos=CASOS):
+    return sorted(rotas() - {caso.rota for caso in casos})
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo."""
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+def medir(caso, dados, cliente, repeticoes, aquecimento=1, limpar_cache=True):
+    """
+    Executa o pedido ``aquecimento + repeticoes`` vezes e devolve o código,
+    o p50/p95 da latência (ms), as queries e o tamanho da resposta (bytes)
+    da última repetição.
+    """
+    latencias = []
+    for i in range(aquecimento + (caso.repeticoes or repeticoes)):
+        if limpar_cache:
+            cache.clear()
+        with transaction.atomic():
+            url, params, corpo, token = caso.pedido(dados)
+            opcoes = {'headers': {'Authorization': f'Bearer {token}'}} if token else {}
+            if caso.multipart:
+                opcoes['data'] = corpo
+            elif corpo is not None:
+                opcoes.update(data=corpo, content_type='application/json')
+            metodo = getattr(cliente, caso.metodo)
+            # O registo de queries tem tamanho limitado; sem o limpar, a
+            # contagem fica a zero ao fim de alguns milhares.
+            reset_queries()
+            # Como no timeit, sem pausas do garbage collector durante a medição.
+            gc.collect()
+            gc.disable()
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    inicio = time.perf_counter()
+                    resposta = metodo(url, query_params=params, **opcoes)
+                    conteudo = b''.join(resposta.streaming_content) if resposta.streaming else resposta.content
+                    duracao = time.perf_counter() - inicio
+            finally:
+                gc.enable()
+            transaction.set_rollback(True)
+        if i >= aquecimento:
+            latencias.append(duracao * 1000)
+    return {
+        'codigo': resposta.status_code,
+        'p50_ms': round(statistics.median(latencias), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'queries': len(queries),
+        'bytes': len(conteudo),
+    }
+
+
+def executar(escalas, semente=0, repeticoes=10, aquecimento=1, limpar_cache=True, filtro=None, progresso=None):
+    """
+    Gera os dados de cada escala e mede todos os casos (ou só os de nome em
+    ``filtro``). Devolve ``{escala: {nome do caso: métricas}}``. Tem de
+    correr numa base de dados vazia, normalmente a de testes.
+    """
+    casos = [caso for caso in CASOS if not filtro or caso.nome in filtro or caso.rota in filtro]
+    cliente = Client()
+    resultados = {}
+    for escala in escalas:
+        with transaction.atomic():
+            sintetico.gerar(escala, semente)
+            dados = Dados()
+            resultados[str(escala)] = medicoes = {}
+            for caso in casos:
+                medicoes[caso.nome] = medir(caso, dados, cliente, repeticoes, aquecimento, limpar_cache)
+                if progresso:
+                    progresso(escala, caso.nome, medicoes[caso.nome])
+            transaction.set_rollback(True)
+        cache.clear()
+    return resultados
+
+
+def ambiente():
+    return {
+        'baseDeDados': connection.vendor,
+        'python': platform.python_version(),
+        'maquina': platform.machine(),
+    }
+
+
+def comparar(resultados, baseline, tolerancias=None):
+    """
+    Compara ``resultados`` com as medições da baseline e devolve a lista de
+    regressões (texto). Casos ou escalas sem baseline são ignorados; as
+    tolerâncias em falta vêm de ``settings.BENCHMARK_TOLERANCIAS``.
+    """
+    tolerancias = {**settings.BENCHMARK_TOLERANCIAS, **(tolerancias or {})}
+    regressoes = []
+    for escala, medicoes in resultados.items():
+        anteriores = baseline.get('escalas', {}).get(escala, {})
+        for nome, atual in medicoes.items():
+            base = anteriores.get(nome)
+            if base is None:
+                continue
+            prefixo = f'[escala {escala}] {nome}'
+            if atual['codigo'] != base['codigo']:
+                regressoes.append(f"{prefixo}: código {base['codigo']} -> {atual['codigo']}")
+            if atual['queries'] > base['queries'] + tolerancias['queries']:
+                regressoes.append(f"{prefixo}: {base['queries']} -> {atual['queries']} queries")
+            for percentil_, fator in (('p50', tolerancias['latencia']), ('p95', tolerancias['latencia_p95'])):
+                chave = f'{percentil_}_ms'
+                if fator is not None and atual[chave] > base[chave] * fator + tolerancias['folga_ms']:
+                    regressoes.append(f'{prefixo}: {percentil_} {base[chave]}ms -> {atual[chave]}ms')
+            if atual['bytes'] > base['bytes'] * tolerancias['tamanho']:
+                regressoes.append(f"{prefixo}: resposta {base['bytes']} -> {atual['bytes']} bytes")
+    return regressoes
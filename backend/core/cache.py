@@ -0,0 +1,147 @@
+"""
+Cache de resultados agregados com invalidação por modelo, e carimbos de
+versão por modelo usados nos GET condicionais (core.condicional).
+
+Cada função decorada com ``em_cache`` declara os modelos de que depende.
+Quando um desses modelos é gravado ou apagado (sinais em core.signals) ou
+alterado em massa (``invalidar``), as entradas correspondentes são apagadas.
+O backend é o ``CACHES['default']`` do Django (ver ``CACHE_BACKEND`` nos
+settings); com vários processos use um backend partilhado, como o de ficheiros.
+
+Os carimbos de versão expiram ao fim de ``CACHE_VERSOES_TIMEOUT`` segundos e
+são então renovados. Numa cache por processo, uma gravação só renova os
+carimbos do processo que a fez; esse é o atraso máximo com que os outros
+processos deixam de responder 304 (e de usar o índice de pesquisa antigo).
+"""
+import inspect
+import uuid
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+
+PREFIXO = 'agregado:'
+PREFIXO_VERSAO = 'versao:'
+_VAZIO = object()
+
+# label do modelo ('core.cama') -> chaves que dependem dele
+_dependencias = defaultdict(set)
+# chave -> função de cálculo, para o aquecimento da cache
+_calculos = {}
+
+# Modelos com carimbo de versão: os ``modelos_versao`` dos GET condicionais e
+# as fontes da pesquisa (validados quando são declarados). Só as gravações
+# destes modelos, e dos que têm agregados em cache, invalidam a cache.
+MODELOS_VERSIONADOS = frozenset({
+    'accounts.customuser', 'candidaturas.candidatura', 'estudantes.estudante',
+    'core.cama', 'core.edificio', 'core.quarto', 'core.residencia', 'core.residente',
+})
+
+
+def _label(modelo):
+    return modelo if isinstance(modelo, str) else modelo._meta.label_lower
+
+
+def em_cache(chave, modelos):
+    """
+    Guarda em cache o resultado da função (sem argumentos) sob ``chave`` até
+    que um dos ``modelos`` mude, ou até ``CACHE_AGREGADOS_TIMEOUT`` segundos.
+    Aceita também funções ``async def``, que usam a API assíncrona da cache.
+    """
+    chave_cache = PREFIXO + chave
+    for modelo in modelos:
+        _dependencias[_label(modelo)].add(chave_cache)
+
+    def decorador(funcao):
+        if inspect.iscoroutinefunction(funcao):
+            # Variante assíncrona de um agregado: partilha a chave (e o valor)
+            # com a função síncrona registada com a mesma ``chave``.
+            @wraps(funcao)
+            async def envolvida_async():
+                valor = await cache.aget(chave_cache, _VAZIO)
+                if valor is _VAZIO:
+                    valor = await funcao()
+                    await cache.aset(chave_cache, valor, settings.CACHE_AGREGADOS_TIMEOUT)
+                return valor
+
+            envolvida_async.calcular = funcao
+            return envolvida_async
+
+        @wraps(funcao)
+        def envolvida():
+            valor = cache.get(chave_cache, _VAZIO)
+            if valor is _VAZIO:
+                valor = funcao()
+                cache.set(chave_cache, valor, settings.CACHE_AGREGADOS_TIMEOUT)
+            return valor
+
+        envolvida.calcular = funcao
+        _calculos[chave_cache] = funcao
+        return envolvida
+
+    return decorador
+
+
+def versionados(modelos):
+    """Levanta ``ImproperlyConfigured`` se algum dos modelos não tiver carimbo de versão."""
+    if em_falta := {_label(modelo) for modelo in modelos} - MODELOS_VERSIONADOS:
+        raise ImproperlyConfigured(
+            f"Modelos sem carimbo de versão: {', '.join(sorted(em_falta))}. Acrescente-os a MODELOS_VERSIONADOS."
+        )
+
+
+def tem_dependentes(modelo):
+    """Indica se gravar ``modelo`` tem de invalidar alguma coisa na cache."""
+    label = _label(modelo)
+    return label in MODELOS_VERSIONADOS or label in _dependencias
+
+
+def _nova_versao():
+    return uuid.uuid4().hex, timezone.now()
+
+
+def versoes(modelos):
+    """
+    Devolve ``{label: (token, modificado_em)}`` dos modelos, numa única ida à
+    cache. Um modelo ainda sem carimbo recebe um novo.
+    """
+    chaves = {PREFIXO_VERSAO + _label(modelo): _label(modelo) for modelo in modelos}
+    encontradas = cache.get_many(list(chaves))
+    em_falta = {chave: _nova_versao() for chave in chaves if chave not in encontradas}
+    if em_falta:
+        cache.set_many(em_falta, settings.CACHE_VERSOES_TIMEOUT)
+        encontradas.update(em_falta)
+    return {label: encontradas[chave] for chave, label in chaves.items()}
+
+
+def invalidar(*modelos):
+    """
+    Apaga as entradas que dependem de ``modelos`` (classes ou labels) e
+    renova os seus carimbos de versão. Deve ser chamada após
+    ``update()``/``bulk_create()``, que não disparam sinais.
+    """
+    labels = {_label(modelo) for modelo in modelos}
+    chaves = list(set().union(*(_dependencias.get(label, ()) for label in labels)))
+
+    def apagar():
+        cache.set_many({PREFIXO_VERSAO + label: _nova_versao() for label in labels}, settings.CACHE_VERSOES_TIMEOUT)
+        if chaves:
+            cache.delete_many(chaves)
+
+    apagar()
+    # Um pedido concorrente pode recalcular antes do commit com os dados
+    # antigos; invalida de novo quando a transação terminar.
+    transaction.on_commit(apagar)
+
+
+def aquecer():
+    """
+    Recalcula todas as entradas registadas e devolve as chaves aquecidas.
+    """
+    for chave, funcao in _calculos.items():
+        cache.set(chave, funcao(), settings.CACHE_AGREGADOS_TIMEOUT)
+    return [chave[len(PREFIXO):] for chave in _calculos]
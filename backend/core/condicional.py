@@ -0,0 +1,71 @@
+"""
+GET condicional (ETag / If-None-Match e Last-Modified / If-Modified-Since).
+
+Os validadores vêm dos carimbos de versão dos modelos apresentados pela view
+(core.cache.versoes), renovados a cada gravação e, no máximo, ao fim de
+``CACHE_VERSOES_TIMEOUT`` segundos (o atraso com que uma gravação chega aos
+outros processos quando a cache é por processo). Um 304 custa uma leitura da
+cache: não executa a query da listagem nem o serializer. A ETag inclui o
+utilizador e o URL completo (query string incluída) e é assinada com a
+SECRET_KEY, pelo que um cliente só obtém 304 para uma resposta que já recebeu.
+"""
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date
+from rest_framework.exceptions import APIException
+
+from .cache import versionados, versoes
+
+
+class _NaoModificado(APIException):
+
+    def __init__(self, resposta):
+        self.resposta = resposta
+
+
+class GetCondicionalMixin:
+    """
+    Mixin para views DRF que respondem 304 quando nenhum dos ``modelos_versao``
+    mudou desde a resposta anterior. A verificação é feita depois da
+    autenticação e das permissões da view.
+    """
+    modelos_versao = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        versionados(cls.modelos_versao)
+
+    def _validadores(self, request):
+        carimbos = versoes(self.modelos_versao)
+        assinatura = salted_hmac(
+            'core.condicional',
+            f'{request.user.pk}:{request.get_full_path()}:'
+            + ','.join(f'{label}={token}' for label, (token, _) in sorted(carimbos.items())),
+        ).hexdigest()[:32]
+        modificado = max(momento for _, momento in carimbos.values())
+        return f'"{assinatura}"', modificado.timestamp()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validadores = None
+        if request.method in ('GET', 'HEAD') and self.modelos_versao:
+            self.validadores = self._validadores(request)
+            etag, modificado = self.validadores
+            resposta = get_conditional_response(request, etag=etag, last_modified=int(modificado))
+            if resposta is not None:
+                raise _NaoModificado(resposta)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NaoModificado):
+            return exc.resposta
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'validadores', None) and response.status_code in (200, 304):
+            etag, modificado = self.validadores
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modificado)
+            # O cliente guarda a resposta, mas revalida-a sempre.
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,72 @@
+"""
+Executores partilhados para trabalho de CPU fora das threads dos pedidos
+(renderização de QR codes, hashing de passwords), em views síncronas
+(``executar``) ou assíncronas (``executar_async``).
+
+Cada executor tem um número fixo de threads e um limite de tarefas em espera;
+acima desse limite ``submeter`` levanta ``ExecutorSaturado`` em vez de
+acumular pedidos, e as views respondem 503 com Retry-After.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class ExecutorSaturado(Exception):
+    """Todas as threads estão ocupadas e a fila de espera está cheia."""
+
+
+class ExecutorLimitado:
+
+    def __init__(self, nome, max_workers, max_pendentes):
+        self.nome = nome
+        self.max_workers = max_workers
+        self.max_pendentes = max_pendentes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=nome)
+        self._vagas = threading.BoundedSemaphore(max_workers + max_pendentes)
+
+    def submeter(self, funcao, *args, **kwargs):
+        if not self._vagas.acquire(blocking=False):
+            raise ExecutorSaturado(f'Executor {self.nome} saturado.')
+
+        def tarefa():
+            # A vaga é libertada antes de o resultado ficar visível.
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self._vagas.release()
+
+        try:
+            return self._executor.submit(tarefa)
+        except BaseException:
+            self._vagas.release()
+            raise
+
+    def executar(self, funcao, *args, timeout=None, **kwargs):
+        """
+        Executa ``funcao`` no executor e espera pelo resultado.
+        """
+        return self.submeter(funcao, *args, **kwargs).result(timeout)
+
+    async def executar_async(self, funcao, *args, **kwargs):
+        """
+        Como ``executar``, mas sem bloquear o event loop (views assíncronas).
+        """
+        return await asyncio.wrap_future(self.submeter(funcao, *args, **kwargs))
+
+
+_executores = {}
+_bloqueio = threading.Lock()
+
+
+def executor(nome):
+    """
+    Devolve o executor ``nome`` configurado em ``settings.EXECUTORES``,
+    criado na primeira utilização e partilhado pelo processo.
+    """
+    with _bloqueio:
+        if nome not in _executores:
+            _executores[nome] = ExecutorLimitado(nome, **settings.EXECUTORES[nome])
+        return _executores[nome]
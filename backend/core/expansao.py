@@ -0,0 +1,135 @@
+"""
+Campos à escolha (``?fields=``) e relações aninhadas a pedido (``?expand=``)
+nos serializers.
+
+Um serializer com ``CamposDinamicosMixin`` declara em ``expansoes`` as
+relações que podem ser devolvidas aninhadas, com o serializer de cada uma::
+
+    class CamaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+        expansoes = {'quarto': QuartoSerializer, 'residente': ResidenteSerializer}
+
+- ``?fields=id,numero,quarto`` devolve só esses campos; ``quarto.numero``
+  escolhe campos da relação (e implica expandi-la).
+- ``?expand=quarto,quarto.edificio`` aninha exatamente essas relações; as
+  outras são devolvidas como id. Sem ``?expand=`` são aninhadas as de
+  ``expandidas_por_omissao`` (por omissão todas), como antes desta opção.
+
+``carregar_relacoes`` (aplicada pelo backend ``RelacoesPedidas`` nas views
+genéricas e pela ``resposta_lista`` de core.pagination) troca o
+``select_related`` da view pelos JOINs das relações que vão ser aninhadas:
+uma relação devolvida como id ou fora de ``?fields=`` não é carregada.
+Nomes desconhecidos dão 400.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+PARAMETRO_CAMPOS = 'fields'
+PARAMETRO_EXPANDIR = 'expand'
+
+_DO_PEDIDO = object()
+
+
+def arvore(valor):
+    """``'id,quarto.numero'`` -> ``{'id': {}, 'quarto': {'numero': {}}}``."""
+    raiz = {}
+    for caminho in valor.split(','):
+        no = raiz
+        for nome in caminho.strip().split('.'):
+            if nome:
+                no = no.setdefault(nome, {})
+    return raiz
+
+
+class CamposDinamicosMixin:
+    """
+    ``campos`` e ``expandir`` (árvores de ``arvore()``, ou ``None``) podem ser
+    passados ao construtor; caso contrário vêm do pedido em ``context``. Os
+    serializers aninhados recebem-nos sempre do serializer de cima.
+    """
+    expansoes = {}
+    # None: todas as ``expansoes`` ficam aninhadas quando não há ?expand=.
+    expandidas_por_omissao = None
+
+    def __init__(self, *args, campos=_DO_PEDIDO, expandir=_DO_PEDIDO, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._campos = campos
+        self._expandir = expandir
+
+    def selecao(self):
+        """``(campos, expandir)`` deste serializer."""
+        if self._campos is not _DO_PEDIDO:
+            return self._campos, self._expandir
+        request = self.context.get('request')
+        parametros = request.query_params if request is not None else {}
+        campos = arvore(parametros[PARAMETRO_CAMPOS]) if PARAMETRO_CAMPOS in parametros else None
+        expandir = arvore(parametros[PARAMETRO_EXPANDIR]) if PARAMETRO_EXPANDIR in parametros else None
+        return campos or None, expandir
+
+    def expandidas(self):
+        """``{relação: serializer aninhado}`` das relações a aninhar."""
+        campos, expandir = self.selecao()
+        if expandir is not None and (desconhecidas := set(expandir) - set(self.expansoes)):
+            raise ParseError(f"Relações que não podem ser expandidas: {', '.join(sorted(desconhecidas))}.")
+        por_omissao = self.expansoes if self.expandidas_por_omissao is None else self.expandidas_por_omissao
+        expandidas = {}
+        for nome, classe in self.expansoes.items():
+            if campos is not None and nome not in campos:
+                continue
+            sub_campos = (campos or {}).get(nome) or None
+            if expandir is None:
+                ativa, sub_expandir = nome in por_omissao or sub_campos is not None, None
+            else:
+                ativa, sub_expandir = nome in expandir or sub_campos is not None, expandir.get(nome, {})
+            if ativa:
+                expandidas[nome] = classe(read_only=True, campos=sub_campos, expandir=sub_expandir)
+        return expandidas
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandidas = self.expandidas()
+        for nome in self.expansoes:
+            if nome not in fields:
+                continue
+            if nome in expandidas:
+                fields[nome] = expandidas[nome]
+            else:
+                # Só leitura, como a relação aninhada que substitui.
+                fields[nome] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+        campos, _ = self.selecao()
+        if campos is not None:
+            if desconhecidos := set(campos) - set(fields):
+                raise ParseError(f"Campos desconhecidos: {', '.join(sorted(desconhecidos))}.")
+            fields = {nome: campo for nome, campo in fields.items() if nome in campos or campo.write_only}
+        return fields
+
+    def relacoes(self):
+        """Caminhos de ``select_related`` das relações que vão ser aninhadas."""
+        caminhos = []
+        for nome, campo in self.fields.items():
+            if isinstance(campo, CamposDinamicosMixin):
+                caminhos.append(nome)
+                caminhos += [f'{nome}__{caminho}' for caminho in campo.relacoes()]
+        return caminhos
+
+
+def carregar_relacoes(queryset, serializer_class, request):
+    """
+    Substitui o ``select_related`` de ``queryset`` pelas relações que o
+    serializer vai aninhar neste pedido. Valida ``?fields=`` e ``?expand=``
+    antes de a resposta começar (também em streaming).
+    """
+    if not issubclass(serializer_class, CamposDinamicosMixin):
+        return queryset
+    relacoes = serializer_class(context={'request': request}).relacoes()
+    queryset = queryset.select_related(None)
+    # Sem argumentos, select_related() seguiria todas as chaves estrangeiras.
+    return queryset.select_related(*relacoes) if relacoes else queryset
+
+
+class RelacoesPedidas(BaseFilterBackend):
+    """Backend do DRF que aplica ``carregar_relacoes`` nas views genéricas."""
+
+    def filter_queryset(self, request, queryset, view):
+        return carregar_relacoes(queryset, view.get_serializer_class(), request)
@@ -0,0 +1,161 @@
+"""
+Planos de execução (EXPLAIN) das queries das views com filtros, para
+verificar antes de cada release que os índices continuam a ser usados.
+
+No PostgreSQL cada query corre com ``EXPLAIN (ANALYZE, FORMAT JSON)`` e é
+assinalado todo o ``Seq Scan`` seletivo: o filtro descartou mais linhas do
+que devolveu numa tabela com pelo menos ``limite_linhas`` linhas. Um scan
+que devolve a maior parte da tabela (por exemplo um GROUP BY sobre todas as
+linhas) é o plano certo e só é mostrado. No SQLite, sem ANALYZE nem contagens
+por nó, é assinalado o ``SCAN`` sem índice das tabelas que o caso filtra.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+from django.db import connection
+from django.db.models import Count, F
+
+from candidaturas.models import Candidatura
+from candidaturas.views import CANDIDATURA_RELACOES
+from relatorios import agregados
+from .models import Edificio, Quarto, Cama, Residente
+from .reservas import sem_reserva_ativa
+
+
+class Amostra:
+    """Ids existentes no conjunto de dados, usados nos filtros."""
+
+    def __init__(self):
+        candidatura = Candidatura.objects.order_by('id').first()
+        self.residencia_id = candidatura.residencia_id if candidatura else 0
+        self.edificio_id = Edificio.objects.order_by('id').values_list('id', flat=True).first() or 0
+        self.quarto_id = Quarto.objects.order_by('id').values_list('id', flat=True).first() or 0
+
+
+@dataclass
+class Consulta:
+    """
+    A query de uma view. ``filtradas`` são os modelos cujas linhas o filtro
+    da view deve encontrar por índice (usado no SQLite).
+    """
+    view: str
+    queryset: Callable
+    filtradas: tuple = field(default_factory=tuple)
+
+
+CONSULTAS = [
+    Consulta('CandidaturasPorEstadoView', lambda amostra: agregados._estados()),
+    Consulta(
+        'CandidaturasPorResidenciaView',
+        lambda amostra: Candidatura.objects.select_related(*CANDIDATURA_RELACOES).filter(residencia_id=amostra.residencia_id),
+        (Candidatura,),
+    ),
+    Consulta(
+        'CandidaturasPorResidenciaView (estado)',
+        lambda amostra: Candidatura.objects.filter(residencia_id=amostra.residencia_id, status='pendente'),
+        (Candidatura,),
+    ),
+    Consulta(
+        'AlocarCamasView (candidaturas)',
+        lambda amostra: Candidatura.objects.filter(status='aprovado', residente__isnull=True).order_by('data_submissao', 'id'),
+        (Candidatura,),
+    ),
+    Consulta(
+        'AlocarCamasView (camas livres)',
+        lambda amostra: Cama.objects.filter(
+            sem_reserva_ativa(), quarto__edificio_id__in=[amostra.edificio_id], residente__isnull=True,
+        ).select_related('quarto__edificio'),
+        (Cama,),
+    ),
+    Consulta('CamasPorStatusView', lambda amostra: Cama.objects.filter(status='Ocupado'), (Cama,)),
+    Consulta('CamasPorQuartoView', lambda amostra: Cama.objects.filter(quarto_id=amostra.quarto_id), (Cama,)),
+    Consulta('QuartosPorTipoView', lambda amostra: Quarto.objects.filter(tipo='triplo'), (Quarto,)),
+    Consulta('QuartosPorEdificioView', lambda amostra: Quarto.objects.filter(edificio_id=amostra.edificio_id), (Quarto,)),
+    Consulta(
+        'EdificiosPorTipoView',
+        lambda amostra: Edificio.objects.values('tipo').annotate(count=Count('id')).order_by('tipo'),
+    ),
+    Consulta(
+        'ResidentesPorEdificioView',
+        lambda amostra: Residente.objects.filter(cama__quarto__edificio_id=amostra.edificio_id).distinct(),
+    ),
+    Consulta(
+        'ListaVagasView',
+        lambda amostra: Quarto.objects.select_related('edificio').filter(capacidade__gt=F('camas_ocupadas')),
+    ),
+]
+
+
+@dataclass
+class Plano:
+    consulta: Consulta
+    texto: str
+    # (tabela, linhas devolvidas, linhas descartadas pelo filtro ou None)
+    scans: list
+    assinalados: list
+
+
+def _nos(plano):
+    yield plano
+    for filho in plano.get('Plans', ()):
+        yield from _nos(filho)
+
+
+def _texto_postgresql(no, nivel=0):
+    """Resumo do plano em árvore: tipo de nó, tabela, índice e linhas reais."""
+    detalhe = f" on {no['Relation Name']}" if 'Relation Name' in no else ''
+    if 'Index Name' in no:
+        detalhe += f" using {no['Index Name']}"
+    linhas = [f"{'  ' * nivel}-> {no['Node Type']}{detalhe} (rows={no['Actual Rows']} loops={no['Actual Loops']})"]
+    for filho in no.get('Plans', ()):
+        linhas.extend(_texto_postgresql(filho, nivel + 1))
+    return linhas
+
+
+def _postgresql(consulta, queryset, linhas_por_tabela, limite_linhas):
+    plano = json.loads(queryset.explain(format='json', analyze=True))[0]['Plan']
+    scans, assinalados = [], []
+    for no in _nos(plano):
+        if 'Seq Scan' not in no['Node Type']:
+            continue
+        tabela = no['Relation Name']
+        devolvidas = no['Actual Rows'] * no['Actual Loops']
+        descartadas = no.get('Rows Removed by Filter', 0) * no['Actual Loops']
+        scans.append((tabela, devolvidas, descartadas))
+        if descartadas > devolvidas and linhas_por_tabela.get(tabela, descartadas + devolvidas) >= limite_linhas:
+            assinalados.append(tabela)
+    return Plano(consulta, '\n'.join(_texto_postgresql(plano)), scans, assinalados)
+
+
+SCAN_SQLITE = re.compile(r'\bSCAN (\w+)(.*)')
+
+
+def _sqlite(consulta, queryset, linhas_por_tabela, limite_linhas):
+    texto = queryset.explain()
+    filtradas = {modelo._meta.db_table for modelo in consulta.filtradas}
+    scans, assinalados = [], []
+    for linha in texto.splitlines():
+        encontrado = SCAN_SQLITE.search(linha)
+        if not encontrado or 'USING' in encontrado.group(2):
+            continue
+        tabela = encontrado.group(1)
+        scans.append((tabela, None, None))
+        if tabela in filtradas and linhas_por_tabela.get(tabela, 0) >= limite_linhas:
+            assinalados.append(tabela)
+    return Plano(consulta, texto, scans, assinalados)
+
+
+def explicar(consultas=CONSULTAS, limite_linhas=1000):
+    """
+    Devolve o ``Plano`` de cada consulta na base de dados atual. Atualiza
+    primeiro as estatísticas do planeador (ANALYZE).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    modelos = {Candidatura, Edificio, Quarto, Cama, Residente}
+    linhas_por_tabela = {modelo._meta.db_table: modelo.objects.count() for modelo in modelos}
+    analisar = _postgresql if connection.vendor == 'postgresql' else _sqlite
+    amostra = Amostra()
+    return [analisar(consulta, consulta.queryset(amostra), linhas_por_tabela, limite_linhas) for consulta in consultas]
@@ -0,0 +1,186 @@
+"""
+Filtros e ordenação declarativos das listagens.
+
+Cada view declara em ``filtragem`` os campos que aceita como filtro e com
+que lookups, e os campos pelos quais se pode ordenar::
+
+    filtragem = Filtragem(Candidatura, {
+        'status': ('exact', 'in'),
+        'data_submissao': ('gte', 'lte'),
+    }, ordenacao=('data_submissao', 'id'))
+
+O pedido usa a sintaxe dos lookups do Django: ``?status=pendente``,
+``?status__in=pendente,aprovado``, ``?data_submissao__gte=2026-10-01`` e
+``?ordem=-data_submissao``. Os valores são convertidos pelo campo do modelo
+e viram um ``filter()`` direto; lookups ou chaves de ordenação fora da lista
+dão 400. Parâmetros que não correspondem a nenhum campo declarado (cursor,
+page_size, stream...) são ignorados.
+
+Só se podem declarar campos indexados (chave primária, únicos, chaves
+estrangeiras, ``db_index`` ou primeira coluna de um índice sem condição):
+um campo sem índice levanta ``ImproperlyConfigured`` ao importar a view,
+para que a filtragem e a ordenação fiquem sempre na base de dados e sobre
+um índice. A ordenação só aceita, além disso, campos de valores únicos ou
+quase (chave primária, campos únicos, datas/horas): a paginação por cursor
+do DRF posiciona o cursor apenas no primeiro campo da ordenação e, dentro de
+um grupo de valores iguais (``status``, ``tipo``...), recorre a um OFFSET que
+cresce com a página. Nas views genéricas a filtragem é aplicada pelo backend
+``FiltroDeclarativo`` (``DEFAULT_FILTER_BACKENDS``); nas ``APIView`` pela
+``resposta_lista`` de core.pagination, que também passa a ordenação pedida
+à paginação por cursor.
+"""
+import datetime
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db.models import DateTimeField, UniqueConstraint
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+PARAMETRO_ORDEM = 'ordem'
+LOOKUPS = ('exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull')
+VERDADEIRO = ('1', 'true', 'sim')
+FALSO = ('0', 'false', 'nao', 'não')
+
+
+class FiltroInvalido(ParseError):
+    default_detail = 'Filtro inválido.'
+
+
+def _campo(modelo, caminho):
+    """O campo do modelo no fim de ``caminho`` (``quarto__edificio``)."""
+    *relacoes, nome = caminho.split('__')
+    for relacao in relacoes:
+        modelo = modelo._meta.get_field(relacao).related_model
+    return modelo._meta.get_field(nome)
+
+
+def indexado(campo):
+    """Indica se há um índice cuja primeira coluna é ``campo``."""
+    if campo.primary_key or campo.unique or campo.db_index:
+        return True
+    meta = campo.model._meta
+    indices = [indice.fields for indice in meta.indexes if indice.condition is None and indice.fields]
+    indices += [
+        restricao.fields for restricao in meta.constraints
+        if isinstance(restricao, UniqueConstraint) and restricao.condition is None and restricao.fields
+    ]
+    indices += [list(campos) for campos in meta.unique_together]
+    return any(campos[0].lstrip('-') == campo.name for campos in indices)
+
+
+def quase_unico(campo):
+    """
+    Indica se os valores de ``campo`` são únicos, ou quase (datas/horas), o
+    que permite posicionar o cursor da paginação só por esse campo.
+    """
+    return campo.primary_key or campo.unique or isinstance(campo, DateTimeField)
+
+
+@dataclass
+class Filtragem:
+    """
+    ``campos``: caminho do campo -> lookups aceites; ``ordenacao``: campos
+    (do próprio modelo, únicos ou quase) aceites em ``?ordem=``. A chave primária é sempre
+    acrescentada ao fim da ordenação, para desempatar.
+    """
+    modelo: type
+    campos: dict
+    ordenacao: tuple = ('id',)
+    _campos_modelo: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        for caminho, lookups in self.campos.items():
+            if invalidos := set(lookups) - set(LOOKUPS):
+                raise ImproperlyConfigured(f'Lookups não suportados em {caminho}: {", ".join(sorted(invalidos))}.')
+            self._campos_modelo[caminho] = self._indexado(caminho)
+        for caminho in self.ordenacao:
+            if '__' in caminho:
+                # A paginação por cursor só ordena por campos do próprio modelo.
+                raise ImproperlyConfigured(f'Ordenação por relações não suportada: {caminho}.')
+            if not quase_unico(self._indexado(caminho)):
+                raise ImproperlyConfigured(
+                    f'{self.modelo.__name__}.{caminho} tem valores repetidos e não pode ser usado para ordenar '
+                    '(a paginação por cursor recorreria a OFFSET).'
+                )
+
+    def _indexado(self, caminho):
+        try:
+            campo = _campo(self.modelo, caminho)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(f'{self.modelo.__name__} não tem o campo {caminho}.')
+        if not indexado(campo):
+            raise ImproperlyConfigured(
+                f'{self.modelo.__name__}.{caminho} não está indexado e não pode ser usado para filtrar ou ordenar.'
+            )
+        return campo
+
+    def _converter(self, campo, parametro, valor):
+        try:
+            convertido = campo.to_python(valor)
+        except ValidationError:
+            raise FiltroInvalido(f'Valor inválido para {parametro}: {valor}.')
+        if settings.USE_TZ and isinstance(convertido, datetime.datetime) and timezone.is_naive(convertido):
+            convertido = timezone.make_aware(convertido)
+        return convertido
+
+    def filtros(self, parametros):
+        """Os argumentos do ``filter()`` correspondentes aos ``parametros``."""
+        filtros = {}
+        for parametro, valor in parametros.items():
+            caminho, lookup = parametro, 'exact'
+            if caminho not in self.campos:
+                caminho, _, lookup = parametro.rpartition('__')
+                if caminho not in self.campos:
+                    continue
+            if lookup not in self.campos[caminho]:
+                aceites = ', '.join(f'{caminho}__{aceite}' if aceite != 'exact' else caminho for aceite in self.campos[caminho])
+                raise FiltroInvalido(f'Filtro não suportado: {parametro}. Use {aceites}.')
+            campo = self._campos_modelo[caminho]
+            if lookup == 'isnull':
+                if valor.lower() not in VERDADEIRO + FALSO:
+                    raise FiltroInvalido(f'Valor inválido para {parametro}: {valor}.')
+                convertido = valor.lower() in VERDADEIRO
+            elif lookup == 'in':
+                convertido = [self._converter(campo, parametro, item.strip()) for item in valor.split(',') if item.strip()]
+            else:
+                convertido = self._converter(campo, parametro, valor)
+            filtros[f'{caminho}__{lookup}'] = convertido
+        return filtros
+
+    def ordem(self, parametros):
+        """A ordenação pedida em ``?ordem=``, ou ``None``."""
+        valor = parametros.get(PARAMETRO_ORDEM, '')
+        chaves = [chave.strip() for chave in valor.split(',') if chave.strip()]
+        if not chaves:
+            return None
+        for chave in chaves:
+            if chave.lstrip('-') not in self.ordenacao:
+                raise FiltroInvalido(f'Ordenação não suportada: {chave}. Use {", ".join(self.ordenacao)}.')
+        pk = self.modelo._meta.pk.name
+        if not {chave.lstrip('-') for chave in chaves} & {pk, 'id', 'pk'}:
+            chaves.append(f'-{pk}' if chaves[0].startswith('-') else pk)
+        return tuple(chaves)
+
+    def aplicar(self, queryset, parametros):
+        queryset = queryset.filter(**self.filtros(parametros))
+        if ordem := self.ordem(parametros):
+            queryset = queryset.order_by(*ordem)
+        return queryset
+
+
+def filtrar(request, queryset, view):
+    """Aplica a ``filtragem`` da view, se tiver uma."""
+    filtragem = getattr(view, 'filtragem', None)
+    if filtragem is None:
+        return queryset
+    return filtragem.aplicar(queryset, request.query_params)
+
+
+class FiltroDeclarativo(BaseFilterBackend):
+    """Backend do DRF que aplica a ``filtragem`` das views genéricas."""
+
+    def filter_queryset(self, request, queryset, view):
+        return filtrar(request, queryset, view)
@@ -0,0 +1,80 @@
+"""
+Inserção em massa de linhas já construídas, sem passar pelos modelos.
+
+No PostgreSQL usa ``COPY ... FROM STDIN`` (psycopg 3 ou psycopg2); nas
+restantes bases de dados um ``INSERT`` com ``executemany``. Não dispara
+sinais nem ``pre_save`` (um ``auto_now_add`` guarda o valor indicado), por
+isso quem a usa deve atualizar os contadores de ocupação e invalidar a cache.
+"""
+import csv
+import io
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+TAMANHO_LOTE = 5000
+
+# Tipos de campo cujo valor Python já é aceite tal e qual pelo driver; os
+# restantes (datas, UUIDs, decimais, JSON...) passam por get_db_prep_save.
+SEM_CONVERSAO = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+    'CharField', 'TextField', 'SlugField', 'BooleanField', 'ForeignKey', 'OneToOneField',
+}
+
+
+def _copiar(cursor, tabela, colunas, valores):
+    sql = f'COPY {tabela} ({colunas}) FROM STDIN'
+    if hasattr(cursor, 'copy'):
+        with cursor.copy(sql) as copia:
+            for linha in valores:
+                copia.write_row(linha)
+    else:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(valores)
+        buffer.seek(0)
+        cursor.copy_expert(f'{sql} WITH (FORMAT csv)', buffer)
+
+
+def inserir_linhas(modelo, linhas, com_pk=True, tamanho_lote=None):
+    """
+    Insere ``linhas`` (dicionários ``{attname: valor}``) na tabela de
+    ``modelo``. Os campos em falta recebem o valor por omissão; sem
+    ``com_pk`` o id é atribuído pela base de dados.
+    """
+    # A ligação real, e não o proxy ``django.db.connection``, que custaria
+    # uma consulta ao estado local da thread por cada valor.
+    conexao = connections[DEFAULT_DB_ALIAS]
+    campos = [campo for campo in modelo._meta.concrete_fields if com_pk or not campo.primary_key]
+    tabela = conexao.ops.quote_name(modelo._meta.db_table)
+    colunas = ', '.join(conexao.ops.quote_name(campo.column) for campo in campos)
+    converter = [campo.get_internal_type() not in SEM_CONVERSAO for campo in campos]
+
+    def preparar(linha):
+        valores = []
+        for campo, converte in zip(campos, converter):
+            valor = linha[campo.attname] if campo.attname in linha else campo.get_default()
+            valores.append(campo.get_db_prep_save(valor, conexao) if converte and valor is not None else valor)
+        return valores
+
+    valores = map(preparar, linhas)
+    with conexao.cursor() as cursor:
+        if conexao.vendor == 'postgresql':
+            _copiar(cursor.cursor, tabela, colunas, valores)
+            return
+        sql = f"INSERT INTO {tabela} ({colunas}) VALUES ({', '.join(['%s'] * len(campos))})"
+        while lote := list(islice(valores, tamanho_lote or TAMANHO_LOTE)):
+            cursor.executemany(sql, lote)
+
+
+def reiniciar_sequencias(*modelos):
+    """
+    Acerta as sequências dos ids depois de inserir linhas com id explícito
+    (só é preciso no PostgreSQL e no Oracle).
+    """
+    comandos = connection.ops.sequence_reset_sql(no_style(), modelos)
+    if comandos:
+        with connection.cursor() as cursor:
+            for comando in comandos:
+                cursor.execute(comando)
@@ -0,0 +1,205 @@
+"""
+Instrumentação por pedido: número e tempo das queries SQL, tempo de
+autenticação, de serialização e da view, devolvidos no cabeçalho
+``Server-Timing`` (visível nas ferramentas de desenvolvimento do browser) e
+registados no logger ``core.instrumentacao`` quando o pedido passa de
+``INSTRUMENTACAO_LIMITE_MS``.
+
+É opcional (``INSTRUMENTACAO=True`` acrescenta o middleware). As queries são
+medidas com ``connection.execute_wrapper``; a autenticação e a serialização
+com ``medir()``, que o middleware aplica ao ``Request._authenticate`` e ao
+``BaseSerializer.data`` do DRF quando é instalado. Os tempos da serialização
+incluem as queries que ela própria dispara (querysets preguiçosos, N+1).
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_medicao = ContextVar('medicao', default=None)
+
+# Nome no Server-Timing: (descrição, em ASCII por ir num cabeçalho HTTP, e
+# chave no registo dos pedidos lentos).
+METRICAS = {
+    'auth': ('Autenticacao', 'autenticacaoMs'),
+    'ser': ('Serializacao', 'serializacaoMs'),
+    'view': ('View', 'viewMs'),
+}
+
+TAMANHO_MAXIMO_SQL = 1000
+
+
+class Medicao:
+    """Tempos acumulados de um pedido."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tempos = dict.fromkeys(METRICAS, 0.0)
+        self.queries = []
+        self.view = None
+        self.inicio_view = None
+        self._ativas = set()
+
+    def executar(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((time.perf_counter() - inicio, sql))
+
+    @property
+    def tempo_sql(self):
+        return sum(duracao for duracao, _ in self.queries)
+
+    def queries_lentas(self, quantas):
+        return heapq.nlargest(quantas, self.queries, key=lambda query: query[0])
+
+
+@contextmanager
+def medir(nome):
+    """
+    Soma a duração do bloco ao tempo ``nome`` do pedido em curso. Fora de um
+    pedido instrumentado não faz nada; blocos aninhados com o mesmo nome só
+    contam uma vez.
+    """
+    medicao = _medicao.get()
+    if medicao is None or nome in medicao._ativas:
+        yield
+        return
+    medicao._ativas.add(nome)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.tempos[nome] += time.perf_counter() - inicio
+        medicao._ativas.discard(nome)
+
+
+def _medido(nome, funcao):
+    @wraps(funcao)
+    def medida(*args, **kwargs):
+        with medir(nome):
+            return funcao(*args, **kwargs)
+    medida._instrumentada = True
+    return medida
+
+
+def instrumentar_drf():
+    """Mede a autenticação e a serialização do DRF. Pode ser chamada várias vezes."""
+    from rest_framework.request import Request
+    from rest_framework.serializers import BaseSerializer
+
+    if not getattr(Request._authenticate, '_instrumentada', False):
+        Request._authenticate = _medido('auth', Request._authenticate)
+    if not getattr(BaseSerializer.data.fget, '_instrumentada', False):
+        BaseSerializer.data = property(_medido('ser', BaseSerializer.data.fget))
+
+
+def capturar_sql(wrapper):
+    """
+    Instala ``wrapper`` (ver ``connection.execute_wrapper``) em todas as
+    ligações da thread atual e devolve o ``ExitStack`` que o desinstala.
+    """
+    pilha = ExitStack()
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(wrapper))
+    return pilha
+
+
+def _ms(segundos):
+    return round(segundos * 1000, 2)
+
+
+class InstrumentacaoMiddleware:
+    """
+    Deve ficar no início de ``MIDDLEWARE``, para que o tempo total inclua os
+    restantes middlewares.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limite = settings.INSTRUMENTACAO_LIMITE_MS
+        self.queries_lentas = settings.INSTRUMENTACAO_QUERIES_LENTAS
+        self.server_timing = settings.INSTRUMENTACAO_SERVER_TIMING
+        instrumentar_drf()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        try:
+            with capturar_sql(medicao.executar):
+                response = self.get_response(request)
+        finally:
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao)
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao.set(medicao)
+        # As ligações são locais à thread: o wrapper tem de ser instalado na
+        # thread onde correm os sync_to_async do pedido.
+        sql = await sync_to_async(capturar_sql)(medicao.executar)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(sql.close)()
+            _medicao.reset(token)
+        return self.concluir(request, response, medicao)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicao = _medicao.get()
+        if medicao is not None:
+            classe = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+            medicao.view = (classe or view_func).__qualname__
+            # O tempo da view conta a partir daqui até à resposta voltar ao
+            # middleware, incluindo a renderização.
+            medicao.inicio_view = time.perf_counter()
+
+    def concluir(self, request, response, medicao):
+        fim = time.perf_counter()
+        total = fim - medicao.inicio
+        if medicao.inicio_view is not None:
+            medicao.tempos['view'] = fim - medicao.inicio_view
+
+        if self.server_timing:
+            metricas = [f'db;dur={_ms(medicao.tempo_sql)};desc="{len(medicao.queries)} queries"']
+            metricas += [
+                f'{nome};dur={_ms(medicao.tempos[nome])};desc="{descricao}"'
+                for nome, (descricao, _) in METRICAS.items() if medicao.tempos[nome]
+            ]
+            metricas.append(f'total;dur={_ms(total)};desc="Total"')
+            response.headers['Server-Timing'] = ', '.join(metricas)
+
+        if total * 1000 >= self.limite:
+            dados = {
+                'evento': 'pedidoLento',
+                'metodo': request.method,
+                'caminho': request.path,
+                'estado': response.status_code,
+                'view': medicao.view,
+                'duracaoMs': _ms(total),
+                'queries': len(medicao.queries),
+                'sqlMs': _ms(medicao.tempo_sql),
+                **{chave: _ms(medicao.tempos[nome]) for nome, (_, chave) in METRICAS.items()},
+                'queriesLentas': [
+                    {'duracaoMs': _ms(duracao), 'sql': sql[:TAMANHO_MAXIMO_SQL]}
+                    for duracao, sql in medicao.queries_lentas(self.queries_lentas)
+                ],
+            }
+            logger.warning(json.dumps(dados, ensure_ascii=False), extra={'instrumentacao': dados})
+        return response
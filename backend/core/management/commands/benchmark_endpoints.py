@@ -0,0 +1,108 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmark
+
+
+def _escalas(valor):
+    try:
+        escalas = [int(escala) for escala in valor.split(',') if escala.strip()]
+    except ValueError:
+        raise CommandError(f'Escalas inválidas: {valor}.')
+    if not escalas or min(escalas) < 1:
+        raise CommandError(f'Escalas inválidas: {valor}.')
+    return escalas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95), queries e tamanho da resposta de todos os endpoints de '
+        'accounts, candidaturas e relatorios sobre dados sintéticos, numa base de dados de '
+        'testes, e falha se houver regressões em relação à baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', default='1,5', help='Escalas do conjunto sintético, separadas por vírgulas')
+        parser.add_argument('--semente', type=int, default=0)
+        parser.add_argument('--repeticoes', type=int, default=10, help='Pedidos medidos por endpoint (após 1 de aquecimento)')
+        parser.add_argument('--endpoint', action='append', help='Limita a estes casos ou rotas (repetível)')
+        parser.add_argument('--com-cache', action='store_true', help='Não limpa a cache entre pedidos')
+        parser.add_argument('--baseline', type=Path, default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--gravar-baseline', action='store_true', help='Grava os resultados como nova baseline')
+        parser.add_argument('--json', type=Path, help='Grava também os resultados neste ficheiro')
+        parser.add_argument('--tolerancia-latencia', type=float, help='Fator sobre o p50 da baseline')
+        parser.add_argument('--tolerancia-p95', type=float, help='Fator sobre o p95 da baseline (por omissão não é comparado)')
+        parser.add_argument('--folga-ms', type=float, help='Milissegundos somados aos limites de latência')
+        parser.add_argument('--tolerancia-queries', type=int, help='Queries a mais permitidas')
+        parser.add_argument('--tolerancia-tamanho', type=float, help='Fator sobre o tamanho da resposta')
+
+    def handle(self, *args, **options):
+        escalas = _escalas(options['escalas'])
+        if sem_caso := benchmark.rotas_sem_caso():
+            self.stdout.write(self.style.WARNING(f"Rotas sem caso de benchmark: {', '.join(sem_caso)}"))
+
+        setup_test_environment()
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            resultados = benchmark.executar(
+                escalas,
+                semente=options['semente'],
+                repeticoes=options['repeticoes'],
+                limpar_cache=not options['com_cache'],
+                filtro=options['endpoint'],
+                progresso=self.progresso,
+            )
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0)
+            teardown_test_environment()
+
+        documento = {
+            'versao': benchmark.VERSAO_BASELINE,
+            'ambiente': benchmark.ambiente(),
+            'parametros': {'semente': options['semente'], 'repeticoes': options['repeticoes'], 'comCache': options['com_cache']},
+            'escalas': resultados,
+        }
+        if options['json']:
+            self.gravar(options['json'], documento)
+        if options['gravar_baseline']:
+            self.gravar(options['baseline'], documento)
+            self.stdout.write(self.style.SUCCESS(f"Baseline gravada em {options['baseline']}."))
+            return
+
+        try:
+            baseline = json.loads(options['baseline'].read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            raise CommandError(f"Baseline inexistente: {options['baseline']}. Use --gravar-baseline.")
+        if baseline.get('ambiente') != documento['ambiente']:
+            self.stdout.write(self.style.WARNING(
+                f"Baseline gravada noutro ambiente ({baseline.get('ambiente')}); as latências podem não ser comparáveis."
+            ))
+        tolerancias = {
+            chave: options[opcao]
+            for chave, opcao in (
+                ('latencia', 'tolerancia_latencia'), ('latencia_p95', 'tolerancia_p95'), ('folga_ms', 'folga_ms'),
+                ('queries', 'tolerancia_queries'), ('tamanho', 'tolerancia_tamanho'),
+            )
+            if options[opcao] is not None
+        }
+        regressoes = benchmark.comparar(resultados, baseline, tolerancias)
+        if regressoes:
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação à baseline:\n' + '\n'.join(regressoes))
+        self.stdout.write(self.style.SUCCESS('Sem regressões em relação à baseline.'))
+
+    def progresso(self, escala, nome, metricas):
+        self.stdout.write(
+            f"[escala {escala}] {nome:<40} {metricas['codigo']} "
+            f"p50 {metricas['p50_ms']:.1f}ms p95 {metricas['p95_ms']:.1f}ms "
+            f"{metricas['queries']} queries {metricas['bytes']} bytes"
+        )
+
+    def gravar(self, caminho, documento):
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_text(json.dumps(documento, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
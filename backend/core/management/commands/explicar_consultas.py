@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import explicacao, sintetico
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra o plano de execução (EXPLAIN ANALYZE no PostgreSQL) das queries das views com '
+        'filtros sobre um conjunto sintético e falha se alguma fizer um scan sequencial seletivo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=int, default=20, help='Escala do conjunto sintético (core.sintetico)')
+        parser.add_argument('--semente', type=int, default=0)
+        parser.add_argument(
+            '--base-de-dados-atual', action='store_true',
+            help='Usa os dados da base de dados configurada em vez de gerar um conjunto numa base de testes',
+        )
+        parser.add_argument('--limite-linhas', type=int, default=1000, help='Ignora scans de tabelas mais pequenas')
+        parser.add_argument('--view', action='append', help='Limita a estas views (repetível)')
+        parser.add_argument('--planos', action='store_true', help='Mostra o plano completo de cada query')
+
+    def handle(self, *args, **options):
+        consultas = [
+            consulta for consulta in explicacao.CONSULTAS
+            if not options['view'] or consulta.view.split(' ')[0] in options['view']
+        ]
+        if not consultas:
+            raise CommandError('Nenhuma view corresponde a --view.')
+
+        if options['base_de_dados_atual']:
+            planos = explicacao.explicar(consultas, options['limite_linhas'])
+        else:
+            setup_test_environment()
+            nome_original = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with transaction.atomic():
+                    sintetico.gerar(options['escala'], options['semente'])
+                    planos = explicacao.explicar(consultas, options['limite_linhas'])
+                    transaction.set_rollback(True)
+            finally:
+                connection.creation.destroy_test_db(nome_original, verbosity=0)
+                teardown_test_environment()
+
+        assinalados = []
+        for plano in planos:
+            estilo = self.style.ERROR if plano.assinalados else self.style.SUCCESS
+            scans = ', '.join(
+                tabela if devolvidas is None else f'{tabela} ({devolvidas} linhas, {descartadas} descartadas)'
+                for tabela, devolvidas, descartadas in plano.scans
+            )
+            self.stdout.write(estilo(f"{plano.consulta.view}: {'scan sequencial em ' + scans if scans else 'só índices'}"))
+            if options['planos'] or plano.assinalados:
+                self.stdout.write(plano.texto)
+            assinalados += [f'{plano.consulta.view}: {tabela}' for tabela in plano.assinalados]
+
+        if assinalados:
+            raise CommandError(f'{len(assinalados)} scan(s) sequencial(is) seletivo(s):\n' + '\n'.join(assinalados))
+        self.stdout.write(self.style.SUCCESS('Nenhum scan sequencial seletivo.'))
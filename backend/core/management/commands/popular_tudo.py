@@ -1,14 +1,57 @@
 import os
-from django.core.management.base import BaseCommand
+import time
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
+from core import sintetico
+from core.cache import invalidar
+from core.insercao import inserir_linhas
 from core.models import Edificio, Quarto, Residente, Cama, Residencia
+from core.sintetico import SENHA
 from candidaturas.models import Candidatura, Estudante
 from accounts.models import CustomUser
 
 class Command(BaseCommand):
-    help = 'Popula o banco de dados com dados de teste'
+    help = (
+        'Popula o banco de dados com dados de teste. Com --escala gera um conjunto sintético '
+        'determinístico (~190 camas por unidade); --guardar e --carregar gravam e repõem um instantâneo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', '--scale', type=int, help='Unidades de 10 edifícios (525 dá ~100 mil camas)')
+        parser.add_argument('--semente', '--seed', type=int, default=0, help='Semente do gerador (padrão: 0)')
+        parser.add_argument('--lote', type=int, help='Linhas por INSERT (fora do PostgreSQL)')
+        parser.add_argument('--guardar', '--dump', type=Path, help='No fim, grava um instantâneo das tabelas neste ficheiro')
+        parser.add_argument('--carregar', '--load', type=Path, help='Carrega um instantâneo em vez de gerar dados')
 
     def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if options['carregar']:
+            try:
+                self.totais(sintetico.carregar_instantaneo(options['carregar'], options['lote']), time.perf_counter() - inicio)
+            except (OSError, sintetico.InstantaneoInvalido) as erro:
+                raise CommandError(erro)
+        elif options['escala']:
+            self.stdout.write(self.style.NOTICE(
+                f"Gerando dados sintéticos (escala {options['escala']}, semente {options['semente']})..."
+            ))
+            totais = sintetico.gerar(
+                options['escala'], options['semente'], options['lote'],
+                progresso=lambda feitos, total: self.stdout.write(f'  {feitos}/{total} edifícios'),
+            )
+            self.totais(totais, time.perf_counter() - inicio)
+        else:
+            self.popular_exemplo()
+
+        if options['guardar']:
+            inicio = time.perf_counter()
+            totais = sintetico.guardar_instantaneo(options['guardar'])
+            self.stdout.write(f"Instantâneo gravado em {options['guardar']}.")
+            self.totais(totais, time.perf_counter() - inicio)
+
+    def popular_exemplo(self):
         # -------------------- CORE --------------------
         self.stdout.write(self.style.NOTICE("Criando dados do núcleo..."))
         edificios = [
@@ -88,42 +131,37 @@ class Command(BaseCommand):
 
         # -------------------- CANDIDATURAS --------------------
         self.stdout.write(self.style.NOTICE("Criando dados de candidaturas..."))
-        try:
-            estudantes = list(Estudante.objects.all())
-            residencias_disponiveis = list(Residencia.objects.all())
+        estudantes = list(Estudante.objects.order_by('id')[:10])
+        if not estudantes:
+            senha = make_password(SENHA)
+            users = CustomUser.objects.bulk_create([
+                CustomUser(email=f'estudante{i}@example.com', password=senha) for i in range(1, 11)
+            ])
+            estudantes = Estudante.objects.bulk_create([
+                Estudante(user=user, Nome=f'Estudante {i}') for i, user in enumerate(users, start=1)
+            ])
+            self.stdout.write(self.style.SUCCESS(f"{len(estudantes)} estudantes criados (password '{SENHA}')."))
 
-            if not estudantes:
-                self.stdout.write(self.style.WARNING("Atenção: Não existem estudantes para criar candidaturas."))
-            else:
-                candidaturas_criadas = []
-                for i in range(10):
-                    estudante = estudantes[i % len(estudantes)]
-                    residencia = residencias_disponiveis[i % len(residencias_disponiveis)]
-                    data_submissao = timezone.now() - timezone.timedelta(days=i)
-                    status_opcoes = ['pendente', 'aprovado', 'em_analise', 'rejeitado']
-                    status = status_opcoes[i % len(status_opcoes)]
-
-                    # Tentar garantir que as candidaturas não sejam exatamente iguais
-                    # (você pode precisar de uma lógica mais sofisticada aqui dependendo dos seus requisitos)
-                    while Candidatura.objects.filter(estudante=estudante, residencia=residencia, data_submissao=data_submissao).exists():
-                        data_submissao = timezone.now() - timezone.timedelta(hours=i) # Varia a data um pouco
-
-                    candidatura = Candidatura.objects.create(
-                        estudante=estudante,
-                        data_submissao=data_submissao,
-                        status=status,
-                        residencia=residencia,
-                    )
-                    candidaturas_criadas.append(candidatura)
-                    self.stdout.write(self.style.SUCCESS(f"Candidatura '{candidatura.id}' criada para '{estudante.user.username}' para '{residencia.Nome}'."))
-
-        except Estudante.DoesNotExist:
-            self.stdout.write(self.style.ERROR("Erro: Instância de Estudante não encontrada."))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Erro ao criar dados de candidaturas: {e}"))
+        status_opcoes = ['pendente', 'aprovado', 'em_analise', 'rejeitado']
+        # Inserção direta: guarda as datas indicadas apesar do auto_now_add.
+        inserir_linhas(Candidatura, [
+            {
+                'estudante_id': estudantes[i % len(estudantes)].id,
+                'residencia_id': residencias[i % len(residencias)].id,
+                'data_submissao': timezone.now() - timezone.timedelta(days=i),
+                'status': status_opcoes[i % len(status_opcoes)],
+            }
+            for i in range(10)
+        ], com_pk=False)
+        invalidar(Candidatura)
+        self.stdout.write(self.style.SUCCESS("10 candidaturas criadas."))
 
         self.stdout.write(self.style.SUCCESS('Dados de teste populados com sucesso!'))
 
+    def totais(self, totais, duracao):
+        resumo = ', '.join(f'{total} {nome}' for nome, total in totais.items())
+        self.stdout.write(self.style.SUCCESS(f'{resumo} em {duracao:.1f}s.'))
+
 if __name__ == '__main__':
     # Configurar o Django (se ainda não estiver configurado em um script standalone)
     import django
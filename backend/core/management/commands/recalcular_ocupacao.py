@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Edificio, Quarto
+from core.ocupacao import divergencias, recalcular_quartos
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói (ou verifica, com --verificar) os contadores de ocupação de quartos e edifícios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true', help='Apenas compara os contadores com os valores reais')
+        parser.add_argument('--lote', type=int, default=200, help='Número de edifícios recalculados por transação')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            erros = divergencias()
+            for modelo, pk, campo, guardado, real in erros[:50]:
+                self.stdout.write(f"{modelo} {pk}: {campo} = {guardado}, esperado {real}")
+            if erros:
+                raise CommandError(f"{len(erros)} contador(es) divergente(s). Corra 'manage.py recalcular_ocupacao'.")
+            self.stdout.write(self.style.SUCCESS('Contadores de ocupação corretos.'))
+            return
+
+        edificio_ids = list(Edificio.objects.order_by('id').values_list('id', flat=True))
+        for inicio in range(0, len(edificio_ids), options['lote']):
+            lote = edificio_ids[inicio:inicio + options['lote']]
+            quarto_ids = Quarto.objects.filter(edificio_id__in=lote).values_list('id', flat=True)
+            recalcular_quartos(list(quarto_ids), edificio_ids=lote)
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados para {len(edificio_ids)} edifício(s).'))
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def preencher_contadores(apps, schema_editor):
+    Quarto = apps.get_model('core', 'Quarto')
+    Edificio = apps.get_model('core', 'Edificio')
+    for quarto in Quarto.objects.annotate(
+        n_camas=Count('camas'),
+        n_ocupadas=Count('camas', filter=Q(camas__residente__isnull=False)),
+    ):
+        Quarto.objects.filter(pk=quarto.pk).update(
+            total_camas=quarto.n_camas,
+            camas_ocupadas=quarto.n_ocupadas,
+            camas_livres=quarto.n_camas - quarto.n_ocupadas,
+        )
+    for edificio in Edificio.objects.annotate(
+        n_quartos=Count('quartos'),
+        n_livres=Count('quartos', filter=Q(quartos__camas_livres__gt=0) | Q(quartos__total_camas=0)),
+        soma_capacidade=Sum('quartos__capacidade'),
+        soma_camas=Sum('quartos__total_camas'),
+        soma_ocupadas=Sum('quartos__camas_ocupadas'),
+    ):
+        Edificio.objects.filter(pk=edificio.pk).update(
+            total_quartos=edificio.n_quartos,
+            quartos_livres=edificio.n_livres,
+            capacidade=edificio.soma_capacidade or 0,
+            total_camas=edificio.soma_camas or 0,
+            camas_ocupadas=edificio.soma_ocupadas or 0,
+            camas_livres=(edificio.soma_camas or 0) - (edificio.soma_ocupadas or 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_residente_cama_alter_cama_quarto_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edificio',
+            name='camas_livres',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='edificio',
+            name='camas_ocupadas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='edificio',
+            name='capacidade',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='edificio',
+            name='quartos_livres',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='edificio',
+            name='total_camas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='edificio',
+            name='total_quartos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quarto',
+            name='camas_livres',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quarto',
+            name='camas_ocupadas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quarto',
+            name='total_camas',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
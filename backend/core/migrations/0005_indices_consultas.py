@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_reserva_cama'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cama',
+            index=models.Index(fields=['status'], name='cama_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cama',
+            index=models.Index(condition=models.Q(('residente__isnull', True)), fields=['quarto'], name='cama_livre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cama',
+            index=models.Index(condition=models.Q(('reserva_expira_em__isnull', False)), fields=['reserva_expira_em'], name='cama_reserva_expira_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='edificio',
+            index=models.Index(fields=['tipo'], name='edificio_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quarto',
+            index=models.Index(fields=['tipo'], name='quarto_tipo_idx'),
+        ),
+    ]
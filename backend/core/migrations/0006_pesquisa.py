@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# Só no PostgreSQL: nas outras bases de dados a pesquisa usa o índice em
+# memória de core.pesquisa. As extensões exigem permissão de CREATE no
+# esquema (ou que já tenham sido criadas por um administrador).
+CRIAR = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    # IMMUTABLE para poder ser usada em índices; o dicionário é indicado
+    # explicitamente para não depender do search_path.
+    """
+    CREATE OR REPLACE FUNCTION pesquisa_texto(VARIADIC partes text[]) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS
+    $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, array_to_string(partes, ' '))) $$
+    """,
+    'CREATE INDEX IF NOT EXISTS residente_pesquisa_idx ON core_residente '
+    'USING gin (pesquisa_texto(nome, email, telefone) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS residencia_pesquisa_idx ON core_residencia '
+    'USING gin (pesquisa_texto("Nome") gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS estudante_pesquisa_idx ON estudantes_estudante '
+    'USING gin (pesquisa_texto("Nome") gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS customuser_pesquisa_idx ON accounts_customuser '
+    'USING gin (pesquisa_texto(email) gin_trgm_ops)',
+]
+
+REMOVER = [
+    'DROP INDEX IF EXISTS customuser_pesquisa_idx',
+    'DROP INDEX IF EXISTS estudante_pesquisa_idx',
+    'DROP INDEX IF EXISTS residencia_pesquisa_idx',
+    'DROP INDEX IF EXISTS residente_pesquisa_idx',
+    'DROP FUNCTION IF EXISTS pesquisa_texto(text[])',
+]
+
+
+def _executar(instrucoes):
+    def executar(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for instrucao in instrucoes:
+            schema_editor.execute(instrucao)
+    return executar
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_indices_consultas'),
+        ('estudantes', '0002_estudante_user'),
+        ('accounts', '0003_customuser_username'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(CRIAR), _executar(REMOVER)),
+    ]
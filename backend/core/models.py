@@ -1,4 +1,5 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 
 class Edificio(models.Model):
     nome = models.CharField(max_length=255)
@@ -15,6 +16,21 @@ class Edificio(models.Model):
         default='residencial',
     )
 
+    # Contadores de ocupação materializados, mantidos por core.ocupacao
+    # (ver core.signals) e reconstruídos com `manage.py recalcular_ocupacao`.
+    total_quartos = models.IntegerField(default=0, editable=False)
+    quartos_livres = models.IntegerField(default=0, editable=False)
+    capacidade = models.IntegerField(default=0, editable=False)
+    total_camas = models.IntegerField(default=0, editable=False)
+    camas_ocupadas = models.IntegerField(default=0, editable=False)
+    camas_livres = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # EdificiosPorTipoView
+            models.Index(fields=['tipo'], name='edificio_tipo_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_display()})"
 
@@ -30,6 +46,30 @@ class Quarto(models.Model):
     edificio = models.ForeignKey(Edificio, on_delete=models.CASCADE, related_name='quartos')
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='individual')
 
+    # Contadores de ocupação materializados (ver core.ocupacao)
+    total_camas = models.IntegerField(default=0, editable=False)
+    camas_ocupadas = models.IntegerField(default=0, editable=False)
+    camas_livres = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # QuartosPorTipoView
+            models.Index(fields=['tipo'], name='quarto_tipo_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Edifício de origem, para o recalcular se o quarto mudar de edifício.
+        instance._edificio_id_original = instance.__dict__.get('edificio_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Os contadores do edifício são atualizados no post_save; a transação
+        # garante que mudam juntamente com o quarto.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.numero} - {self.edificio.nome} ({self.get_tipo_display()})"
 
@@ -54,8 +94,49 @@ class Cama(models.Model):
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default='Disponível')
     residente = models.ForeignKey(Residente, on_delete=models.SET_NULL, null=True, blank=True, related_name='camas')
 
+    # Reserva temporária (ver core.reservas). Uma reserva expirada é ignorada
+    # pelos filtros, por isso não é preciso apagá-la para libertar a cama.
+    reserva_token = models.UUIDField(null=True, blank=True, editable=False)
+    reserva_expira_em = models.DateTimeField(null=True, blank=True, editable=False)
+    reservada_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='reservas_cama',
+    )
+
     class Meta:
         unique_together = ('numero', 'quarto')
+        indexes = [
+            # CamasPorStatusView
+            models.Index(fields=['status'], name='cama_status_idx'),
+            # Camas livres por quarto (alocação, reservas): só as camas sem
+            # residente entram no índice, que encolhe à medida que ocupam.
+            models.Index(fields=['quarto'], condition=models.Q(residente__isnull=True), name='cama_livre_idx'),
+            # Limpeza das reservas expiradas (core.reservas.limpar_expiradas)
+            models.Index(
+                fields=['reserva_expira_em'], condition=models.Q(reserva_expira_em__isnull=False),
+                name='cama_reserva_expira_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Quarto e residente quando a cama foi lida: core.signals ajusta os
+        # contadores com a diferença para o que for gravado.
+        instance._quarto_id_original = instance.__dict__.get('quarto_id')
+        instance._residente_id_original = instance.__dict__.get('residente_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # O estado acompanha sempre a atribuição do residente.
+        self.status = 'Ocupado' if self.residente_id else 'Disponível'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'residente' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'status'}
+        # Os contadores de ocupação são atualizados no post_save; a transação
+        # garante que mudam juntamente com a cama.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.numero} - {self.quarto}"
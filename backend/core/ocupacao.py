@@ -0,0 +1,184 @@
+"""
+Contadores de ocupação materializados em ``Quarto`` e ``Edificio``.
+
+Uma cama está ocupada quando ``Cama.residente`` está preenchido. Quando uma
+cama ou um residente muda, ``ajustar_quartos`` soma a diferença (``F()``) aos
+contadores do quarto e do edifício: duas linhas alteradas, nada recontado.
+Quando um quarto muda, e nas operações em massa (importação, alocação) e na
+reparação, ``recalcular_quartos`` bloqueia os quartos afetados
+(``SELECT ... FOR UPDATE``), reconta-os a partir das suas camas e soma de novo
+os totais dos respetivos edifícios. Os relatórios leem os números já calculados.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .cache import invalidar
+from .models import Edificio, Quarto, Cama
+
+CAMPOS_QUARTO = ('total_camas', 'camas_ocupadas', 'camas_livres')
+CAMPOS_EDIFICIO = ('total_quartos', 'quartos_livres', 'capacidade', 'total_camas', 'camas_ocupadas', 'camas_livres')
+
+
+def _ids(valores):
+    return sorted({valor for valor in valores if valor is not None})
+
+
+def contar_quartos(quarto_ids=None):
+    """
+    Devolve ``{quarto_id: {campo: valor}}`` calculado a partir das camas
+    (de todos os quartos quando ``quarto_ids`` é ``None``).
+    """
+    camas = Cama.objects.all()
+    if quarto_ids is None:
+        quarto_ids = Quarto.objects.values_list('id', flat=True)
+    else:
+        camas = camas.filter(quarto_id__in=quarto_ids)
+    contagens = {quarto_id: {'total_camas': 0, 'camas_ocupadas': 0} for quarto_id in quarto_ids}
+    linhas = camas.values('quarto_id').annotate(
+        total=Count('id'),
+        ocupadas=Count('id', filter=Q(residente__isnull=False)),
+    ).order_by()
+    for linha in linhas:
+        contagens[linha['quarto_id']] = {'total_camas': linha['total'], 'camas_ocupadas': linha['ocupadas']}
+    for valores in contagens.values():
+        valores['camas_livres'] = valores['total_camas'] - valores['camas_ocupadas']
+    return contagens
+
+
+def contar_edificios(edificio_ids=None):
+    """
+    Devolve ``{edificio_id: {campo: valor}}`` somado a partir dos contadores dos
+    quartos (de todos os edifícios quando ``edificio_ids`` é ``None``).
+
+    Tal como no relatório original, um quarto conta como livre se tiver pelo
+    menos uma cama livre ou não tiver camas.
+    """
+    quartos = Quarto.objects.all()
+    if edificio_ids is None:
+        edificio_ids = Edificio.objects.values_list('id', flat=True)
+    else:
+        quartos = quartos.filter(edificio_id__in=edificio_ids)
+    vazio = dict.fromkeys(CAMPOS_EDIFICIO, 0)
+    contagens = {edificio_id: dict(vazio) for edificio_id in edificio_ids}
+    linhas = quartos.values('edificio_id').annotate(
+        n_quartos=Count('id'),
+        n_livres=Count('id', filter=Q(camas_livres__gt=0) | Q(total_camas=0)),
+        soma_capacidade=Sum('capacidade'),
+        soma_camas=Sum('total_camas'),
+        soma_ocupadas=Sum('camas_ocupadas'),
+    ).order_by()
+    for linha in linhas:
+        contagens[linha['edificio_id']] = {
+            'total_quartos': linha['n_quartos'],
+            'quartos_livres': linha['n_livres'],
+            'capacidade': linha['soma_capacidade'] or 0,
+            'total_camas': linha['soma_camas'] or 0,
+            'camas_ocupadas': linha['soma_ocupadas'] or 0,
+            'camas_livres': (linha['soma_camas'] or 0) - (linha['soma_ocupadas'] or 0),
+        }
+    return contagens
+
+
+def _gravar(modelo, contagens, campos):
+    # Os contadores são inteiros pequenos e muitos registos têm os mesmos
+    # valores (por exemplo, quartos acabados de importar): cada combinação
+    # é gravada com um UPDATE ... WHERE id IN (...), em vez do CASE por
+    # registo do bulk_update.
+    grupos = defaultdict(list)
+    for pk, valores in contagens.items():
+        grupos[tuple(valores[campo] for campo in campos)].append(pk)
+    for valores, pks in grupos.items():
+        for inicio in range(0, len(pks), 500):
+            modelo.objects.filter(pk__in=pks[inicio:inicio + 500]).update(**dict(zip(campos, valores)))
+    invalidar(modelo)
+
+
+def _livre(total_camas, camas_livres):
+    # Como em contar_edificios: livre com uma cama livre ou sem camas.
+    return total_camas == 0 or camas_livres > 0
+
+
+def ajustar_quartos(alteracoes):
+    """
+    Aplica ``alteracoes``, pares ``(quarto_id, camas, ocupadas)`` com as
+    diferenças (positivas ou negativas) no número de camas e de camas
+    ocupadas, aos contadores dos quartos e dos seus edifícios. Os quartos e
+    depois os edifícios são alterados por ordem de id, como em
+    ``recalcular_quartos``, para evitar deadlocks.
+    """
+    diferencas = defaultdict(lambda: [0, 0])
+    for quarto_id, camas, ocupadas in alteracoes:
+        if quarto_id is not None:
+            diferencas[quarto_id][0] += camas
+            diferencas[quarto_id][1] += ocupadas
+    diferencas = {quarto_id: d for quarto_id, d in sorted(diferencas.items()) if any(d)}
+    if not diferencas:
+        return
+    edificios = defaultdict(lambda: dict.fromkeys(('total_camas', 'camas_ocupadas', 'camas_livres', 'quartos_livres'), 0))
+    with transaction.atomic():
+        for quarto_id, (camas, ocupadas) in diferencas.items():
+            livres = camas - ocupadas
+            Quarto.objects.filter(pk=quarto_id).update(
+                total_camas=F('total_camas') + camas,
+                camas_ocupadas=F('camas_ocupadas') + ocupadas,
+                camas_livres=F('camas_livres') + livres,
+            )
+            # O UPDATE bloqueia o quarto até ao fim da transação: lemos os
+            # valores que acabámos de escrever.
+            quarto = Quarto.objects.filter(pk=quarto_id).values('edificio_id', 'total_camas', 'camas_livres').first()
+            if quarto is None:
+                continue
+            edificio = edificios[quarto['edificio_id']]
+            edificio['total_camas'] += camas
+            edificio['camas_ocupadas'] += ocupadas
+            edificio['camas_livres'] += livres
+            edificio['quartos_livres'] += (
+                _livre(quarto['total_camas'], quarto['camas_livres'])
+                - _livre(quarto['total_camas'] - camas, quarto['camas_livres'] - livres)
+            )
+        for edificio_id, d in sorted(edificios.items()):
+            Edificio.objects.filter(pk=edificio_id).update(**{campo: F(campo) + valor for campo, valor in d.items()})
+    invalidar(Quarto, Edificio)
+
+
+def recalcular_edificios(edificio_ids):
+    edificio_ids = _ids(edificio_ids)
+    if not edificio_ids:
+        return
+    with transaction.atomic():
+        # Bloqueia os edifícios por ordem de id para serializar atualizações
+        # concorrentes sem risco de deadlock.
+        existentes = list(Edificio.objects.select_for_update().filter(id__in=edificio_ids).order_by('id').values_list('id', flat=True))
+        _gravar(Edificio, contar_edificios(existentes), CAMPOS_EDIFICIO)
+
+
+def recalcular_quartos(quarto_ids, edificio_ids=()):
+    """
+    Recalcula os contadores dos quartos indicados e dos seus edifícios.
+    ``edificio_ids`` acrescenta edifícios que também devem ser recalculados
+    (por exemplo, o edifício de onde um quarto foi removido).
+    """
+    quarto_ids = _ids(quarto_ids)
+    with transaction.atomic():
+        quartos = list(
+            Quarto.objects.select_for_update().filter(id__in=quarto_ids).order_by('id').values_list('id', 'edificio_id')
+        )
+        _gravar(Quarto, contar_quartos([quarto_id for quarto_id, _ in quartos]), CAMPOS_QUARTO)
+        recalcular_edificios([edificio_id for _, edificio_id in quartos] + list(edificio_ids))
+
+
+def divergencias():
+    """
+    Compara os contadores guardados com os valores reais e devolve a lista
+    de ``(modelo, id, campo, guardado, real)`` que não coincidem.
+    """
+    erros = []
+    quartos = {q['id']: q for q in Quarto.objects.values('id', *CAMPOS_QUARTO)}
+    for pk, reais in contar_quartos().items():
+        erros += [('Quarto', pk, c, quartos[pk][c], reais[c]) for c in CAMPOS_QUARTO if quartos[pk][c] != reais[c]]
+    edificios = {e['id']: e for e in Edificio.objects.values('id', *CAMPOS_EDIFICIO)}
+    for pk, reais in contar_edificios().items():
+        erros += [('Edificio', pk, c, edificios[pk][c], reais[c]) for c in CAMPOS_EDIFICIO if edificios[pk][c] != reais[c]]
+    return erros
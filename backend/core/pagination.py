@@ -0,0 +1,59 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from .expansao import carregar_relacoes
+from .filtros import filtrar
+from .streaming import pedido_streaming, resposta_streaming
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Paginação por cursor (keyset) ordenada pela chave primária.
+
+    O cursor é opaco e estável: a página seguinte é obtida com um filtro
+    ``id > último id`` sobre o índice, pelo que a página N custa o mesmo que a
+    primeira (ao contrário de OFFSET). A paginação só é aplicada quando o
+    cliente envia ``?page_size=`` ou quando ``REST_FRAMEWORK['PAGE_SIZE']``
+    está definido; caso contrário a listagem completa é devolvida.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINACAO_TAMANHO_MAXIMO
+
+    def get_ordering(self, request, queryset, view):
+        # ?ordem= da filtragem declarada na view (core.filtros), que só
+        # aceita campos indexados do próprio modelo.
+        filtragem = getattr(view, 'filtragem', None)
+        ordem = filtragem.ordem(request.query_params) if filtragem is not None else None
+        return ordem or super().get_ordering(request, queryset, view)
+
+
+class PaginacaoCandidaturas(PaginacaoCursor):
+    """
+    Candidaturas mais recentes primeiro. O ``id`` desempata submissões com a
+    mesma data.
+    """
+    ordering = ('-data_submissao', '-id')
+
+
+def resposta_lista(view, queryset, serializer_class, paginacao_class=PaginacaoCursor):
+    """
+    Serializa ``queryset`` numa ``APIView``, paginando quando o pedido o solicita
+    ou escrevendo a listagem completa em streaming com ``?stream=1``. Aplica
+    antes a ``filtragem`` da view (core.filtros) e carrega só as relações que
+    o serializer vai aninhar (core.expansao).
+    """
+    request = view.request
+    queryset = carregar_relacoes(filtrar(request, queryset, view), serializer_class, request)
+    contexto = {'request': request, 'view': view}
+    paginador = paginacao_class()
+    if pedido_streaming(request):
+        # Pela mesma ordem das páginas (a da paginação ou a de ?ordem=).
+        ordem = paginador.get_ordering(request, queryset, view)
+        return resposta_streaming(queryset, serializer_class, contexto, ordem)
+    pagina = paginador.paginate_queryset(queryset, request, view=view)
+    if pagina is None:
+        return Response(serializer_class(queryset, many=True, context=contexto).data)
+    serializer = serializer_class(pagina, many=True, context=contexto)
+    return paginador.get_paginated_response(serializer.data)
@@ -0,0 +1,212 @@
+"""
+Perfil de um único pedido, pedido por um utilizador ``is_staff`` com o
+cabeçalho ``X-Perfil: 1`` ou o parâmetro ``?perfil=1``.
+
+Para esse pedido grava em ``PERFILADOR_DIRETORIO`` dois ficheiros com o mesmo
+id: ``<id>.prof``, o perfil de CPU do cProfile (``pstats``, snakeviz...), e
+``<id>.json``, com o pico de memória e as linhas que mais alocaram
+(tracemalloc), todas as queries SQL com a duração e um resumo das funções
+mais pesadas. O id é devolvido no cabeçalho ``X-Perfil-Id``.
+
+O middleware só é instalado com ``PERFILADOR=True``. Pedidos de quem não é
+staff ignoram a flag, e só é perfilado um pedido de cada vez: o tracemalloc
+é global ao processo e abranda todas as threads enquanto está ativo.
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.authentication import CachedJWTAuthentication
+from .instrumentacao import capturar_sql
+
+CABECALHO = 'X-Perfil'
+PARAMETRO = 'perfil'
+CABECALHO_ID = 'X-Perfil-Id'
+VALORES_ATIVOS = ('1', 'true', 'sim')
+
+FUNCOES_NO_RESUMO = 40
+LINHAS_DE_MEMORIA = 20
+TAMANHO_MAXIMO_PARAMETROS = 500
+
+_em_curso = threading.Lock()
+
+
+class Perfil:
+    """Recolha de um pedido perfilado: CPU, memória e SQL."""
+
+    def __init__(self):
+        # Começa pela data, para os ids ficarem por ordem cronológica.
+        self.id = f"{timezone.now():%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:8]}"
+        self.cpu = cProfile.Profile()
+        self.queries = []
+        self.view = None
+        self.inicio = self.duracao = None
+        self.memoria_inicial = 0
+        self.memoria = None
+        self._tracemalloc = False
+
+    def executar(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'duracaoMs': round((time.perf_counter() - inicio) * 1000, 3),
+                'sql': sql,
+                'parametros': None if many else repr(params)[:TAMANHO_MAXIMO_PARAMETROS],
+                'executemany': many,
+            })
+
+    def iniciar(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc = True
+        tracemalloc.reset_peak()
+        self.memoria_inicial = tracemalloc.get_traced_memory()[0]
+        self.inicio = time.perf_counter()
+        self.cpu.enable()
+
+    def parar(self):
+        self.cpu.disable()
+        self.duracao = time.perf_counter() - self.inicio
+        atual, pico = tracemalloc.get_traced_memory()
+        self.memoria = {
+            'picoBytes': pico - self.memoria_inicial,
+            'retidaBytes': atual - self.memoria_inicial,
+            'maioresAlocacoes': [
+                {'local': str(estatistica.traceback), 'bytes': estatistica.size, 'blocos': estatistica.count}
+                for estatistica in tracemalloc.take_snapshot().statistics('lineno')[:LINHAS_DE_MEMORIA]
+            ],
+        }
+        if self._tracemalloc:
+            tracemalloc.stop()
+
+    def gravar(self, diretorio, request, response, utilizador):
+        diretorio = Path(diretorio)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        self.cpu.dump_stats(diretorio / f'{self.id}.prof')
+
+        resumo = io.StringIO()
+        pstats.Stats(self.cpu, stream=resumo).sort_stats('cumulative').print_stats(FUNCOES_NO_RESUMO)
+        documento = {
+            'id': self.id,
+            'criadoEm': timezone.now().isoformat(),
+            'metodo': request.method,
+            'caminho': request.get_full_path(),
+            'view': self.view,
+            'estado': response.status_code,
+            'utilizador': utilizador.get_username(),
+            'duracaoMs': round(self.duracao * 1000, 2),
+            'memoria': self.memoria,
+            'totalQueries': len(self.queries),
+            'sqlMs': round(sum(query['duracaoMs'] for query in self.queries), 2),
+            'queries': self.queries,
+            'resumoCpu': resumo.getvalue(),
+        }
+        (diretorio / f'{self.id}.json').write_text(json.dumps(documento, indent=2, ensure_ascii=False), encoding='utf-8')
+        _limpar(diretorio, settings.PERFILADOR_MAXIMO_ARTEFACTOS)
+
+
+def _limpar(diretorio, maximo):
+    """Apaga os artefactos mais antigos acima de ``maximo``."""
+    artefactos = sorted(diretorio.glob('*.json'))
+    for antigo in artefactos[:max(len(artefactos) - maximo, 0)]:
+        antigo.unlink(missing_ok=True)
+        antigo.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def pedido_de_perfil(request):
+    valor = request.headers.get(CABECALHO) or request.GET.get(PARAMETRO) or ''
+    return valor.lower() in VALORES_ATIVOS
+
+
+def utilizador_staff(request):
+    """O utilizador da sessão ou do JWT, se for staff; caso contrário ``None``."""
+    utilizador = getattr(request, 'user', None)
+    if utilizador is None or not utilizador.is_authenticated:
+        try:
+            autenticado = CachedJWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        utilizador = autenticado[0] if autenticado else None
+    if utilizador is not None and utilizador.is_active and utilizador.is_staff:
+        return utilizador
+    return None
+
+
+class PerfiladorMiddleware:
+    """
+    Deve ficar depois do ``AuthenticationMiddleware``, para aceitar também
+    sessões de administração.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.diretorio = settings.PERFILADOR_DIRETORIO
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not pedido_de_perfil(request):
+            return self.get_response(request)
+        utilizador = utilizador_staff(request)
+        if utilizador is None or not _em_curso.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            request.perfil = perfil = Perfil()
+            with capturar_sql(perfil.executar):
+                perfil.iniciar()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    perfil.parar()
+            perfil.gravar(self.diretorio, request, response, utilizador)
+        finally:
+            _em_curso.release()
+        response.headers[CABECALHO_ID] = perfil.id
+        return response
+
+    async def __acall__(self, request):
+        if not pedido_de_perfil(request):
+            return await self.get_response(request)
+        utilizador = await sync_to_async(utilizador_staff)(request)
+        if utilizador is None or not _em_curso.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            request.perfil = perfil = Perfil()
+            # O cProfile só vê a thread do event loop; o trabalho feito em
+            # sync_to_async aparece como espera, mas as queries são todas
+            # registadas (o wrapper fica na thread desses sync_to_async).
+            sql = await sync_to_async(capturar_sql)(perfil.executar)
+            perfil.iniciar()
+            try:
+                response = await self.get_response(request)
+            finally:
+                perfil.parar()
+                await sync_to_async(sql.close)()
+            await sync_to_async(perfil.gravar)(self.diretorio, request, response, utilizador)
+        finally:
+            _em_curso.release()
+        response.headers[CABECALHO_ID] = perfil.id
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        perfil = getattr(request, 'perfil', None)
+        if perfil is not None:
+            classe = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+            perfil.view = (classe or view_func).__qualname__
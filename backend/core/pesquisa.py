@@ -0,0 +1,282 @@
+"""
+Pesquisa aproximada de residentes, estudantes, residências e candidaturas:
+insensível a maiúsculas e acentos e tolerante a erros de escrita.
+
+A semelhança é a de trigramas do pg_trgm: cada palavra é partida em grupos
+de três caracteres e uma palavra da consulta encontra uma palavra do texto
+quando partilham pelo menos ``PESQUISA_LIMIAR`` dos seus trigramas.
+
+No PostgreSQL a pesquisa corre na base de dados, com o operador ``<%`` e a
+``word_similarity`` do pg_trgm sobre ``pesquisa_texto(...)`` (texto sem
+acentos, ver a migração core 0006, que cria os índices GIN). Nas outras
+bases de dados (o SQLite dos testes) é usado um índice de trigramas em
+memória, construído no primeiro pedido de cada processo e reconstruído
+quando um dos modelos muda (carimbos de versão de ``core.cache``; com cache
+por processo, até ``CACHE_VERSOES_TIMEOUT`` segundos depois de uma gravação
+noutro processo).
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, F, FloatField, Func, TextField, Value
+
+from accounts.models import CustomUser
+from candidaturas.models import Candidatura
+from candidaturas.serializers import CandidaturaSerializer
+from estudantes.models import Estudante
+from estudantes.serializers import EstudanteSerializer
+from . import cache
+from .models import Residencia, Residente
+from .serializers import ResidenciaSerializer, ResidenteSerializer
+
+PALAVRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos, como a ``pesquisa_texto`` do PostgreSQL."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def palavras(texto):
+    return PALAVRA.findall(normalizar(texto))
+
+
+def trigramas(palavra):
+    """Trigramas de uma palavra já normalizada, com o espaçamento do pg_trgm."""
+    palavra = f'  {palavra} '
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+@dataclass(frozen=True)
+class Fonte:
+    """
+    Campos de ``modelo`` onde se pesquisa; ``caminho`` leva de ``modelo`` ao
+    id do resultado (por exemplo das residências às suas candidaturas). Os
+    campos têm de coincidir com os índices da migração core 0006.
+    """
+    modelo: type
+    campos: tuple
+    caminho: str = 'pk'
+
+    def __post_init__(self):
+        cache.versionados(self.modelos)
+
+    @property
+    def modelos(self):
+        """Modelos lidos pela fonte, de que depende o índice em memória."""
+        modelos, atual = [self.modelo], self.modelo
+        if self.caminho != 'pk':
+            for nome in self.caminho.split('__')[:-1]:
+                atual = atual._meta.get_field(nome).related_model
+                modelos.append(atual)
+        return modelos
+
+
+@dataclass(frozen=True)
+class Tipo:
+    """Um grupo de resultados da pesquisa."""
+    modelo: type
+    permissao: str
+    serializer: type
+    fontes: tuple
+    relacoes: tuple = field(default_factory=tuple)
+
+
+TIPOS = {
+    'residentes': Tipo(
+        Residente, 'core.view_residente', ResidenteSerializer,
+        (Fonte(Residente, ('nome', 'email', 'telefone')),),
+    ),
+    'estudantes': Tipo(
+        Estudante, 'estudantes.view_estudante', EstudanteSerializer,
+        (Fonte(Estudante, ('Nome',)), Fonte(CustomUser, ('email',), 'estudante__id')),
+    ),
+    'residencias': Tipo(
+        Residencia, 'core.view_residencia', ResidenciaSerializer,
+        (Fonte(Residencia, ('Nome',)),),
+    ),
+    'candidaturas': Tipo(
+        Candidatura, 'candidaturas.view_candidatura', CandidaturaSerializer,
+        (
+            Fonte(Estudante, ('Nome',), 'candidaturas__id'),
+            Fonte(CustomUser, ('email',), 'estudante__candidaturas__id'),
+            Fonte(Residencia, ('Nome',), 'candidaturas__id'),
+        ),
+        ('residencia', 'estudante'),
+    ),
+}
+
+
+# ----- PostgreSQL -----
+
+class Texto(Func):
+    """``pesquisa_texto(campos...)``: os campos juntos, sem acentos e em minúsculas."""
+    function = 'pesquisa_texto'
+    output_field = TextField()
+
+
+class Semelhante(Func):
+    """``consulta <% texto``: alguma parte do texto é semelhante à consulta."""
+    template = '%(expressions)s'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+
+class SemelhancaPalavras(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+def _procurar_postgresql(fonte, consulta, limite):
+    termo = Texto(Value(consulta))
+    texto = Texto(*(F(campo) for campo in fonte.campos))
+    queryset = fonte.modelo._default_manager.filter(Semelhante(termo, texto))
+    if fonte.caminho != 'pk':
+        queryset = queryset.filter(**{f'{fonte.caminho}__isnull': False})
+    return list(
+        queryset.annotate(relevancia=SemelhancaPalavras(termo, texto))
+        .order_by('-relevancia', fonte.caminho)
+        .values_list(fonte.caminho, 'relevancia')[:limite]
+    )
+
+
+# ----- Índice em memória -----
+
+class Indice:
+    """
+    Índice invertido de trigramas das palavras de uma fonte. As palavras
+    repetem-se muito (nomes, domínios de email), por isso o índice é sobre o
+    vocabulário e cada palavra guarda as linhas onde aparece.
+    """
+
+    def __init__(self, linhas):
+        self.ids = []
+        self.palavras = []
+        self.linhas = []
+        self.trigramas = defaultdict(list)
+        vocabulario = {}
+        for id_resultado, *valores in linhas:
+            linha = len(self.ids)
+            self.ids.append(id_resultado)
+            for palavra in set(palavras(' '.join(valor for valor in valores if valor))):
+                indice = vocabulario.get(palavra)
+                if indice is None:
+                    indice = vocabulario[palavra] = len(self.palavras)
+                    self.palavras.append(palavra)
+                    self.linhas.append([])
+                    for trigrama in trigramas(palavra):
+                        self.trigramas[trigrama].append(indice)
+                self.linhas[indice].append(linha)
+
+    def semelhantes(self, palavra, limiar):
+        """``{indice da palavra: semelhança}`` das palavras acima do limiar."""
+        procurados = trigramas(palavra)
+        # Uma palavra semelhante partilha pelo menos ``minimo`` trigramas,
+        # logo contém algum dos ``len - minimo + 1`` mais raros.
+        minimo = max(math.ceil(limiar * len(procurados) - 1e-9), 1)
+        raros = sorted(procurados, key=lambda trigrama: len(self.trigramas.get(trigrama, ())))
+        candidatas = set()
+        for trigrama in raros[:len(procurados) - minimo + 1]:
+            candidatas.update(self.trigramas.get(trigrama, ()))
+        resultado = {}
+        for indice in candidatas:
+            semelhanca = len(procurados & trigramas(self.palavras[indice])) / len(procurados)
+            if semelhanca >= limiar:
+                resultado[indice] = semelhanca
+        return resultado
+
+    def procurar(self, consulta, limiar, limite):
+        """
+        ``[(id, relevancia)]`` das linhas onde cada palavra da consulta tem
+        uma palavra semelhante; a relevância é a média dessas semelhanças.
+        """
+        termos = palavras(consulta)
+        if not termos:
+            return []
+        pontos = None
+        for termo in termos:
+            por_linha = {}
+            for indice, semelhanca in self.semelhantes(termo, limiar).items():
+                for linha in self.linhas[indice]:
+                    if semelhanca > por_linha.get(linha, 0):
+                        por_linha[linha] = semelhanca
+            if pontos is None:
+                pontos = por_linha
+            else:
+                pontos = {linha: pontos[linha] + semelhanca for linha, semelhanca in por_linha.items() if linha in pontos}
+            if not pontos:
+                return []
+        melhores = {}
+        for linha, total in pontos.items():
+            id_resultado = self.ids[linha]
+            melhores[id_resultado] = max(melhores.get(id_resultado, 0), total / len(termos))
+        return heapq.nlargest(limite, melhores.items(), key=lambda item: (item[1], -item[0]))
+
+
+# fonte -> (versões dos modelos, Indice)
+_indices = {}
+_construcao = threading.Lock()
+
+
+def indice(fonte):
+    """O índice em memória de ``fonte``, reconstruído se os modelos mudaram."""
+    versao = tuple(token for token, _ in cache.versoes(fonte.modelos).values())
+    atual = _indices.get(fonte)
+    if atual is not None and atual[0] == versao:
+        return atual[1]
+    with _construcao:
+        atual = _indices.get(fonte)
+        if atual is None or atual[0] != versao:
+            queryset = fonte.modelo._default_manager.all()
+            if fonte.caminho != 'pk':
+                queryset = queryset.filter(**{f'{fonte.caminho}__isnull': False})
+            atual = _indices[fonte] = (versao, Indice(queryset.values_list(fonte.caminho, *fonte.campos).iterator()))
+    return atual[1]
+
+
+def _procurar_memoria(fonte, consulta, limite):
+    return indice(fonte).procurar(consulta, settings.PESQUISA_LIMIAR, limite)
+
+
+# ----- Pesquisa -----
+
+def pesquisar(consulta, tipos, limite):
+    """
+    ``{tipo: [(objeto, relevancia)]}`` com até ``limite`` resultados por
+    tipo, do mais ao menos relevante.
+    """
+    if connection.vendor != 'postgresql':
+        return _pesquisar(_procurar_memoria, consulta, tipos, limite)
+    # O limiar do operador <% é definido só para esta transação (is_local):
+    # a ligação pode ser reutilizada por outros pedidos.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(settings.PESQUISA_LIMIAR)],
+            )
+        return _pesquisar(_procurar_postgresql, consulta, tipos, limite)
+
+
+def _pesquisar(procurar, consulta, tipos, limite):
+    resultados = {}
+    for nome in tipos:
+        tipo = TIPOS[nome]
+        relevancias = {}
+        for fonte in tipo.fontes:
+            for id_resultado, relevancia in procurar(fonte, consulta, limite):
+                relevancias[id_resultado] = max(relevancias.get(id_resultado, 0), relevancia)
+        melhores = heapq.nlargest(limite, relevancias.items(), key=lambda item: (item[1], -item[0]))
+        objetos = tipo.modelo._default_manager.select_related(*tipo.relacoes).in_bulk([id_ for id_, _ in melhores])
+        # Ids que entretanto desapareceram (índice em memória desatualizado
+        # dentro da mesma versão) são ignorados.
+        resultados[nome] = [(objetos[id_], round(relevancia, 4)) for id_, relevancia in melhores if id_ in objetos]
+    return resultados
@@ -0,0 +1,95 @@
+"""
+Reserva temporária de camas: reservar, confirmar e libertar.
+
+Cada operação é um único ``UPDATE ... WHERE`` condicional sobre a linha da
+cama (compare-and-swap): só uma de várias reservas concorrentes encontra a
+cama livre e altera a linha, as outras afetam zero linhas. Não há nenhum
+bloqueio global, pelo que pedidos para camas diferentes nunca esperam uns
+pelos outros. Uma reserva expira sozinha: os filtros tratam uma reserva
+com ``reserva_expira_em`` no passado como inexistente.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidar
+from .models import Cama, Residente
+from .ocupacao import ajustar_quartos
+
+SEM_RESERVA = {'reserva_token': None, 'reserva_expira_em': None, 'reservada_por': None}
+
+
+class ReservaIndisponivel(Exception):
+    """A cama está ocupada, reservada por outro pedido, ou a reserva expirou."""
+
+
+def sem_reserva_ativa(agora=None):
+    """
+    Filtro para camas sem reserva em vigor.
+    """
+    agora = agora or timezone.now()
+    return Q(reserva_expira_em__isnull=True) | Q(reserva_expira_em__lte=agora)
+
+
+def reservar(cama_id, utilizador=None, duracao=None):
+    """
+    Reserva a cama por ``duracao`` segundos e devolve ``(token, expira_em)``.
+    """
+    agora = timezone.now()
+    expira_em = agora + timedelta(seconds=duracao or settings.RESERVA_CAMA_DURACAO)
+    token = uuid.uuid4()
+    alteradas = Cama.objects.filter(sem_reserva_ativa(agora), pk=cama_id, residente__isnull=True).update(
+        reserva_token=token, reserva_expira_em=expira_em, reservada_por=utilizador,
+    )
+    if not alteradas:
+        raise ReservaIndisponivel('A cama não está disponível para reserva.')
+    # update() não dispara sinais: renova os carimbos dos GET condicionais.
+    invalidar(Cama)
+    return token, expira_em
+
+
+def confirmar(cama_id, token, residente):
+    """
+    Atribui a cama reservada ao residente, se a reserva ainda estiver em vigor.
+    A cama que o residente ocupava antes fica livre.
+    """
+    with transaction.atomic():
+        # Confirmações simultâneas para o mesmo residente (em camas diferentes)
+        # ficam em série: a segunda vê, e liberta, a cama atribuída pela primeira.
+        Residente.objects.select_for_update().get(pk=residente.pk)
+        alteradas = Cama.objects.filter(
+            pk=cama_id, reserva_token=token, reserva_expira_em__gt=timezone.now(), residente__isnull=True,
+        ).update(residente=residente, status='Ocupado', **SEM_RESERVA)
+        if not alteradas:
+            raise ReservaIndisponivel('A reserva não existe ou já expirou.')
+        # A cama nova e a anterior (se houver), com os respetivos quartos.
+        camas = dict(Cama.objects.filter(residente=residente).values_list('pk', 'quarto_id'))
+        if anteriores := set(camas) - {cama_id}:
+            Cama.objects.filter(pk__in=anteriores).update(residente=None, status='Disponível')
+        Residente.objects.filter(pk=residente.pk).update(cama_id=cama_id)
+        # update() não dispara sinais: atualiza os contadores e a cache.
+        ajustar_quartos([(camas[cama_id], 0, 1), *((camas[pk], 0, -1) for pk in anteriores)])
+        invalidar(Cama, Residente)
+
+
+def libertar(cama_id, token):
+    """
+    Cancela a reserva antes de expirar.
+    """
+    # Sem token o filtro seria ``reserva_token IS NULL``: qualquer cama livre.
+    if token is None:
+        raise ReservaIndisponivel('A reserva não existe.')
+    if not Cama.objects.filter(pk=cama_id, reserva_token=token).update(**SEM_RESERVA):
+        raise ReservaIndisponivel('A reserva não existe.')
+    invalidar(Cama)
+
+
+def limpar_expiradas():
+    """
+    Apaga os dados de reservas expiradas (opcional: já são ignoradas).
+    """
+    return Cama.objects.filter(reserva_expira_em__lte=timezone.now()).update(**SEM_RESERVA)
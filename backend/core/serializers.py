@@ -1,31 +1,44 @@
 from rest_framework import serializers
+from .expansao import CamposDinamicosMixin
 from .models import Edificio, Quarto, Residente, Cama, Residencia
 
-class EdificioSerializer(serializers.ModelSerializer):
+# As relações aninhadas são declaradas em ``expansoes`` (core.expansao):
+# aceitam ?fields= e ?expand= e só são carregadas quando pedidas.
+
+class EdificioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Edificio
         fields = '__all__'
 
-class QuartoSerializer(serializers.ModelSerializer):
-    edificio = EdificioSerializer(read_only=True)
+class QuartoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    expansoes = {'edificio': EdificioSerializer}
     class Meta:
         model = Quarto
         fields = '__all__'
 
-class ResidenteSerializer(serializers.ModelSerializer):
+class ResidenteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Residente
         fields = '__all__'
 
-class CamaSerializer(serializers.ModelSerializer):
-    quarto = QuartoSerializer(read_only=True)
-    residente = ResidenteSerializer(read_only=True)
+class CamaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    expansoes = {'quarto': QuartoSerializer, 'residente': ResidenteSerializer}
     class Meta:
         model = Cama
-        fields = '__all__'
+        # O token da reserva dá poder para a confirmar ou cancelar: só é
+        # devolvido ao autor, na resposta de ReservarCamaView.
+        exclude = ['reserva_token', 'reserva_expira_em', 'reservada_por']
 
-class ResidenciaSerializer(serializers.ModelSerializer):
-    edificio = EdificioSerializer(read_only=True)
+class ResidenciaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    expansoes = {'edificio': EdificioSerializer}
     class Meta:
         model = Residencia
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# Corpos dos pedidos de reserva de camas (core.reservas).
+
+class LibertacaoReservaSerializer(serializers.Serializer):
+    token = serializers.UUIDField()
+
+class ConfirmacaoReservaSerializer(LibertacaoReservaSerializer):
+    residente = serializers.IntegerField()
@@ -0,0 +1,86 @@
+"""
+Mantém os contadores de ocupação (core.ocupacao) em dia.
+
+Também invalidam os agregados em cache (core.cache) do modelo alterado.
+
+As alterações de camas e residentes aplicam só a diferença
+(``ajustar_quartos``); as de quartos recontam o quarto e o edifício. Os sinais
+cobrem também as alterações que não passam por ``Model.save()``, como camas
+apagadas em cascata com o quarto ou o ``SET_NULL`` de ``Cama.residente``
+quando um residente é apagado. Operações em massa (``bulk_create``,
+``update``) não disparam sinais: quem as usa deve chamar
+``recalcular_quartos`` ou correr ``manage.py recalcular_ocupacao``.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cache
+from .models import Cama, Quarto, Residente
+from .ocupacao import ajustar_quartos, recalcular_edificios, recalcular_quartos
+
+
+def _ocupada(residente_id):
+    return int(residente_id is not None)
+
+
+@receiver(post_save, sender=Cama)
+def cama_gravada(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        ajustar_quartos([(instance.quarto_id, 1, _ocupada(instance.residente_id))])
+    elif not hasattr(instance, '_residente_id_original'):
+        # Sem o estado anterior (instância não lida da base de dados).
+        recalcular_quartos([instance.quarto_id])
+    else:
+        def gravado(campo):
+            return update_fields is None or campo in update_fields or f'{campo}_id' in update_fields
+
+        quarto_id = instance.quarto_id if gravado('quarto') else instance._quarto_id_original
+        residente_id = instance.residente_id if gravado('residente') else instance._residente_id_original
+        ajustar_quartos([
+            (instance._quarto_id_original, -1, -_ocupada(instance._residente_id_original)),
+            (quarto_id, 1, _ocupada(residente_id)),
+        ])
+        instance._quarto_id_original, instance._residente_id_original = quarto_id, residente_id
+        return
+    instance._quarto_id_original = instance.quarto_id
+    instance._residente_id_original = instance.residente_id
+
+
+@receiver(post_delete, sender=Cama)
+def cama_apagada(sender, instance, **kwargs):
+    ajustar_quartos([(instance.quarto_id, -1, -_ocupada(instance.residente_id))])
+
+
+@receiver(post_save, sender=Quarto)
+def quarto_gravado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    recalcular_quartos([instance.pk], edificio_ids=[getattr(instance, '_edificio_id_original', None)])
+    instance._edificio_id_original = instance.edificio_id
+
+
+@receiver(post_delete, sender=Quarto)
+def quarto_apagado(sender, instance, **kwargs):
+    recalcular_edificios([instance.edificio_id])
+
+
+@receiver(pre_delete, sender=Residente)
+def residente_a_apagar(sender, instance, **kwargs):
+    # As camas do residente são libertadas com SET_NULL (um UPDATE sem
+    # sinais); guardamos os quartos para os recalcular depois.
+    instance._quartos_ocupados = list(instance.camas.values_list('quarto_id', flat=True))
+
+
+@receiver(post_delete, sender=Residente)
+def residente_apagado(sender, instance, **kwargs):
+    ajustar_quartos((quarto_id, 0, -1) for quarto_id in getattr(instance, '_quartos_ocupados', []))
+
+
+@receiver([post_save, post_delete])
+def invalidar_cache(sender, **kwargs):
+    # Apaga os agregados em cache e renova o carimbo de versão do modelo;
+    # as gravações de outros modelos (sessões, tokens...) não custam nada.
+    if cache.tem_dependentes(sender):
+        cache.invalidar(sender)
@@ -0,0 +1,273 @@
+"""
+Conjunto de dados sintético para benchmarks, e instantâneos (dump/load) para
+que cada execução comece com dados idênticos.
+
+Cada unidade de ``escala`` gera 10 edifícios, cada um com uma residência e
+5 a 15 quartos individuais, duplos ou triplos (cerca de 100 quartos e 190
+camas por unidade; ``escala=525`` dá ~100 mil camas). Há 1,3 estudantes por
+cama, cada um com utilizador e candidatura (10% com uma segunda), com estados
+e datas de submissão distribuídos ao longo do ano anterior a
+``DATA_REFERENCIA``. As candidaturas aprovadas recebem, por ordem de
+submissão, um residente numa cama livre do edifício pedido.
+
+Tudo é gerado a partir de ``random.Random(semente)`` com ids explícitos, por
+isso a mesma semente numa base de dados vazia produz exatamente os mesmos
+dados. As linhas são inseridas em lotes com ``core.insercao`` e os contadores
+de ocupação são calculados durante a geração.
+"""
+import gzip
+import json
+import random
+from collections import Counter
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import count
+from operator import itemgetter
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+
+from accounts.models import CustomUser
+from candidaturas.models import Candidatura
+from estudantes.models import Estudante
+from .cache import invalidar
+from .insercao import inserir_linhas, reiniciar_sequencias
+from .models import Edificio, Quarto, Cama, Residente, Residencia
+from .streaming import percorrer_em_blocos
+
+# Modelos gerados, por ordem de dependência (também a ordem dos instantâneos).
+MODELOS = [CustomUser, Estudante, Edificio, Residencia, Quarto, Residente, Cama, Candidatura]
+
+DATA_REFERENCIA = datetime(2025, 9, 1, tzinfo=dt_timezone.utc)
+# Password de todos os utilizadores gerados.
+SENHA = 'sintetico123'
+DOMINIO_EMAIL = 'sintetico.unicv.cv'
+
+EDIFICIOS_POR_ESCALA = 10
+EDIFICIOS_POR_BLOCO = 50
+ESTUDANTES_POR_CAMA = 1.3
+SEGUNDA_CANDIDATURA = 0.1
+
+TIPOS_EDIFICIO = [('residencial', 8), ('comercial', 1), ('outros', 1)]
+TIPOS_QUARTO = [(('individual', 1), 3), (('duplo', 2), 5), (('triplo', 3), 2)]
+ESTADOS = [('pendente', 35), ('em_analise', 20), ('aprovado', 35), ('rejeitado', 10)]
+DOCUMENTOS = [campo.attname for campo in Candidatura._meta.concrete_fields if campo.name.endswith('_entregue')]
+
+NOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Carla', 'Paulo', 'Sónia', 'Nelson', 'Edna', 'Hélio',
+    'Djamila', 'Ivanilson', 'Keila', 'Adilson', 'Elisa', 'Mário', 'Neusa', 'Ailton', 'Jéssica', 'Wilson',
+]
+APELIDOS = [
+    'Tavares', 'Lopes', 'Silva', 'Fernandes', 'Gomes', 'Semedo', 'Monteiro', 'Pires', 'Varela', 'Moreira',
+    'Rodrigues', 'Barros', 'Furtado', 'Correia', 'Andrade', 'Évora', 'Spencer', 'Delgado', 'Almeida', 'Mendes',
+]
+CIDADES = ['Praia', 'Mindelo', 'Assomada', 'Espargos', 'São Filipe', 'Porto Novo', 'Tarrafal', 'Sal Rei']
+PREFIXOS = ['Bloco', 'Edifício', 'Residencial', 'Conjunto', 'Moradia']
+RUAS = ['da Universidade', 'Cidade do Cabo', 'da Ciência', 'do Conhecimento', 'Amílcar Cabral', 'da Liberdade']
+
+
+def _escolher(rng, opcoes):
+    valores, pesos = zip(*opcoes)
+    return rng.choices(valores, pesos)[0]
+
+
+def _proximo_id(modelo):
+    return (modelo.objects.aggregate(maximo=Max('pk'))['maximo'] or 0) + 1
+
+
+def _bloco(rng, ids, n_edificios, senha):
+    """
+    Gera as linhas de ``n_edificios`` edifícios e dos seus estudantes, como
+    ``{modelo: [linhas]}`` pela ordem de ``MODELOS``.
+    """
+    linhas = {modelo: [] for modelo in MODELOS}
+    livres, camas_por_id, quartos_por_id = {}, {}, {}
+
+    for _ in range(n_edificios):
+        edificio_id, cidade = next(ids[Edificio]), rng.choice(CIDADES)
+        edificio = {
+            'id': edificio_id,
+            'nome': f'{rng.choice(PREFIXOS)} {cidade} {edificio_id}',
+            'endereco': f'Rua {rng.choice(RUAS)}, {rng.randint(1, 999)}, {cidade}',
+            'tipo': _escolher(rng, TIPOS_EDIFICIO),
+            'numeroApartamentos': rng.randint(5, 15),
+        }
+        linhas[Edificio].append(edificio)
+        linhas[Residencia].append({'id': next(ids[Residencia]), 'Nome': f"Residência {edificio['nome']}", 'edificio_id': edificio_id})
+        livres[edificio_id] = []
+        for numero in range(1, edificio['numeroApartamentos'] + 1):
+            tipo, capacidade = _escolher(rng, TIPOS_QUARTO)
+            quarto = {
+                'id': next(ids[Quarto]), 'numero': f'{edificio_id}-{numero:02d}',
+                'capacidade': capacidade, 'edificio_id': edificio_id, 'tipo': tipo,
+            }
+            linhas[Quarto].append(quarto)
+            quartos_por_id[quarto['id']] = quarto
+            for letra in 'ABC'[:capacidade]:
+                cama = {'id': next(ids[Cama]), 'numero': f"{quarto['numero']}-{letra}", 'quarto_id': quarto['id'], 'residente_id': None, 'status': 'Disponível'}
+                linhas[Cama].append(cama)
+                camas_por_id[cama['id']] = cama
+                livres[edificio_id].append(cama['id'])
+        rng.shuffle(livres[edificio_id])
+
+    residencias = [(residencia['id'], residencia['edificio_id']) for residencia in linhas[Residencia]]
+    for _ in range(round(len(linhas[Cama]) * ESTUDANTES_POR_CAMA)):
+        user_id, estudante_id = next(ids[CustomUser]), next(ids[Estudante])
+        nome = f'{rng.choice(NOMES)} {rng.choice(APELIDOS)} {rng.choice(APELIDOS)}'
+        email = f'estudante{user_id}@{DOMINIO_EMAIL}'
+        linhas[CustomUser].append({'id': user_id, 'email': email, 'password': senha})
+        linhas[Estudante].append({'id': estudante_id, 'user_id': user_id, 'Nome': nome})
+        escolhidas = rng.sample(residencias, 2 if rng.random() < SEGUNDA_CANDIDATURA and len(residencias) > 1 else 1)
+        for residencia_id, edificio_id in escolhidas:
+            candidatura = {
+                'id': next(ids[Candidatura]), 'estudante_id': estudante_id, 'residencia_id': residencia_id,
+                'status': _escolher(rng, ESTADOS), 'residente_id': None,
+                'data_submissao': DATA_REFERENCIA - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                **{documento: 'sim' if rng.random() < 0.8 else None for documento in DOCUMENTOS},
+            }
+            linhas[Candidatura].append(candidatura)
+            # Chaves auxiliares, ignoradas na inserção.
+            candidatura.update(_edificio_id=edificio_id, _nome=nome, _email=email)
+
+    # Alojamento: as aprovadas mais antigas ficam com as camas livres.
+    alojados = set()
+    aprovadas = sorted((c for c in linhas[Candidatura] if c['status'] == 'aprovado'), key=itemgetter('data_submissao', 'id'))
+    for candidatura in aprovadas:
+        if candidatura['estudante_id'] in alojados or not livres[candidatura['_edificio_id']]:
+            continue
+        cama = camas_por_id[livres[candidatura['_edificio_id']].pop()]
+        residente_id = next(ids[Residente])
+        linhas[Residente].append({
+            'id': residente_id, 'nome': candidatura['_nome'], 'email': candidatura['_email'],
+            'telefone': f'9{rng.randint(500000, 999999)}', 'cama_id': cama['id'],
+        })
+        cama['residente_id'], cama['status'] = residente_id, 'Ocupado'
+        candidatura['residente_id'] = residente_id
+        alojados.add(candidatura['estudante_id'])
+
+    _contadores(linhas[Edificio], quartos_por_id, linhas[Cama])
+    return linhas
+
+
+def _contadores(edificios, quartos_por_id, camas):
+    # Os mesmos valores que core.ocupacao calcularia depois da inserção.
+    for quarto in quartos_por_id.values():
+        quarto.update(total_camas=0, camas_ocupadas=0, camas_livres=0)
+    for cama in camas:
+        quarto = quartos_por_id[cama['quarto_id']]
+        quarto['total_camas'] += 1
+        quarto['camas_ocupadas' if cama['residente_id'] else 'camas_livres'] += 1
+    por_edificio = {edificio['id']: edificio for edificio in edificios}
+    for edificio in edificios:
+        edificio.update(total_quartos=0, quartos_livres=0, capacidade=0, total_camas=0, camas_ocupadas=0, camas_livres=0)
+    for quarto in quartos_por_id.values():
+        edificio = por_edificio[quarto['edificio_id']]
+        edificio['total_quartos'] += 1
+        edificio['quartos_livres'] += quarto['camas_livres'] > 0 or quarto['total_camas'] == 0
+        edificio['capacidade'] += quarto['capacidade']
+        for campo in ('total_camas', 'camas_ocupadas', 'camas_livres'):
+            edificio[campo] += quarto[campo]
+
+
+def gerar(escala, semente=0, tamanho_lote=None, progresso=None):
+    """
+    Gera e grava o conjunto de dados para ``escala`` numa única transação, e
+    devolve ``Counter({nome do modelo: linhas criadas})``. ``progresso``
+    é chamado com ``(edifícios gerados, total)`` após cada bloco.
+    """
+    rng = random.Random(semente)
+    ids = {modelo: count(_proximo_id(modelo)) for modelo in MODELOS}
+    # Salt fixo: o hash (e o instantâneo) também é determinístico.
+    senha = make_password(SENHA, salt=f'sintetico{semente}')
+    totais = Counter()
+    total_edificios = escala * EDIFICIOS_POR_ESCALA
+
+    with transaction.atomic():
+        for inicio in range(0, total_edificios, EDIFICIOS_POR_BLOCO):
+            n_edificios = min(EDIFICIOS_POR_BLOCO, total_edificios - inicio)
+            for modelo, linhas in _bloco(rng, ids, n_edificios, senha).items():
+                inserir_linhas(modelo, linhas, tamanho_lote=tamanho_lote)
+                totais[modelo._meta.verbose_name_plural] += len(linhas)
+            if progresso:
+                progresso(inicio + n_edificios, total_edificios)
+        reiniciar_sequencias(*MODELOS)
+        invalidar(*MODELOS)
+    return totais
+
+
+class InstantaneoInvalido(Exception):
+    pass
+
+
+CONVERTIDOS = ('DateTimeField', 'DateField', 'TimeField', 'UUIDField', 'DecimalField')
+
+
+def _json(valor):
+    if isinstance(valor, (datetime, date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (UUID, Decimal)):
+        return str(valor)
+    raise TypeError(f'Valor não serializável: {valor!r}')
+
+
+def guardar_instantaneo(caminho):
+    """
+    Escreve as tabelas de ``MODELOS`` em ``caminho`` (JSON por linha, gzip)
+    e devolve o número de linhas de cada modelo.
+    """
+    totais = Counter()
+    with gzip.open(caminho, 'wt', encoding='utf-8', compresslevel=1) as ficheiro:
+        ficheiro.write(json.dumps({'versao': 1}) + '\n')
+        for modelo in MODELOS:
+            colunas = [campo.attname for campo in modelo._meta.concrete_fields]
+            queryset = modelo.objects.values_list(*colunas)
+            total = queryset.count()
+            ficheiro.write(json.dumps({'modelo': modelo._meta.label, 'colunas': colunas, 'linhas': total}) + '\n')
+            for bloco in percorrer_em_blocos(queryset, settings.STREAMING_TAMANHO_BLOCO * 10, chave=itemgetter(0)):
+                ficheiro.writelines(json.dumps(linha, default=_json, ensure_ascii=False) + '\n' for linha in bloco)
+            totais[modelo._meta.verbose_name_plural] = total
+    return totais
+
+
+def carregar_instantaneo(caminho, tamanho_lote=None):
+    """
+    Carrega um instantâneo de ``guardar_instantaneo``. As tabelas de
+    ``MODELOS`` têm de estar vazias (por exemplo, depois de ``manage.py flush``).
+    """
+    ocupadas = [modelo._meta.label for modelo in MODELOS if modelo.objects.exists()]
+    if ocupadas:
+        raise InstantaneoInvalido(f"As tabelas têm de estar vazias: {', '.join(ocupadas)}.")
+    modelos = {modelo._meta.label: modelo for modelo in MODELOS}
+    totais = Counter()
+
+    with gzip.open(caminho, 'rt', encoding='utf-8') as ficheiro, transaction.atomic():
+        if json.loads(ficheiro.readline() or '{}').get('versao') != 1:
+            raise InstantaneoInvalido('Ficheiro de instantâneo desconhecido.')
+        for cabecalho in map(json.loads, ficheiro):
+            modelo = modelos.get(cabecalho.get('modelo'))
+            if modelo is None:
+                raise InstantaneoInvalido(f"Modelo desconhecido no instantâneo: {cabecalho.get('modelo')}.")
+            colunas = cabecalho['colunas']
+            campos = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+            # Datas e UUIDs voltam do JSON como texto.
+            conversoes = [
+                (posicao, campos[coluna].to_python) for posicao, coluna in enumerate(colunas)
+                if campos[coluna].get_internal_type() in CONVERTIDOS
+            ]
+
+            def linhas():
+                for _ in range(cabecalho['linhas']):
+                    valores = json.loads(next(ficheiro))
+                    for posicao, converter in conversoes:
+                        if valores[posicao] is not None:
+                            valores[posicao] = converter(valores[posicao])
+                    yield dict(zip(colunas, valores))
+
+            inserir_linhas(modelo, linhas(), tamanho_lote=tamanho_lote)
+            totais[modelo._meta.verbose_name_plural] = cabecalho['linhas']
+        reiniciar_sequencias(*MODELOS)
+        invalidar(*MODELOS)
+    return totais
@@ -0,0 +1,100 @@
+from functools import reduce
+from operator import attrgetter, or_
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def pedido_streaming(request):
+    """
+    Indica se o cliente pediu a listagem completa em streaming (``?stream=1``).
+    """
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'sim')
+
+
+def _depois(ordem, valores):
+    """
+    Filtro das linhas que vêm depois de ``valores`` na ``ordem``: para
+    ``('-data', 'id')``, ``data < d OR (data = d AND id > i)``.
+    """
+    condicoes, iguais = [], Q()
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip('-')
+        condicoes.append(iguais & Q(**{f"{nome}__{'lt' if campo.startswith('-') else 'gt'}": valor}))
+        iguais &= Q(**{nome: valor})
+    primeiro = ordem[0].lstrip('-')
+    # Redundante, mas limita o intervalo do índice ao primeiro campo.
+    limite = Q(**{f"{primeiro}__{'lte' if ordem[0].startswith('-') else 'gte'}": valores[0]})
+    return limite & reduce(or_, condicoes)
+
+
+def percorrer_em_blocos(queryset, tamanho_bloco, chave=None, ordem=('pk',)):
+    """
+    Percorre ``queryset`` em blocos pela ``ordem`` pedida (por omissão a chave
+    primária), desempatada pela chave primária.
+
+    Cada bloco é uma query curta (``(campos) > últimos valores LIMIT n``), por
+    isso nenhum cursor fica aberto na base de dados enquanto o cliente recebe
+    os dados. ``chave`` extrai de cada linha o valor do campo da ordem, ou um
+    tuplo com vários campos (útil para ``values()``); os campos da ordem não
+    podem ser nulos.
+    """
+    ordem = tuple(ordem)
+    if not {campo.lstrip('-') for campo in ordem} & {'pk', 'id', queryset.model._meta.pk.name}:
+        ordem += ('-pk' if ordem[0].startswith('-') else 'pk',)
+    chave = chave or attrgetter(*(campo.lstrip('-') for campo in ordem))
+    queryset = queryset.order_by(*ordem)
+    ultimos = None
+    while True:
+        bloco = queryset if ultimos is None else queryset.filter(_depois(ordem, ultimos))
+        bloco = list(bloco[:tamanho_bloco])
+        if not bloco:
+            return
+        yield bloco
+        ultimos = chave(bloco[-1])
+        if len(ordem) == 1:
+            ultimos = (ultimos,)
+
+
+def gerar_json(queryset, serializer_class, contexto=None, tamanho_bloco=None, ordem=None):
+    """
+    Gera um array JSON, bloco a bloco, com os objetos de ``queryset``
+    serializados pela ``ordem`` dada (a mesma da listagem paginada).
+    """
+    tamanho_bloco = tamanho_bloco or settings.STREAMING_TAMANHO_BLOCO
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    yield '['
+    primeiro = True
+    for bloco in percorrer_em_blocos(queryset, tamanho_bloco, ordem=ordem or ('pk',)):
+        dados = serializer_class(bloco, many=True, context=contexto or {}).data
+        itens = ','.join(encoder.encode(item) for item in dados)
+        yield itens if primeiro else ',' + itens
+        primeiro = False
+    yield ']'
+
+
+def resposta_streaming(queryset, serializer_class, contexto=None, ordem=None):
+    """
+    Resposta JSON escrita incrementalmente; a memória do worker fica limitada
+    a um bloco, qualquer que seja o número de linhas.
+    """
+    return StreamingHttpResponse(
+        gerar_json(queryset, serializer_class, contexto, ordem=ordem),
+        content_type='application/json',
+    )
+
+
+class ListagemStreamingMixin:
+    """
+    Acrescenta o modo ``?stream=1`` ao ``list()`` das views genéricas do DRF,
+    pela mesma ordem da paginação (incluindo ``?ordem=``).
+    """
+
+    def list(self, request, *args, **kwargs):
+        if pedido_streaming(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            ordem = self.paginator.get_ordering(request, queryset, self) if self.paginator else None
+            return resposta_streaming(queryset, self.get_serializer_class(), self.get_serializer_context(), ordem)
+        return super().list(request, *args, **kwargs)
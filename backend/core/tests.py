@@ -1,3 +1,387 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from candidaturas.models import Candidatura
+from . import benchmark, cache, explicacao, ocupacao, reservas, sintetico
+from .condicional import GetCondicionalMixin
+from .executores import ExecutorLimitado, ExecutorSaturado
+from .models import Edificio, Quarto, Residente, Cama
+
+
+class ContadoresOcupacaoTests(TestCase):
+    """
+    Os contadores materializados acompanham as alterações de camas, quartos e residentes.
+    """
+
+    def setUp(self):
+        self.edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        self.quarto = Quarto.objects.create(numero='A-1', capacidade=2, edificio=self.edificio)
+        self.outro_quarto = Quarto.objects.create(numero='A-2', capacidade=1, edificio=self.edificio)
+        self.residente = Residente.objects.create(nome='Ana Tavares')
+
+    def assertContadores(self, objeto, **esperado):
+        objeto.refresh_from_db()
+        self.assertEqual({campo: getattr(objeto, campo) for campo in esperado}, esperado)
+
+    def test_criar_ocupar_e_mover_camas(self):
+        cama = Cama.objects.create(numero='1', quarto=self.quarto)
+        Cama.objects.create(numero='2', quarto=self.quarto, residente=self.residente)
+        self.assertContadores(self.quarto, total_camas=2, camas_ocupadas=1, camas_livres=1)
+        self.assertContadores(
+            self.edificio, total_quartos=2, quartos_livres=2, capacidade=3,
+            total_camas=2, camas_ocupadas=1, camas_livres=1,
+        )
+
+        cama = Cama.objects.get(pk=cama.pk)
+        cama.quarto = self.outro_quarto
+        cama.save()
+        self.assertContadores(self.quarto, total_camas=1, camas_ocupadas=1, camas_livres=0)
+        self.assertContadores(self.outro_quarto, total_camas=1, camas_ocupadas=0, camas_livres=1)
+        self.assertContadores(self.edificio, quartos_livres=1, camas_livres=1)
+
+    def test_camas_ajustadas_por_diferenca(self):
+        outro = Residente.objects.create(nome='Rui Lopes')
+        camas = [Cama.objects.create(numero=str(i), quarto=self.quarto) for i in range(2)]
+        passos = [
+            lambda: setattr(camas[0], 'residente', self.residente) or camas[0].save(),
+            lambda: setattr(camas[0], 'quarto', self.outro_quarto) or camas[0].save(),
+            lambda: setattr(camas[1], 'residente', outro) or camas[1].save(update_fields=['residente']),
+            # Só o número é gravado: o quarto alterado em memória não conta.
+            lambda: setattr(camas[1], 'quarto', self.outro_quarto) or camas[1].save(update_fields=['numero']),
+            lambda: setattr(camas[0], 'residente', None) or camas[0].save(),
+            lambda: camas[0].delete(),
+            lambda: outro.delete(),
+        ]
+        for i, passo in enumerate(passos):
+            with CaptureQueriesContext(connection) as consultas:
+                passo()
+            self.assertEqual(ocupacao.divergencias(), [], i)
+            # Nenhuma recontagem: só UPDATEs com F() e a leitura do quarto.
+            self.assertFalse([q['sql'] for q in consultas.captured_queries if 'COUNT(' in q['sql'] or 'SUM(' in q['sql']], i)
+        self.assertContadores(self.quarto, total_camas=1, camas_ocupadas=0, camas_livres=1)
+        self.assertContadores(self.edificio, total_camas=1, camas_ocupadas=0, quartos_livres=2)
+
+    def test_apagar_residente_liberta_cama(self):
+        Cama.objects.create(numero='1', quarto=self.quarto, residente=self.residente)
+        self.residente.delete()
+        self.assertContadores(self.quarto, camas_ocupadas=0, camas_livres=1)
+        self.assertContadores(self.edificio, camas_ocupadas=0)
+
+    def test_apagar_quarto_atualiza_edificio(self):
+        Cama.objects.create(numero='1', quarto=self.quarto, residente=self.residente)
+        self.quarto.delete()
+        self.assertContadores(self.edificio, total_quartos=1, capacidade=1, total_camas=0, camas_ocupadas=0)
+
+    def test_comando_verifica_e_reconstroi(self):
+        Cama.objects.create(numero='1', quarto=self.quarto, residente=self.residente)
+        call_command('recalcular_ocupacao', '--verificar', stdout=StringIO())
+
+        # update() não dispara sinais: os contadores ficam desatualizados.
+        Cama.objects.update(residente=None)
+        with self.assertRaises(CommandError):
+            call_command('recalcular_ocupacao', '--verificar', stdout=StringIO())
+
+        call_command('recalcular_ocupacao', stdout=StringIO())
+        call_command('recalcular_ocupacao', '--verificar', stdout=StringIO())
+        self.assertContadores(self.edificio, camas_ocupadas=0, camas_livres=1)
+
+
+class ReservasCamaTests(TestCase):
+
+    def setUp(self):
+        edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        self.quarto = Quarto.objects.create(numero='A-1', capacidade=1, edificio=edificio)
+        self.cama = Cama.objects.create(numero='1', quarto=self.quarto)
+        self.residente = Residente.objects.create(nome='Ana Tavares')
+
+    def test_reservar_confirmar(self):
+        token, _ = reservas.reservar(self.cama.pk)
+        with self.assertRaises(reservas.ReservaIndisponivel):
+            reservas.reservar(self.cama.pk)
+        reservas.confirmar(self.cama.pk, token, self.residente)
+        self.cama.refresh_from_db()
+        self.assertEqual((self.cama.residente_id, self.cama.status), (self.residente.pk, 'Ocupado'))
+        self.assertIsNone(self.cama.reserva_token)
+        self.quarto.refresh_from_db()
+        self.assertEqual(self.quarto.camas_ocupadas, 1)
+
+    def test_confirmar_liberta_a_cama_anterior(self):
+        outro_quarto = Quarto.objects.create(numero='A-2', capacidade=1, edificio=self.quarto.edificio)
+        anterior = Cama.objects.create(numero='1', quarto=outro_quarto, residente=self.residente)
+        token, _ = reservas.reservar(self.cama.pk)
+        reservas.confirmar(self.cama.pk, token, self.residente)
+        anterior.refresh_from_db()
+        self.assertEqual((anterior.residente_id, anterior.status), (None, 'Disponível'))
+        self.assertEqual(list(Cama.objects.filter(residente=self.residente)), [self.cama])
+        outro_quarto.refresh_from_db()
+        self.quarto.refresh_from_db()
+        self.assertEqual((outro_quarto.camas_ocupadas, outro_quarto.camas_livres), (0, 1))
+        self.assertEqual((self.quarto.camas_ocupadas, self.quarto.camas_livres), (1, 0))
+
+    def test_reserva_expirada_liberta_a_cama(self):
+        token, _ = reservas.reservar(self.cama.pk, duracao=60)
+        Cama.objects.update(reserva_expira_em=timezone.now() - timedelta(seconds=1))
+        with self.assertRaises(reservas.ReservaIndisponivel):
+            reservas.confirmar(self.cama.pk, token, self.residente)
+        reservas.reservar(self.cama.pk)
+
+    def test_libertar(self):
+        token, _ = reservas.reservar(self.cama.pk)
+        reservas.libertar(self.cama.pk, token)
+        reservas.reservar(self.cama.pk)
+
+    def test_reservar_e_libertar_renovam_o_carimbo(self):
+        carimbo = cache.versoes([Cama])
+        token, _ = reservas.reservar(self.cama.pk)
+        self.assertNotEqual(cache.versoes([Cama]), carimbo)
+        carimbo = cache.versoes([Cama])
+        reservas.libertar(self.cama.pk, token)
+        self.assertNotEqual(cache.versoes([Cama]), carimbo)
+
+    def test_estado_acompanha_residente(self):
+        self.cama.residente = self.residente
+        self.cama.save(update_fields=['residente'])
+        self.cama.refresh_from_db()
+        self.assertEqual(self.cama.status, 'Ocupado')
+
+
+class ReservasConcorrentesTests(TransactionTestCase):
+    """
+    Centenas de pedidos concorrentes sobre poucas camas nunca reservam a
+    mesma cama duas vezes.
+    """
+    PEDIDOS = 300
+    CAMAS = 10
+
+    def test_sem_reservas_duplicadas(self):
+        edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        quarto = Quarto.objects.create(numero='A-1', capacidade=self.CAMAS, edificio=edificio)
+        camas = [Cama.objects.create(numero=str(i), quarto=quarto).pk for i in range(self.CAMAS)]
+        barreira = threading.Barrier(16)
+
+        def pedido(i):
+            if i < 16:
+                barreira.wait()
+            try:
+                return camas[i % self.CAMAS], reservas.reservar(camas[i % self.CAMAS])[0]
+            except (reservas.ReservaIndisponivel, OperationalError):
+                # OperationalError: o SQLite de testes recusa escritas
+                # simultâneas; conta como reserva perdida, nunca como dupla.
+                return None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            ganhos = [r for r in executor.map(pedido, range(self.PEDIDOS)) if r]
+
+        por_cama = Counter(cama_id for cama_id, _ in ganhos)
+        self.assertTrue(ganhos)
+        self.assertEqual(max(por_cama.values()), 1)
+        for cama_id, token in ganhos:
+            self.assertEqual(Cama.objects.get(pk=cama_id).reserva_token, token)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'O SQLite não tem bloqueios de linha')
+class ConfirmacoesConcorrentesTests(TransactionTestCase):
+    """
+    Confirmações simultâneas para o mesmo residente em camas diferentes
+    deixam-no com uma só cama.
+    """
+
+    def test_residente_fica_com_uma_cama(self):
+        edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        quarto = Quarto.objects.create(numero='A-1', capacidade=2, edificio=edificio)
+        camas = [Cama.objects.create(numero=str(i), quarto=quarto).pk for i in range(2)]
+        tokens = [reservas.reservar(cama_id)[0] for cama_id in camas]
+        residente = Residente.objects.create(nome='Ana Tavares')
+        barreira = threading.Barrier(2)
+
+        def confirmar(i):
+            barreira.wait()
+            try:
+                reservas.confirmar(camas[i], tokens[i], residente)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(confirmar, range(2)))
+
+        self.assertEqual(Cama.objects.filter(residente=residente).count(), 1)
+        quarto.refresh_from_db()
+        self.assertEqual((quarto.camas_ocupadas, quarto.camas_livres), (1, 1))
+
+
+class InvalidacaoCacheTests(TestCase):
+
+    def test_so_modelos_com_dependentes_invalidam(self):
+        with mock.patch.object(cache, 'invalidar') as invalidar:
+            Group.objects.create(name='Funcionários')
+            invalidar.assert_not_called()
+            Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+            invalidar.assert_any_call(Edificio)
+
+    def test_modelos_versao_tem_de_ter_carimbo(self):
+        with self.assertRaises(ImproperlyConfigured):
+            type('Vista', (GetCondicionalMixin,), {'modelos_versao': (Group,)})
+
+
+class ExecutorLimitadoTests(TestCase):
+
+    def test_recusa_acima_do_limite(self):
+        executor = ExecutorLimitado('teste', max_workers=1, max_pendentes=1)
+        libertar = threading.Event()
+        futuros = [executor.submeter(libertar.wait) for _ in range(2)]
+        with self.assertRaises(ExecutorSaturado):
+            executor.submeter(libertar.wait)
+        libertar.set()
+        for futuro in futuros:
+            futuro.result()
+        self.assertEqual(executor.executar(sum, [1, 2]), 3)
+
+
+class DadosSinteticosTests(TestCase):
+
+    def instantaneo(self, gerar):
+        """
+        Corre ``gerar`` numa transação desfeita no fim e devolve o conteúdo
+        do instantâneo gravado a seguir.
+        """
+        with tempfile.TemporaryDirectory() as pasta, transaction.atomic():
+            caminho = os.path.join(pasta, 'dados.jsonl.gz')
+            gerar()
+            sintetico.guardar_instantaneo(caminho)
+            transaction.set_rollback(True)
+            with gzip.open(caminho, 'rt', encoding='utf-8') as ficheiro:
+                return ficheiro.read()
+
+    def test_geracao_deterministica(self):
+        def gerar():
+            totais = sintetico.gerar(1, semente=7)
+            self.assertEqual(totais['edificios'], 10)
+            self.assertEqual(totais['camas'], Cama.objects.count())
+            self.assertEqual(ocupacao.divergencias(), [])
+            self.assertTrue(Candidatura.objects.filter(status='aprovado', residente__cama__residente__isnull=False).exists())
+
+        primeiro = self.instantaneo(gerar)
+        self.assertEqual(self.instantaneo(lambda: sintetico.gerar(1, semente=7)), primeiro)
+        self.assertNotEqual(self.instantaneo(lambda: sintetico.gerar(1, semente=8)), primeiro)
+
+    def test_guardar_e_carregar_instantaneo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'dados.jsonl.gz')
+            original = self.instantaneo(lambda: call_command(
+                'popular_tudo', '--scale', '1', '--seed', '3', '--dump', caminho, stdout=StringIO(),
+            ))
+            self.assertEqual(self.instantaneo(lambda: call_command('popular_tudo', '--load', caminho, stdout=StringIO())), original)
+
+            sintetico.gerar(1)
+            with self.assertRaises(CommandError):
+                call_command('popular_tudo', '--load', caminho, stdout=StringIO())
+
+
+class BenchmarkEndpointsTests(TestCase):
+
+    def test_todas_as_rotas_tem_caso(self):
+        self.assertEqual(benchmark.rotas_sem_caso(), [])
+
+    def test_executar_e_comparar(self):
+        resultados = benchmark.executar([1], repeticoes=1, filtro={'dashboard', 'atualizar_estado', 'reservar_cama'})
+        medicoes = resultados['1']
+        self.assertEqual(
+            {nome: metricas['codigo'] for nome, metricas in medicoes.items()},
+            {'dashboard': 200, 'atualizar_estado': 200, 'reservar_cama': 201},
+        )
+        # Os pedidos e os dados gerados são desfeitos no fim.
+        self.assertFalse(Edificio.objects.exists())
+
+        baseline = {'escalas': resultados}
+        self.assertEqual(benchmark.comparar(resultados, baseline), [])
+        mais_queries = {'1': {**medicoes, 'dashboard': {**medicoes['dashboard'], 'queries': medicoes['dashboard']['queries'] + 1}}}
+        regressoes = benchmark.comparar(mais_queries, baseline)
+        self.assertEqual(len(regressoes), 1)
+        self.assertIn('dashboard', regressoes[0])
+        self.assertEqual(benchmark.comparar(mais_queries, baseline, {'queries': 1}), [])
+
+
+class PerfiladorTests(TestCase):
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.diretorio = Path(diretorio.name)
+        definicoes = override_settings(
+            MIDDLEWARE=[*settings.MIDDLEWARE, 'core.perfilador.PerfiladorMiddleware'],
+            PERFILADOR_DIRETORIO=self.diretorio,
+            PERFILADOR_MAXIMO_ARTEFACTOS=2,
+        )
+        definicoes.enable()
+        self.addCleanup(definicoes.disable)
+        self.admin = CustomUser.objects.create_superuser(email='admin@unicv.cv', password=None)
+        Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+
+    def pedir(self, utilizador, cabecalhos=None, **kwargs):
+        cabecalhos = {'Authorization': f'Bearer {AccessToken.for_user(utilizador)}', **(cabecalhos or {})}
+        return self.client.get(reverse('lista_edificios'), headers=cabecalhos, **kwargs)
+
+    def test_perfil_de_staff(self):
+        resposta = self.pedir(self.admin, query_params={'perfil': '1'})
+        self.assertEqual(resposta.status_code, 200)
+        perfil_id = resposta.headers['X-Perfil-Id']
+        self.assertTrue((self.diretorio / f'{perfil_id}.prof').exists())
+        documento = json.loads((self.diretorio / f'{perfil_id}.json').read_text(encoding='utf-8'))
+        self.assertEqual(documento['view'], 'ListaEdificiosView')
+        self.assertEqual(documento['utilizador'], 'admin@unicv.cv')
+        self.assertEqual(documento['totalQueries'], len(documento['queries']))
+        self.assertTrue(any('core_edificio' in query['sql'] for query in documento['queries']))
+        self.assertGreater(documento['memoria']['picoBytes'], 0)
+        self.assertIn('cumulative', documento['resumoCpu'])
+
+    def test_ignorado_sem_flag_ou_sem_staff(self):
+        self.assertNotIn('X-Perfil-Id', self.pedir(self.admin).headers)
+        visitante = CustomUser.objects.create_user(email='visitante@unicv.cv', password=None)
+        self.assertNotIn('X-Perfil-Id', self.pedir(visitante, {'X-Perfil': '1'}).headers)
+        self.assertEqual(list(self.diretorio.iterdir()), [])
+
+    def test_mantem_os_artefactos_mais_recentes(self):
+        ids = [self.pedir(self.admin, query_params={'perfil': '1'}).headers['X-Perfil-Id'] for _ in range(3)]
+        self.assertEqual(sorted(caminho.stem for caminho in self.diretorio.glob('*.json')), sorted(ids[1:]))
+
+
+class ExplicacaoTests(TestCase):
+
+    def test_assinala_scan_sem_indice(self):
+        sintetico.gerar(1)
+        consulta = next(consulta for consulta in explicacao.CONSULTAS if consulta.view == 'QuartosPorTipoView')
+        [plano] = explicacao.explicar([consulta], limite_linhas=0)
+        self.assertEqual(plano.assinalados, [])
+
+        # Desfeito com a transação do teste.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX quarto_tipo_idx')
+        [plano] = explicacao.explicar([consulta], limite_linhas=0)
+        self.assertEqual(plano.assinalados, ['core_quarto'])
+        # Tabelas abaixo do limite não são assinaladas.
+        self.assertEqual(explicacao.explicar([consulta], limite_linhas=10_000)[0].assinalados, [])
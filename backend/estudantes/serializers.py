@@ -1,8 +1,9 @@
 
 from rest_framework import serializers
+from core.expansao import CamposDinamicosMixin
 from .models import Estudante
 
-class EstudanteSerializer(serializers.ModelSerializer):
+class EstudanteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Estudante
         fields = '__all__'
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+Agregados dos relatórios e do dashboard, guardados em cache (core.cache).
+
+Cada agregado tem uma variante ``*_async`` sobre o ORM assíncrono, usada pelas
+views assíncronas; ambas partilham a query e a entrada da cache.
+"""
+from django.db.models import Count, Sum
+
+from candidaturas.models import Candidatura
+from core.cache import em_cache
+from core.models import Edificio, Quarto, Cama, Residente
+
+
+def _estados():
+    return Candidatura.objects.values('status').annotate(total=Count('id')).order_by('status')
+
+
+@em_cache('candidaturas_por_estado', [Candidatura])
+def candidaturas_por_estado():
+    """
+    Contagem de candidaturas agrupadas por estado.
+    """
+    return [{'status': estado['status'], 'count': estado['total']} for estado in _estados()]
+
+
+@em_cache('candidaturas_por_estado', [Candidatura])
+async def candidaturas_por_estado_async():
+    return [{'status': estado['status'], 'count': estado['total']} async for estado in _estados()]
+
+
+@em_cache('edificios_por_tipo', [Edificio])
+def edificios_por_tipo():
+    """
+    Contagem de edifícios agrupados por tipo.
+    """
+    tipos = Edificio.objects.values('tipo').annotate(count=Count('id')).order_by('tipo')
+    return [{'name': t['tipo'], 'count': t['count']} for t in tipos]
+
+
+@em_cache('total_residentes', [Residente])
+def total_residentes():
+    return Residente.objects.count()
+
+
+@em_cache('total_residentes', [Residente])
+async def total_residentes_async():
+    return await Residente.objects.acount()
+
+
+def _residentes_por_edificio():
+    return Edificio.objects.annotate(
+        total=Count('quartos__camas__residentes', distinct=True)
+    ).values('id', 'nome', 'total').order_by('nome')
+
+
+@em_cache('residentes_por_edificio', [Edificio, Quarto, Cama, Residente])
+def residentes_por_edificio():
+    """
+    Número de residentes alojados em cada edifício, numa única query agrupada.
+    """
+    return [{'id': e['id'], 'nome': e['nome'], 'totalResidentes': e['total']} for e in _residentes_por_edificio()]
+
+
+@em_cache('residentes_por_edificio', [Edificio, Quarto, Cama, Residente])
+async def residentes_por_edificio_async():
+    return [{'id': e['id'], 'nome': e['nome'], 'totalResidentes': e['total']} async for e in _residentes_por_edificio()]
+
+
+# Soma dos contadores materializados (core.ocupacao): O(edifícios) em vez de
+# percorrer a tabela de camas.
+def _soma_edificios(*campos):
+    return {campo: Sum(campo) for campo in campos}
+
+
+def _sem_nulos(totais):
+    return {campo: valor or 0 for campo, valor in totais.items()}
+
+
+CAMPOS_CAMAS = ('total_camas', 'camas_livres', 'camas_ocupadas')
+CAMPOS_QUARTOS = ('total_quartos', 'quartos_livres')
+
+
+def _formatar_camas(totais):
+    return {
+        'totalCamas': totais['total_camas'],
+        'camasLivres': totais['camas_livres'],
+        'camasOcupadas': totais['camas_ocupadas'],
+    }
+
+
+def _formatar_quartos(totais):
+    return {
+        'totalQuartos': totais['total_quartos'],
+        'quartosLivres': totais['quartos_livres'],
+        'quartosOcupados': totais['total_quartos'] - totais['quartos_livres'],
+    }
+
+
+@em_cache('ocupacao_camas', [Edificio])
+def ocupacao_camas():
+    """
+    Total de camas, livres (sem residente) e ocupadas.
+    """
+    return _formatar_camas(_sem_nulos(Edificio.objects.aggregate(**_soma_edificios(*CAMPOS_CAMAS))))
+
+
+@em_cache('ocupacao_camas', [Edificio])
+async def ocupacao_camas_async():
+    return _formatar_camas(_sem_nulos(await Edificio.objects.aaggregate(**_soma_edificios(*CAMPOS_CAMAS))))
+
+
+@em_cache('ocupacao_quartos', [Edificio])
+def ocupacao_quartos():
+    """
+    Total de quartos, livres (com pelo menos uma cama sem residente) e ocupados.
+    """
+    return _formatar_quartos(_sem_nulos(Edificio.objects.aggregate(**_soma_edificios(*CAMPOS_QUARTOS))))
+
+
+@em_cache('ocupacao_quartos', [Edificio])
+async def ocupacao_quartos_async():
+    return _formatar_quartos(_sem_nulos(await Edificio.objects.aaggregate(**_soma_edificios(*CAMPOS_QUARTOS))))
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RelatoriosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relatorios'
+
+    def ready(self):
+        # Regista os agregados em cache (core.cache) em todos os processos,
+        # incluindo os comandos de gestão, que nunca importam as views: sem
+        # isto, o invalidar() desses comandos não apagaria nenhum agregado.
+        from . import agregados  # noqa: F401
@@ -0,0 +1,115 @@
+import csv
+import tempfile
+from operator import itemgetter
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+from candidaturas.models import Candidatura
+from core.models import Cama, Residente
+from core.streaming import percorrer_em_blocos
+
+
+class Exportacao:
+    """
+    Descreve uma exportação: cabeçalho, colunas lidas com ``values_list`` e a
+    permissão exigida. A primeira coluna é sempre a chave primária, usada
+    para percorrer a tabela em blocos.
+    """
+
+    def __init__(self, nome, permissao, queryset, colunas, cabecalho):
+        self.nome = nome
+        self.permissao = permissao
+        self.queryset = queryset
+        self.colunas = colunas
+        self.cabecalho = cabecalho
+
+    def linhas(self):
+        """
+        Gera as linhas da exportação sem carregar a tabela inteira em memória.
+        """
+        queryset = self.queryset.values_list(*self.colunas)
+        tamanho_bloco = settings.STREAMING_TAMANHO_BLOCO
+        for bloco in percorrer_em_blocos(queryset, tamanho_bloco, chave=itemgetter(0)):
+            yield from bloco
+
+
+DOCUMENTOS_CANDIDATURA = [
+    'cni_ou_passaporte_entregue',
+    'declaracao_matricula_entregue',
+    'declaracao_rendimento_entregue',
+    'declaracao_subsistencia_entregue',
+    'declaracao_residencia_entregue',
+]
+
+EXPORTACOES = {
+    'candidaturas': Exportacao(
+        nome='candidaturas',
+        permissao='candidaturas.view_candidatura',
+        queryset=Candidatura.objects.all(),
+        colunas=['id', 'data_submissao', 'status', 'residencia__Nome', 'estudante__Nome', *DOCUMENTOS_CANDIDATURA],
+        cabecalho=['ID', 'Data de Submissão', 'Estado', 'Residência', 'Estudante', *DOCUMENTOS_CANDIDATURA],
+    ),
+    'residentes': Exportacao(
+        nome='residentes',
+        permissao='core.view_residente',
+        queryset=Residente.objects.all(),
+        colunas=['id', 'nome', 'email', 'telefone', 'cama__quarto__edificio__nome', 'cama__quarto__numero', 'cama__numero'],
+        cabecalho=['ID', 'Nome', 'Email', 'Telefone', 'Edifício', 'Quarto', 'Cama'],
+    ),
+    'ocupacao-camas': Exportacao(
+        nome='ocupacao-camas',
+        permissao='core.view_cama',
+        queryset=Cama.objects.all(),
+        colunas=['id', 'quarto__edificio__nome', 'quarto__numero', 'numero', 'status', 'residente__nome'],
+        cabecalho=['ID', 'Edifício', 'Quarto', 'Cama', 'Estado', 'Residente'],
+    ),
+}
+
+
+class _Eco:
+    """
+    Pseudo-ficheiro cujo ``write`` devolve o texto, para o ``csv.writer``
+    produzir cada linha sem buffer intermédio.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(exportacao):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(exportacao.cabecalho)
+    for linha in exportacao.linhas():
+        yield escritor.writerow(linha)
+
+
+def resposta_csv(exportacao):
+    resposta = StreamingHttpResponse(gerar_csv(exportacao), content_type='text/csv; charset=utf-8')
+    resposta['Content-Disposition'] = f'attachment; filename="{exportacao.nome}.csv"'
+    return resposta
+
+
+def resposta_xlsx(exportacao):
+    """
+    Escreve o livro em modo ``write_only`` (as linhas vão para disco à medida
+    que são geradas) e envia o ficheiro em blocos. Requer ``openpyxl``.
+    """
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    folha = livro.create_sheet(exportacao.nome[:31])
+    folha.append(exportacao.cabecalho)
+    for linha in exportacao.linhas():
+        # O Excel não aceita datas com fuso horário.
+        folha.append([valor.replace(tzinfo=None) if hasattr(valor, 'tzinfo') else valor for valor in linha])
+
+    ficheiro = tempfile.TemporaryFile()
+    livro.save(ficheiro)
+    ficheiro.seek(0)
+    return FileResponse(
+        ficheiro,
+        as_attachment=True,
+        filename=f'{exportacao.nome}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
@@ -0,0 +1,422 @@
+"""
+Importação em massa de edifícios, quartos, camas e residentes a partir de
+ficheiros CSV ou XLSX.
+
+O ficheiro é lido em streaming e processado em lotes de
+``IMPORTACAO_TAMANHO_LOTE`` linhas. Em cada lote as referências (o edifício
+de um quarto, o quarto de uma cama, a cama de um residente) e os duplicados
+são resolvidos com uma query por tipo, as linhas válidas são inseridas com
+``bulk_create`` (``COPY`` no PostgreSQL) e as
+inválidas são devolvidas com o número da linha e os erros de cada coluna.
+Como as escritas em massa não disparam sinais, os contadores de ocupação são
+recalculados e a cache invalidada no fim, na mesma transação.
+"""
+import csv
+import io
+import time
+import unicodedata
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+
+from core.cache import invalidar
+from core.insercao import inserir_linhas
+from core.models import Edificio, Quarto, Cama, Residente
+from core.ocupacao import recalcular_edificios, recalcular_quartos
+from core.reservas import sem_reserva_ativa
+
+FORMATOS = ('csv', 'xlsx')
+
+
+class ErroImportacao(Exception):
+    """
+    O ficheiro não pode ser importado (formato desconhecido, ilegível ou sem
+    as colunas obrigatórias).
+    """
+
+
+def _normalizar(nome):
+    # 'Edifício ' -> 'edificio'; 'numeroApartamentos' -> 'numeroapartamentos'
+    nome = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode()
+    return nome.strip().lower().replace(' ', '_')
+
+
+def _limpar(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+    return None if valor in ('', None) else valor
+
+
+def _ler_csv(ficheiro):
+    texto = io.TextIOWrapper(ficheiro, encoding='utf-8-sig', newline='')
+    primeira = texto.readline()
+    # O Excel em português grava CSV separado por ';'.
+    separador = ';' if primeira.count(';') > primeira.count(',') else ','
+    yield next(csv.reader([primeira], delimiter=separador), [])
+    yield from csv.reader(texto, delimiter=separador)
+
+
+def _ler_xlsx(ficheiro):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErroImportacao('Importação XLSX indisponível: o pacote openpyxl não está instalado.')
+    try:
+        livro = load_workbook(ficheiro, read_only=True, data_only=True)
+    except Exception as erro:
+        raise ErroImportacao(f'Ficheiro XLSX inválido: {erro}')
+    try:
+        yield from livro.active.iter_rows(values_only=True)
+    finally:
+        livro.close()
+
+
+def ler_linhas(ficheiro, formato):
+    """
+    Gera ``(número da linha, {coluna normalizada: valor})`` para cada linha
+    não vazia de ``ficheiro`` (aberto em modo binário). A primeira linha é o
+    cabeçalho.
+    """
+    if formato not in FORMATOS:
+        raise ErroImportacao(f'Formato inválido: {formato}. Use csv ou xlsx.')
+    linhas = _ler_csv(ficheiro) if formato == 'csv' else _ler_xlsx(ficheiro)
+    try:
+        cabecalho = [_normalizar(coluna) for coluna in next(linhas, None) or []]
+        for numero, linha in enumerate(linhas, start=2):
+            valores = {coluna: _limpar(valor) for coluna, valor in zip(cabecalho, linha) if coluna}
+            if any(valor is not None for valor in valores.values()):
+                yield numero, valores
+    except UnicodeDecodeError:
+        raise ErroImportacao('O ficheiro CSV tem de estar em UTF-8.')
+
+
+class LinhaInvalida(Exception):
+
+    def __init__(self, erros):
+        super().__init__(erros)
+        self.erros = erros
+
+
+class Importacao:
+    """
+    Descreve a importação de um modelo. ``colunas`` mapeia cada coluna do
+    ficheiro para o campo do modelo validado com ``Field.clean``; as colunas
+    de referência são resolvidas por ``referencias`` e aplicadas por
+    ``resolver``. Cada subclasse diz também que chaves já existem na base de
+    dados e o que recalcular depois da inserção.
+    """
+    nome = None
+    permissao = None
+    modelo = None
+    colunas = {}
+    obrigatorias = ()
+
+    def validar_campos(self, valores):
+        dados, erros = {}, {}
+        for coluna, campo in self.colunas.items():
+            valor = valores.get(coluna)
+            field = self.modelo._meta.get_field(campo)
+            if valor is None:
+                if coluna in self.obrigatorias:
+                    erros[coluna] = ['Campo obrigatório.']
+                elif field.null:
+                    dados[campo] = None
+                continue
+            try:
+                dados[campo] = field.clean(valor, None)
+            except ValidationError as erro:
+                erros[coluna] = erro.messages
+        return dados, erros
+
+    def referencias(self, linhas):
+        return {}
+
+    def resolver(self, valores, dados, referencias):
+        """
+        Completa ``dados`` com as referências da linha; levanta ``LinhaInvalida``.
+        """
+
+    def chave(self, dados):
+        return None
+
+    def existentes(self, chaves):
+        return set()
+
+    def inserir(self, objetos):
+        if connection.vendor == 'postgresql':
+            inserir_linhas(self.modelo, (vars(objeto) for objeto in objetos), com_pk=False)
+        else:
+            self.modelo.objects.bulk_create(objetos, batch_size=settings.IMPORTACAO_TAMANHO_LOTE)
+
+    def depois(self, objetos):
+        """
+        Chamado com os objetos inseridos de cada lote.
+        """
+
+    def concluir(self):
+        invalidar(self.modelo)
+
+
+class ImportacaoEdificios(Importacao):
+    nome = 'edificios'
+    permissao = 'core.add_edificio'
+    modelo = Edificio
+    colunas = {'nome': 'nome', 'endereco': 'endereco', 'numeroapartamentos': 'numeroApartamentos', 'tipo': 'tipo'}
+    obrigatorias = ('nome', 'endereco', 'numeroapartamentos')
+
+
+class ImportacaoQuartos(Importacao):
+    """
+    Colunas: numero, capacidade, edificio (nome do edifício) e tipo.
+    """
+    nome = 'quartos'
+    permissao = 'core.add_quarto'
+    modelo = Quarto
+    colunas = {'numero': 'numero', 'capacidade': 'capacidade', 'tipo': 'tipo'}
+    obrigatorias = ('numero', 'capacidade', 'edificio')
+
+    def __init__(self):
+        self.edificio_ids = set()
+
+    def referencias(self, linhas):
+        nomes = {str(valores['edificio']) for _, valores in linhas if valores.get('edificio') is not None}
+        edificios = {}
+        for edificio_id, nome in Edificio.objects.filter(nome__in=nomes).values_list('id', 'nome'):
+            edificios.setdefault(nome, []).append(edificio_id)
+        return edificios
+
+    def resolver(self, valores, dados, edificios):
+        encontrados = edificios.get(str(valores['edificio']), [])
+        if len(encontrados) != 1:
+            motivo = 'Edifício inexistente.' if not encontrados else 'Há vários edifícios com este nome.'
+            raise LinhaInvalida({'edificio': [motivo]})
+        dados['edificio_id'] = encontrados[0]
+
+    def chave(self, dados):
+        return dados['numero']
+
+    def existentes(self, chaves):
+        return set(Quarto.objects.filter(numero__in=chaves).values_list('numero', flat=True))
+
+    def depois(self, objetos):
+        self.edificio_ids.update(objeto.edificio_id for objeto in objetos)
+
+    def concluir(self):
+        # Os quartos novos não têm camas: basta somar de novo os edifícios.
+        recalcular_edificios(self.edificio_ids)
+        invalidar(Quarto, Edificio)
+
+
+class ImportacaoCamas(Importacao):
+    """
+    Colunas: quarto (número do quarto) e numero.
+    """
+    nome = 'camas'
+    permissao = 'core.add_cama'
+    modelo = Cama
+    colunas = {'numero': 'numero'}
+    obrigatorias = ('numero', 'quarto')
+
+    def __init__(self):
+        self.quarto_ids = set()
+
+    def referencias(self, linhas):
+        numeros = {str(valores.get('quarto')) for _, valores in linhas if valores.get('quarto') is not None}
+        return dict(Quarto.objects.filter(numero__in=numeros).values_list('numero', 'id'))
+
+    def resolver(self, valores, dados, quartos):
+        quarto_id = quartos.get(str(valores['quarto']))
+        if quarto_id is None:
+            raise LinhaInvalida({'quarto': ['Quarto inexistente.']})
+        dados['quarto_id'] = quarto_id
+
+    def chave(self, dados):
+        return dados['quarto_id'], dados['numero']
+
+    def existentes(self, chaves):
+        return set(
+            Cama.objects.filter(
+                quarto_id__in={quarto_id for quarto_id, _ in chaves},
+                numero__in={numero for _, numero in chaves},
+            ).values_list('quarto_id', 'numero')
+        )
+
+    def depois(self, objetos):
+        self.quarto_ids.update(objeto.quarto_id for objeto in objetos)
+
+    def concluir(self):
+        recalcular_quartos(self.quarto_ids)
+        invalidar(Cama, Quarto, Edificio)
+
+
+class ImportacaoResidentes(Importacao):
+    """
+    Colunas: nome, email, telefone, endereco e, opcionalmente, quarto e cama
+    (números) da cama a ocupar, que tem de estar livre e sem reserva.
+    """
+    nome = 'residentes'
+    permissao = 'core.add_residente'
+    modelo = Residente
+    colunas = {'nome': 'nome', 'email': 'email', 'telefone': 'telefone', 'endereco': 'endereco'}
+    obrigatorias = ('nome',)
+
+    def __init__(self):
+        self.quarto_ids = set()
+
+    def referencias(self, linhas):
+        pares = {
+            (str(valores['quarto']), str(valores['cama']))
+            for _, valores in linhas if valores.get('quarto') is not None and valores.get('cama') is not None
+        }
+        if not pares:
+            return {}
+        # As camas ficam bloqueadas até ao fim da importação.
+        camas = Cama.objects.select_for_update(of=('self',)).filter(
+            quarto__numero__in={quarto for quarto, _ in pares}, numero__in={cama for _, cama in pares},
+        )
+        livres = set(camas.filter(sem_reserva_ativa(), residente__isnull=True).values_list('id', flat=True))
+        return {
+            (quarto, numero): (cama_id, quarto_id, cama_id in livres)
+            for cama_id, quarto_id, quarto, numero in camas.values_list('id', 'quarto_id', 'quarto__numero', 'numero')
+        }
+
+    def resolver(self, valores, dados, camas):
+        quarto, cama = valores.get('quarto'), valores.get('cama')
+        if quarto is None and cama is None:
+            return
+        if quarto is None or cama is None:
+            raise LinhaInvalida({'quarto' if quarto is None else 'cama': ['Indique o quarto e a cama.']})
+        encontrada = camas.get((str(quarto), str(cama)))
+        if encontrada is None:
+            raise LinhaInvalida({'cama': ['Cama inexistente.']})
+        cama_id, quarto_id, livre = encontrada
+        if not livre:
+            raise LinhaInvalida({'cama': ['A cama já está ocupada ou reservada.']})
+        dados['cama_id'] = cama_id
+        dados['_quarto_id'] = quarto_id
+
+    def chave(self, dados):
+        # Uma cama só pode ser ocupada por um residente do ficheiro.
+        return dados.get('cama_id')
+
+    def depois(self, objetos):
+        # Os residentes já apontam para a cama; um único UPDATE liga cada cama
+        # ao seu residente, sem precisar dos ids devolvidos pela inserção.
+        cama_ids = [objeto.cama_id for objeto in objetos if objeto.cama_id]
+        if cama_ids:
+            residente = Residente.objects.filter(cama_id=OuterRef('pk')).order_by('-id').values('id')[:1]
+            Cama.objects.filter(id__in=cama_ids).update(residente_id=Subquery(residente), status='Ocupado')
+        self.quarto_ids.update(objeto._quarto_id for objeto in objetos if objeto.cama_id)
+
+    def concluir(self):
+        recalcular_quartos(self.quarto_ids)
+        invalidar(Residente, Cama, Quarto, Edificio)
+
+
+IMPORTACOES = {
+    importacao.nome: importacao
+    for importacao in (ImportacaoEdificios, ImportacaoQuartos, ImportacaoCamas, ImportacaoResidentes)
+}
+
+
+class ResultadoImportacao:
+
+    def __init__(self, tipo, simulado):
+        self.tipo = tipo
+        self.simulado = simulado
+        self.linhas = 0
+        self.criados = 0
+        self.total_erros = 0
+        self.erros = []
+        self.duracao = 0.0
+
+    def erro(self, linha, erros):
+        self.total_erros += 1
+        if len(self.erros) < settings.IMPORTACAO_MAXIMO_ERROS:
+            self.erros.append({'linha': linha, 'erros': erros})
+
+    def como_dict(self):
+        return {
+            'tipo': self.tipo,
+            'simulado': self.simulado,
+            'linhas': self.linhas,
+            'criados': self.criados,
+            'totalErros': self.total_erros,
+            'erros': self.erros,
+            'duracao': round(self.duracao, 3),
+        }
+
+
+def _lotes(linhas, tamanho):
+    linhas = iter(linhas)
+    while lote := list(islice(linhas, tamanho)):
+        yield lote
+
+
+def importar(tipo, ficheiro, formato, simular=False, tamanho_lote=None):
+    """
+    Importa as linhas de ``ficheiro`` como objetos de ``tipo`` (uma chave de
+    ``IMPORTACOES``) e devolve um ``ResultadoImportacao``. As linhas válidas
+    são gravadas numa única transação; com ``simular`` tudo é validado e
+    desfeito no fim. Levanta ``ErroImportacao`` se o ficheiro não puder ser lido.
+    """
+    if tipo not in IMPORTACOES:
+        raise ErroImportacao(f'Importação desconhecida: {tipo}.')
+    importacao = IMPORTACOES[tipo]()
+    resultado = ResultadoImportacao(tipo, simular)
+    tamanho_lote = tamanho_lote or settings.IMPORTACAO_TAMANHO_LOTE
+    inicio = time.perf_counter()
+    vistas = set()
+
+    with transaction.atomic():
+        for lote in _lotes(ler_linhas(ficheiro, formato), tamanho_lote):
+            if resultado.linhas == 0:
+                em_falta = [coluna for coluna in importacao.obrigatorias if coluna not in lote[0][1]]
+                if em_falta:
+                    raise ErroImportacao(f"Colunas obrigatórias em falta: {', '.join(em_falta)}.")
+            resultado.linhas += len(lote)
+            referencias = importacao.referencias(lote)
+
+            validas = []
+            for numero, valores in lote:
+                dados, erros = importacao.validar_campos(valores)
+                if not erros:
+                    try:
+                        importacao.resolver(valores, dados, referencias)
+                    except LinhaInvalida as invalida:
+                        erros = invalida.erros
+                if erros:
+                    resultado.erro(numero, erros)
+                else:
+                    validas.append((numero, dados))
+
+            chaves = {importacao.chave(dados) for _, dados in validas} - {None}
+            existentes = importacao.existentes(chaves) if chaves else set()
+            objetos = []
+            for numero, dados in validas:
+                chave = importacao.chave(dados)
+                if chave is not None and (chave in existentes or chave in vistas):
+                    resultado.erro(numero, {'__all__': ['Registo duplicado.']})
+                    continue
+                if chave is not None:
+                    vistas.add(chave)
+                extras = {campo: dados.pop(campo) for campo in list(dados) if campo.startswith('_')}
+                objeto = importacao.modelo(**dados)
+                for campo, valor in extras.items():
+                    setattr(objeto, campo, valor)
+                objetos.append(objeto)
+
+            if objetos:
+                importacao.inserir(objetos)
+                importacao.depois(objetos)
+                resultado.criados += len(objetos)
+
+        importacao.concluir()
+        if simular:
+            transaction.set_rollback(True)
+
+    resultado.duracao = time.perf_counter() - inicio
+    return resultado
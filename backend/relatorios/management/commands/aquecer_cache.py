@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import aquecer
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os relatórios agregados e guarda-os na cache (usar após cada deploy)'
+
+    def handle(self, *args, **options):
+        for chave in aquecer():
+            self.stdout.write(f'Aquecido: {chave}')
+        self.stdout.write(self.style.SUCCESS('Cache de relatórios aquecida.'))
@@ -0,0 +1,95 @@
+import asyncio
+import contextlib
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+# (view síncrona, variante assíncrona)
+ENDPOINTS = {
+    'residentes': ('total_residentes', 'total_residentes_async'),
+    'quartos': ('relatorio_quartos', 'relatorio_quartos_async'),
+    'camas': ('relatorio_camas', 'relatorio_camas_async'),
+    'dashboard': ('dashboard', 'dashboard_async'),
+    'candidaturas': ('candidaturas_por_estado', 'candidaturas_por_estado_async'),
+}
+
+SEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara latência (p50/p95) e débito das views de relatórios síncronas, '
+        'com um número fixo de workers, com as variantes assíncronas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=200, help='Número de pedidos por endpoint e modo')
+        parser.add_argument('--workers', type=int, default=4, help='Threads que simulam os workers WSGI (modo síncrono)')
+        parser.add_argument('--concorrencia', type=int, help='Pedidos simultâneos no modo assíncrono (por omissão, igual a --workers)')
+        parser.add_argument('--endpoint', action='append', choices=list(ENDPOINTS), help='Limita a estes endpoints (repetível)')
+        parser.add_argument('--sem-cache', action='store_true', help='Mede as queries, sem a cache de agregados e de autenticação')
+
+    def handle(self, *args, **options):
+        user = User.objects.create_superuser(email='benchmark-relatorios@exemplo.invalid', password=None)
+        cabecalho = f'Bearer {AccessToken.for_user(user)}'
+        fabrica = RequestFactory()
+        try:
+            with override_settings(CACHES=SEM_CACHE) if options['sem_cache'] else contextlib.nullcontext():
+                for nome in options['endpoint'] or ENDPOINTS:
+                    url_sync, url_async = (reverse(url) for url in ENDPOINTS[nome])
+
+                    def pedido(url):
+                        return lambda: fabrica.get(url, HTTP_AUTHORIZATION=cabecalho)
+
+                    self.relatorio(nome, 'síncrono', *self.medir_sync(
+                        resolve(url_sync).func, pedido(url_sync), options['pedidos'], options['workers'],
+                    ))
+                    self.relatorio(nome, 'assíncrono', *asyncio.run(self.medir_async(
+                        resolve(url_async).func, pedido(url_async), options['pedidos'], options['concorrencia'] or options['workers'],
+                    )))
+        finally:
+            User.objects.filter(pk=user.pk).delete()
+
+    def medir_sync(self, view, pedido, total, workers):
+        def medir(_):
+            inicio = time.perf_counter()
+            try:
+                return view(pedido()).status_code, time.perf_counter() - inicio
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resultados = list(executor.map(medir, range(total)))
+        return resultados, time.perf_counter() - inicio
+
+    async def medir_async(self, view, pedido, total, concorrencia):
+        limite = asyncio.Semaphore(concorrencia)
+
+        async def medir():
+            async with limite:
+                inicio = time.perf_counter()
+                return (await view(pedido())).status_code, time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(medir() for _ in range(total)))
+        return resultados, time.perf_counter() - inicio
+
+    def relatorio(self, nome, modo, resultados, duracao):
+        codigos = [codigo for codigo, _ in resultados]
+        latencias = sorted(latencia * 1000 for _, latencia in resultados)
+        p50, p95 = statistics.median(latencias), latencias[int(len(latencias) * 0.95) - 1]
+        self.stdout.write(
+            f'{nome:>12} {modo:>10}: {len(codigos)} pedidos, {codigos.count(200)} ok, '
+            f'p50 {p50:.1f}ms, p95 {p95:.1f}ms, {len(codigos) / duracao:.1f} pedidos/s'
+        )
+
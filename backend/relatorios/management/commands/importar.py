@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from relatorios.importacao import FORMATOS, IMPORTACOES, ErroImportacao, importar
+
+
+class Command(BaseCommand):
+    help = 'Importa edifícios, quartos, camas ou residentes de um ficheiro CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=list(IMPORTACOES))
+        parser.add_argument('ficheiro', type=Path)
+        parser.add_argument('--formato', choices=FORMATOS, help='Por omissão, a extensão do ficheiro')
+        parser.add_argument('--simular', action='store_true', help='Apenas valida as linhas, sem gravar')
+        parser.add_argument('--lote', type=int, help='Linhas validadas e inseridas por lote')
+
+    def handle(self, *args, **options):
+        caminho = options['ficheiro']
+        formato = options['formato'] or caminho.suffix.lstrip('.').lower()
+        try:
+            with caminho.open('rb') as ficheiro:
+                resultado = importar(options['tipo'], ficheiro, formato, simular=options['simular'], tamanho_lote=options['lote'])
+        except (OSError, ErroImportacao) as erro:
+            raise CommandError(erro)
+
+        for erro in resultado.erros[:50]:
+            detalhes = '; '.join(f"{coluna}: {' '.join(mensagens)}" for coluna, mensagens in erro['erros'].items())
+            self.stdout.write(f"Linha {erro['linha']}: {detalhes}")
+        resumo = (
+            f"{resultado.criados} de {resultado.linhas} linha(s) importada(s) em {resultado.duracao:.2f}s"
+            f"{' (simulação, nada foi gravado)' if resultado.simulado else ''}."
+        )
+        if resultado.total_erros:
+            self.stdout.write(self.style.WARNING(f'{resumo} {resultado.total_erros} linha(s) com erros.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumo))
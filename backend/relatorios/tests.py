@@ -1,3 +1,577 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import CustomUser
+from candidaturas.models import Candidatura
+from core import reservas
+from core.models import Edificio, Quarto, Cama, Residente, Residencia
+from estudantes.models import Estudante
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class DadosRelatoriosMixin:
+    """
+    Cria um pequeno conjunto de edifícios, quartos, camas, residentes e candidaturas.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(email='admin@unicv.cv', password='segredo123')
+        cls.edificio = Edificio.objects.create(nome='Bloco A', endereco='Praia', numeroApartamentos=10)
+        cls.residencia = Residencia.objects.create(Nome='Residência A', edificio=cls.edificio)
+        cls.quarto = Quarto.objects.create(numero='A-1', capacidade=2, edificio=cls.edificio, tipo='duplo')
+        cls.residente = Residente.objects.create(nome='Ana Tavares', email='ana@unicv.cv')
+        cls.cama_ocupada = Cama.objects.create(numero='A-1-1', quarto=cls.quarto, status='Ocupado', residente=cls.residente)
+        cls.cama_livre = Cama.objects.create(numero='A-1-2', quarto=cls.quarto)
+        cls.residente.cama = cls.cama_ocupada
+        cls.residente.save()
+        for i in range(3):
+            user = CustomUser.objects.create_user(email=f'estudante{i}@unicv.cv', password='segredo123')
+            estudante = Estudante.objects.create(user=user, Nome=f'Estudante {i}')
+            Candidatura.objects.create(
+                residencia=cls.residencia, estudante=estudante,
+                status=['pendente', 'aprovado', 'pendente'][i],
+                cni_ou_passaporte_entregue='sim',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class ExportacaoTests(DadosRelatoriosMixin, TestCase):
+
+    def ler_csv(self, resposta):
+        return list(csv.reader(io.StringIO(b''.join(resposta.streaming_content).decode())))
+
+    @override_settings(STREAMING_TAMANHO_BLOCO=2)
+    def test_exportar_candidaturas_csv(self):
+        resposta = self.client.get(reverse('exportar', args=['candidaturas']))
+        self.assertEqual(resposta.status_code, 200)
+        linhas = self.ler_csv(resposta)
+        self.assertEqual(linhas[0][:3], ['ID', 'Data de Submissão', 'Estado'])
+        self.assertEqual(len(linhas), 4)
+        self.assertEqual(linhas[1][3], 'Residência A')
+        self.assertEqual(linhas[1][5], 'sim')
+
+    def test_exportar_residentes_com_localizacao(self):
+        linhas = self.ler_csv(self.client.get(reverse('exportar', args=['residentes'])))
+        self.assertEqual(linhas[1][1:], ['Ana Tavares', 'ana@unicv.cv', '', 'Bloco A', 'A-1', 'A-1-1'])
+
+    def test_exportar_ocupacao_camas(self):
+        linhas = self.ler_csv(self.client.get(reverse('exportar', args=['ocupacao-camas'])))
+        self.assertEqual([linha[4] for linha in linhas[1:]], ['Ocupado', 'Disponível'])
+
+    @unittest.skipIf(openpyxl is None, 'openpyxl não instalado')
+    def test_exportar_xlsx(self):
+        resposta = self.client.get(reverse('exportar', args=['ocupacao-camas']), {'formato': 'xlsx'})
+        self.assertEqual(resposta.status_code, 200)
+        livro = openpyxl.load_workbook(io.BytesIO(b''.join(resposta.streaming_content)))
+        self.assertEqual(livro.active.max_row, 3)
+
+    def test_exportacao_desconhecida_ou_formato_invalido(self):
+        self.assertEqual(self.client.get(reverse('exportar', args=['nada'])).status_code, 404)
+        resposta = self.client.get(reverse('exportar', args=['residentes']), {'formato': 'pdf'})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class DashboardTests(DadosRelatoriosMixin, TestCase):
+
+    def test_dashboard_agregado(self):
+        # Uma query por secção, qualquer que seja o número de edifícios.
+        with self.assertNumQueries(5):
+            resposta = self.client.get(reverse('dashboard'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['statusCounts'], [
+            {'status': 'aprovado', 'count': 1},
+            {'status': 'pendente', 'count': 2},
+        ])
+        self.assertEqual(resposta.data['residentesPorEdificio'], [
+            {'id': self.edificio.id, 'nome': 'Bloco A', 'totalResidentes': 1},
+        ])
+        self.assertEqual(resposta.data['camas'], {'totalCamas': 2, 'camasLivres': 1, 'camasOcupadas': 1})
+        self.assertEqual(resposta.data['quartos'], {'totalQuartos': 1, 'quartosLivres': 1, 'quartosOcupados': 0})
+
+    def test_dashboard_sem_permissoes(self):
+        utilizador = CustomUser.objects.create_user(email='visitante@unicv.cv', password='segredo123')
+        self.client.force_authenticate(utilizador)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 403)
+
+
+class CacheRelatoriosTests(DadosRelatoriosMixin, TestCase):
+
+    def test_relatorio_em_cache_e_invalidado(self):
+        url = reverse('relatorio_camas')
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['camasLivres'], 1)
+
+        self.cama_livre.residente = Residente.objects.create(nome='Rui Lopes')
+        self.cama_livre.save()
+        self.assertEqual(self.client.get(url).data['camasLivres'], 0)
+
+    def test_invalidacao_limitada_aos_modelos_dependentes(self):
+        url = reverse('edificios_por_tipo')
+        self.client.get(url)
+        Candidatura.objects.create(
+            residencia=self.residencia, estudante=Estudante.objects.first(), cni_ou_passaporte_entregue='sim',
+        )
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        Edificio.objects.create(nome='Bloco B', endereco='Mindelo', numeroApartamentos=5)
+        self.assertEqual(sum(t['count'] for t in self.client.get(url).data['totalPorTipo']), 2)
+
+    def test_comando_invalida_agregados(self):
+        url = reverse('relatorio_camas')
+        self.client.get(url)
+        # update() não dispara sinais; o comando reconstrói os contadores e
+        # invalida os agregados que dependem deles.
+        Cama.objects.filter(pk=self.cama_livre.pk).update(residente=self.residente, status='Ocupado')
+        self.assertEqual(self.client.get(url).data['camasLivres'], 1)
+        call_command('recalcular_ocupacao', stdout=io.StringIO())
+        self.assertEqual(self.client.get(url).data['camasLivres'], 0)
+
+    def test_agregados_registados_no_arranque(self):
+        # Um processo de comandos de gestão só corre django.setup().
+        resultado = subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup(); from core.cache import _dependencias; '
+             'print(sorted(_dependencias["core.edificio"]))'],
+            cwd=settings.BASE_DIR, env=os.environ, capture_output=True, text=True, check=True,
+        )
+        self.assertIn('agregado:ocupacao_camas', resultado.stdout)
+
+    def test_aquecer_cache(self):
+        call_command('aquecer_cache', stdout=io.StringIO())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('dashboard'))
+
+
+class GetCondicionalTests(DadosRelatoriosMixin, TestCase):
+
+    def test_etag_responde_304_sem_queries(self):
+        url = reverse('lista_edificios')
+        resposta = self.client.get(url)
+        etag = resposta['ETag']
+        self.assertIn('Last-Modified', resposta)
+        with self.assertNumQueries(0):
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta['ETag'], etag)
+        resposta = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta['Last-Modified'])
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_gravacao_ou_outro_url_muda_a_etag(self):
+        url = reverse('lista_camas')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page_size': 1})['ETag'], etag)
+
+        self.quarto.capacidade = 3
+        self.quarto.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_etag_por_utilizador(self):
+        url = reverse('lista_edificios')
+        etag = self.client.get(url)['ETag']
+        outro = CustomUser.objects.create_superuser(email='outro@unicv.cv', password='segredo123')
+        self.client.force_authenticate(outro)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(CACHE_VERSOES_TIMEOUT=30)
+    def test_carimbos_expiram(self):
+        # Uma gravação noutro processo (cache por processo) não renova o
+        # carimbo deste, mas o carimbo expira ao fim de CACHE_VERSOES_TIMEOUT.
+        url = reverse('lista_edificios')
+        etag = self.client.get(url)['ETag']
+        agora = time.time()
+        with mock.patch('time.time', return_value=agora + 29):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with mock.patch('time.time', return_value=agora + 31):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ViewsAssincronasTests(DadosRelatoriosMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cabecalho = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}}
+
+    async def test_mesmo_json_que_as_views_sincronas(self):
+        pares = [
+            ('total_residentes', 'total_residentes_async'),
+            ('relatorio_camas', 'relatorio_camas_async'),
+            ('relatorio_quartos', 'relatorio_quartos_async'),
+            ('dashboard', 'dashboard_async'),
+            ('candidaturas_por_estado', 'candidaturas_por_estado_async'),
+        ]
+        for sincrona, assincrona in pares:
+            with self.subTest(assincrona):
+                await cache.aclear()
+                resposta = await self.async_client.get(reverse(assincrona), **self.cabecalho)
+                self.assertEqual(resposta.status_code, 200)
+                esperado = await self.async_client.get(reverse(sincrona), **self.cabecalho)
+                self.assertEqual(resposta.json(), esperado.json())
+
+    async def test_autenticacao_e_permissoes(self):
+        self.assertEqual((await self.async_client.get(reverse('dashboard_async'))).status_code, 401)
+        visitante = await CustomUser.objects.acreate(email='visitante@unicv.cv')
+        cabecalho = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(visitante)}'}}
+        self.assertEqual((await self.async_client.get(reverse('relatorio_camas_async'), **cabecalho)).status_code, 403)
+        self.assertEqual((await self.async_client.get(reverse('minha_candidatura_async'), **cabecalho)).status_code, 403)
+
+    async def test_minha_candidatura(self):
+        candidatura = await Candidatura.objects.select_related('estudante__user').afirst()
+        cabecalho = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(candidatura.estudante.user)}'}}
+        resposta = await self.async_client.get(reverse('minha_candidatura_async'), **cabecalho)
+        self.assertEqual(resposta.json()['id'], candidatura.id)
+
+
+class ImportacaoTests(DadosRelatoriosMixin, TestCase):
+
+    def enviar(self, tipo, conteudo, nome='dados.csv', **params):
+        ficheiro = SimpleUploadedFile(nome, conteudo.encode() if isinstance(conteudo, str) else conteudo)
+        url = reverse('importar', args=[tipo])
+        if params:
+            url += '?' + '&'.join(f'{chave}={valor}' for chave, valor in params.items())
+        return self.client.post(url, {'ficheiro': ficheiro}, format='multipart')
+
+    def test_importar_quartos_com_erros_por_linha(self):
+        conteudo = (
+            'Número;Capacidade;Edifício;Tipo\n'
+            'B-1;2;Bloco A;duplo\n'
+            'B-2;x;Bloco A;duplo\n'
+            'B-3;1;Bloco Z;individual\n'
+            'A-1;2;Bloco A;duplo\n'
+            'B-1;2;Bloco A;duplo\n'
+            ';;;\n'
+            'B-4;1;Bloco A;\n'
+        )
+        resposta = self.enviar('quartos', conteudo)
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual((resposta.data['criados'], resposta.data['totalErros']), (2, 4))
+        self.assertEqual([erro['linha'] for erro in resposta.data['erros']], [3, 4, 5, 6])
+        self.assertIn('capacidade', resposta.data['erros'][0]['erros'])
+        self.assertEqual(Quarto.objects.get(numero='B-4').tipo, 'individual')
+        self.edificio.refresh_from_db()
+        self.assertEqual(self.edificio.total_quartos, 3)
+
+    def test_importar_camas_e_residentes_atualiza_contadores(self):
+        self.client.get(reverse('relatorio_camas'))
+        resposta = self.enviar('camas', 'quarto,numero\nA-1,A-1-3\nA-1,A-1-1\nZ-9,1\n')
+        self.assertEqual((resposta.data['criados'], resposta.data['totalErros']), (1, 2))
+        self.assertEqual(self.client.get(reverse('relatorio_camas')).data['totalCamas'], 3)
+
+        conteudo = 'nome,email,quarto,cama\nRui Lopes,rui@unicv.cv,A-1,A-1-2\nEva Silva,,A-1,A-1-1\nSem Cama,,,\n'
+        resposta = self.enviar('residentes', conteudo)
+        self.assertEqual((resposta.data['criados'], resposta.data['totalErros']), (2, 1))
+        self.assertEqual(resposta.data['erros'][0]['linha'], 3)
+        cama = Cama.objects.get(numero='A-1-2')
+        self.assertEqual((cama.residente.nome, cama.status, cama.residente.cama_id), ('Rui Lopes', 'Ocupado', cama.id))
+        self.assertEqual(self.client.get(reverse('relatorio_camas')).data['camasLivres'], 1)
+
+    def test_simular_nao_grava(self):
+        resposta = self.enviar('edificios', 'nome,endereco,numeroApartamentos\nBloco B,Mindelo,4\n', simular=1)
+        self.assertEqual((resposta.status_code, resposta.data['criados'], resposta.data['simulado']), (200, 1, True))
+        self.assertFalse(Edificio.objects.filter(nome='Bloco B').exists())
+
+    @unittest.skipIf(openpyxl is None, 'openpyxl não instalado')
+    def test_importar_xlsx(self):
+        livro = openpyxl.Workbook()
+        livro.active.append(['nome', 'endereco', 'numeroApartamentos', 'tipo'])
+        livro.active.append(['Bloco B', 'Mindelo', 4, 'comercial'])
+        conteudo = io.BytesIO()
+        livro.save(conteudo)
+        resposta = self.enviar('edificios', conteudo.getvalue(), nome='edificios.xlsx')
+        self.assertEqual(resposta.data['criados'], 1)
+        self.assertEqual(Edificio.objects.get(nome='Bloco B').tipo, 'comercial')
+
+    def test_ficheiro_invalido_e_permissoes(self):
+        self.assertEqual(self.enviar('quartos', 'numero,capacidade\nB-1,2\n').status_code, 400)
+        self.assertEqual(self.enviar('quartos', 'numero\n', nome='dados.pdf').status_code, 400)
+        self.assertEqual(self.enviar('nada', 'numero\n').status_code, 404)
+        self.client.force_authenticate(CustomUser.objects.create_user(email='visitante@unicv.cv'))
+        self.assertEqual(self.enviar('quartos', 'numero\n').status_code, 403)
+
+    def test_comando_importar(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as ficheiro:
+            ficheiro.write('quarto,numero\n' + ''.join(f'A-1,{i}\n' for i in range(10)))
+        saida = io.StringIO()
+        call_command('importar', 'camas', ficheiro.name, '--lote', '3', stdout=saida)
+        os.unlink(ficheiro.name)
+        self.assertIn('10 de 10', saida.getvalue())
+        self.quarto.refresh_from_db()
+        self.assertEqual(self.quarto.total_camas, 12)
+
+
+class ReservasCamaViewsTests(DadosRelatoriosMixin, TestCase):
+
+    def test_corpo_invalido_da_400(self):
+        token, _ = reservas.reservar(self.cama_livre.pk)
+        confirmar = reverse('confirmar_reserva_cama', args=[self.cama_livre.pk])
+        libertar = reverse('libertar_reserva_cama', args=[self.cama_livre.pk])
+        for corpo in ({}, {'token': 'abc', 'residente': self.residente.pk}, {'token': str(token), 'residente': 'abc'}):
+            with self.subTest(corpo=corpo):
+                self.assertEqual(self.client.post(confirmar, corpo, format='json').status_code, 400)
+        self.assertEqual(self.client.post(libertar, {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(libertar, {'token': 'abc'}, format='json').status_code, 400)
+        self.cama_livre.refresh_from_db()
+        self.assertEqual(self.cama_livre.reserva_token, token)
+
+    def test_token_so_na_resposta_da_reserva(self):
+        resposta = self.client.post(reverse('reservar_cama', args=[self.cama_livre.pk]))
+        self.assertEqual(resposta.status_code, 201)
+        token = str(resposta.data['token'])
+        for url in (reverse('lista_camas'), reverse('detalhe_cama', args=[self.cama_livre.pk])):
+            with self.subTest(url=url):
+                corpo = self.client.get(url).content.decode()
+                self.assertNotIn(token, corpo)
+                self.assertNotIn('reserva', corpo)
+
+    def test_libertar_sem_reserva_da_404(self):
+        url = reverse('libertar_reserva_cama', args=[self.cama_livre.pk])
+        resposta = self.client.post(url, {'token': '00000000-0000-0000-0000-000000000000'}, format='json')
+        self.assertEqual(resposta.status_code, 404)
+        with self.assertRaises(reservas.ReservaIndisponivel):
+            reservas.libertar(self.cama_livre.pk, None)
+
+    def test_confirmar(self):
+        token, _ = reservas.reservar(self.cama_livre.pk)
+        residente = Residente.objects.create(nome='Rui Lopes')
+        url = reverse('confirmar_reserva_cama', args=[self.cama_livre.pk])
+        resposta = self.client.post(url, {'token': str(token), 'residente': residente.pk}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.data['residente']['id'], residente.pk)
+
+
+@override_settings(
+    MIDDLEWARE=['core.instrumentacao.InstrumentacaoMiddleware', *settings.MIDDLEWARE],
+    INSTRUMENTACAO_LIMITE_MS=0,
+)
+class InstrumentacaoTests(DadosRelatoriosMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cabecalho = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}}
+
+    def metricas(self, resposta):
+        return {metrica.split(';')[0]: metrica for metrica in resposta.headers['Server-Timing'].split(', ')}
+
+    def test_server_timing_e_registo_de_pedido_lento(self):
+        with self.assertLogs('core.instrumentacao', 'WARNING') as registos:
+            resposta = self.client_class().get(
+                reverse('residentes_por_edificio'), {'edificio_id': self.edificio.id}, **self.cabecalho,
+            )
+        self.assertEqual(resposta.status_code, 200)
+        metricas = self.metricas(resposta)
+        self.assertEqual(set(metricas), {'db', 'auth', 'ser', 'view', 'total'})
+        self.assertRegex(metricas['db'], r'^db;dur=[\d.]+;desc="\d+ queries"$')
+
+        dados = registos.records[0].instrumentacao
+        self.assertEqual(dados['view'], 'ResidentesPorEdificioView')
+        self.assertEqual(dados['estado'], 200)
+        self.assertGreater(dados['queries'], 0)
+        self.assertLessEqual(len(dados['queriesLentas']), 3)
+        self.assertIn('SELECT', dados['queriesLentas'][0]['sql'])
+        self.assertEqual(json.loads(registos.records[0].getMessage()), dados)
+
+    @override_settings(INSTRUMENTACAO_LIMITE_MS=60_000)
+    def test_sem_registo_abaixo_do_limite(self):
+        with self.assertNoLogs('core.instrumentacao'):
+            resposta = self.client_class().get(reverse('relatorio_camas'), **self.cabecalho)
+        self.assertIn('view', self.metricas(resposta))
+
+    async def test_views_assincronas(self):
+        with self.assertLogs('core.instrumentacao', 'WARNING') as registos:
+            resposta = await self.async_client.get(reverse('dashboard_async'), **self.cabecalho)
+        self.assertIn('auth', self.metricas(resposta))
+        dados = registos.records[0].instrumentacao
+        self.assertEqual(dados['view'], 'DashboardAsyncView')
+        self.assertGreater(dados['queries'], 0)
+
+
+class PesquisaTests(DadosRelatoriosMixin, TestCase):
+
+    def pesquisar(self, **params):
+        resposta = self.client.get(reverse('pesquisa'), params)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        return resposta.json()['resultados']
+
+    def nomes(self, resultados, campo='nome'):
+        return [resultado[campo] for resultado in resultados]
+
+    def test_ignora_acentos_e_maiusculas(self):
+        Residente.objects.create(nome='João Évora', telefone='9912345')
+        self.assertEqual(self.nomes(self.pesquisar(q='joao evora', tipos='residentes')['residentes']), ['João Évora'])
+        self.assertEqual(self.nomes(self.pesquisar(q='TAVARÉS', tipos='residentes')['residentes']), ['Ana Tavares'])
+        self.assertEqual(self.nomes(self.pesquisar(q='9912345', tipos='residentes')['residentes']), ['João Évora'])
+
+    def test_tolera_erros_de_escrita(self):
+        residentes = self.pesquisar(q='Tavres', tipos='residentes')['residentes']
+        self.assertEqual(self.nomes(residentes), ['Ana Tavares'])
+        self.assertLess(residentes[0]['relevancia'], 1)
+        self.assertEqual(self.pesquisar(q='Xpto', tipos='residentes')['residentes'], [])
+
+    def test_estudantes_por_nome_ou_email_e_candidaturas(self):
+        resultados = self.pesquisar(q='estudante1@unicv.cv')
+        self.assertEqual(resultados['estudantes'][0]['Nome'], 'Estudante 1')
+        self.assertEqual(resultados['candidaturas'][0]['estudante']['Nome'], 'Estudante 1')
+        self.assertEqual(self.nomes(resultados['residencias'], 'Nome'), [])
+
+        resultados = self.pesquisar(q='residencia a', tipos='residencias,candidaturas')
+        self.assertEqual(set(resultados), {'residencias', 'candidaturas'})
+        self.assertEqual(self.nomes(resultados['residencias'], 'Nome'), ['Residência A'])
+        self.assertEqual(len(resultados['candidaturas']), 3)
+
+    def test_dados_novos_aparecem(self):
+        self.assertEqual(self.pesquisar(q='Zacarias', tipos='residentes')['residentes'], [])
+        Residente.objects.create(nome='Zacarias Lopes')
+        self.assertEqual(self.nomes(self.pesquisar(q='Zacarias', tipos='residentes')['residentes']), ['Zacarias Lopes'])
+
+    def test_limite(self):
+        for i in range(5):
+            Residente.objects.create(nome=f'Carla Mendes {i}')
+        self.assertEqual(len(self.pesquisar(q='carla mendes', tipos='residentes', limite=2)['residentes']), 2)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(reverse('pesquisa'), {'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('pesquisa'), {'q': 'ana', 'tipos': 'quartos'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('pesquisa'), {'q': 'ana', 'limite': 'x'}).status_code, 400)
+
+    def test_permissoes(self):
+        utilizador = CustomUser.objects.create_user(email='leitor@unicv.cv', password='segredo123')
+        self.client.force_authenticate(utilizador)
+        self.assertEqual(self.client.get(reverse('pesquisa'), {'q': 'ana'}).status_code, 403)
+
+        utilizador.user_permissions.add(Permission.objects.get(codename='view_residente'))
+        utilizador = CustomUser.objects.get(pk=utilizador.pk)
+        self.client.force_authenticate(utilizador)
+        self.assertEqual(set(self.pesquisar(q='ana')), {'residentes'})
+        self.assertEqual(self.client.get(reverse('pesquisa'), {'q': 'ana', 'tipos': 'estudantes'}).status_code, 403)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'pg_trgm e unaccent só existem no PostgreSQL')
+class PesquisaPostgreSQLTests(TransactionTestCase):
+    """
+    O caminho de produção da pesquisa: a migração core 0006 e o operador <%.
+    """
+    INDICES = {'residente_pesquisa_idx', 'residencia_pesquisa_idx', 'estudante_pesquisa_idx', 'customuser_pesquisa_idx'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_superuser(email='admin@unicv.cv', password='segredo123'))
+
+    def indices(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE indexname LIKE %s", ['%_pesquisa_idx'])
+            return {linha[0] for linha in cursor.fetchall()}
+
+    def test_migracao(self):
+        call_command('migrate', 'core', '0005', verbosity=0)
+        self.assertEqual(self.indices(), set())
+        call_command('migrate', 'core', verbosity=0)
+        self.assertEqual(self.indices(), self.INDICES)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pesquisa_texto('João', 'ÉVORA')")
+            self.assertEqual(cursor.fetchone()[0], 'joao evora')
+
+    @override_settings(PESQUISA_LIMIAR=0.5)
+    def test_pesquisa_com_limiar_local(self):
+        Residente.objects.create(nome='Ana Tavares')
+        Residente.objects.create(nome='João Évora')
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get(reverse('pesquisa'), {'q': 'Tavres', 'tipos': 'residentes'})
+        self.assertEqual([r['nome'] for r in resposta.json()['resultados']['residentes']], ['Ana Tavares'])
+        self.assertTrue(any('<%' in consulta['sql'] for consulta in consultas.captured_queries))
+        resposta = self.client.get(reverse('pesquisa'), {'q': 'joao evora', 'tipos': 'residentes'})
+        self.assertEqual([r['nome'] for r in resposta.json()['resultados']['residentes']], ['João Évora'])
+
+        # O limiar não fica definido na ligação depois do pedido.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT current_setting('pg_trgm.word_similarity_threshold')")
+            self.assertNotEqual(cursor.fetchone()[0], '0.5')
+
+
+class ExpansaoTests(DadosRelatoriosMixin, TestCase):
+
+    def listar_camas(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            resposta = self.client.get(reverse('lista_camas'), params)
+        self.assertEqual(resposta.status_code, 200, resposta.content)
+        sql = [query['sql'] for query in queries if 'FROM "core_cama"' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        cama = next(cama for cama in resposta.json() if cama['id'] == self.cama_ocupada.id)
+        return cama, sql[0]
+
+    def test_sem_parametros_aninha_como_antes(self):
+        cama, sql = self.listar_camas()
+        self.assertEqual(cama['quarto']['edificio']['nome'], 'Bloco A')
+        self.assertEqual(cama['residente']['nome'], 'Ana Tavares')
+        self.assertIn('"core_edificio"', sql)
+
+    def test_campos_escolhidos_sem_joins(self):
+        cama, sql = self.listar_camas(fields='id,numero,quarto')
+        self.assertEqual(set(cama), {'id', 'numero', 'quarto'})
+        self.assertEqual(cama['quarto']['edificio']['nome'], 'Bloco A')
+        self.assertNotIn('"core_residente"', sql)
+        # ?expand= vazio: nenhuma relação aninhada.
+        cama, sql = self.listar_camas(fields='id,numero,quarto', expand='')
+        self.assertEqual(cama, {'id': self.cama_ocupada.id, 'numero': 'A-1-1', 'quarto': self.quarto.id})
+        self.assertNotIn('JOIN', sql)
+
+    def test_expansao_a_pedido(self):
+        cama, sql = self.listar_camas(expand='quarto')
+        self.assertEqual(cama['quarto']['numero'], 'A-1')
+        self.assertEqual(cama['quarto']['edificio'], self.edificio.id)
+        self.assertEqual(cama['residente'], self.residente.id)
+        self.assertIn('"core_quarto"', sql)
+        self.assertNotIn('"core_edificio"', sql)
+        self.assertNotIn('"core_residente"', sql)
+
+        cama, sql = self.listar_camas(fields='id,quarto.numero,quarto.edificio.nome')
+        self.assertEqual(cama, {'id': self.cama_ocupada.id, 'quarto': {'numero': 'A-1', 'edificio': {'nome': 'Bloco A'}}})
+        self.assertIn('"core_edificio"', sql)
+
+    def test_candidaturas(self):
+        resposta = self.client.get(reverse('lista_candidaturas'), {'fields': 'id,status,residencia', 'expand': 'residencia.edificio'})
+        candidatura = resposta.json()[0]
+        self.assertEqual(set(candidatura), {'id', 'status', 'residencia'})
+        self.assertEqual(candidatura['residencia']['edificio']['nome'], 'Bloco A')
+
+        resposta = self.client.get(reverse('lista_candidaturas'), {'fields': 'id,estudante', 'stream': '1'})
+        candidatura = json.loads(b''.join(resposta.streaming_content))[0]
+        self.assertEqual(set(candidatura), {'id', 'estudante'})
+        self.assertIn('Nome', candidatura['estudante'])
+
+    def test_nomes_desconhecidos(self):
+        for params in ({'fields': 'id,cor'}, {'expand': 'edificio'}, {'fields': 'quarto.cor'}):
+            resposta = self.client.get(reverse('lista_camas'), params)
+            self.assertEqual(resposta.status_code, 400, params)
+        resposta = self.client.get(reverse('lista_candidaturas'), {'fields': 'cor', 'stream': '1'})
+        self.assertEqual(resposta.status_code, 400)
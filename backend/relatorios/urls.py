@@ -21,9 +21,20 @@ from .views import (
     CamasPorQuartoView,      
     CamasPorStatusView,      
     RelatorioCamasView,      
+    ReservarCamaView, ConfirmarReservaCamaView, LibertarReservaCamaView,
 
     # Residências
-    ListaResidenciasAPIView, DetalheResidenciaView
+    ListaResidenciasAPIView, DetalheResidenciaView,
+
+    # Dashboard e exportações
+    DashboardView, ExportarView, ImportarView,
+
+    # Pesquisa
+    PesquisaView,
+
+    # Variantes assíncronas
+    TotalResidentesAsyncView, RelatorioQuartosAsyncView, RelatorioCamasAsyncView,
+    DashboardAsyncView,
 )
 
 urlpatterns = [
@@ -52,8 +63,29 @@ urlpatterns = [
     path('camas/quarto/<int:quarto_id>/', CamasPorQuartoView.as_view(), name='camas_por_quarto'),
     path('camas/status/<str:status_param>/', CamasPorStatusView.as_view(), name='camas_por_status'),
     path('camas/relatorio/', RelatorioCamasView.as_view(), name='relatorio_camas'),
+    path('camas/<int:pk>/reservar/', ReservarCamaView.as_view(), name='reservar_cama'),
+    path('camas/<int:pk>/confirmar/', ConfirmarReservaCamaView.as_view(), name='confirmar_reserva_cama'),
+    path('camas/<int:pk>/libertar/', LibertarReservaCamaView.as_view(), name='libertar_reserva_cama'),
 
     # ----- Residências -----
     path('residencias/', ListaResidenciasAPIView.as_view(), name='lista_residencias'),
     path('residencias/<int:pk>/', DetalheResidenciaView.as_view(), name='detalhe_residencia'),
+
+    # ----- Dashboard -----
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+
+    # ----- Exportações -----
+    path('exportar/<str:tipo>/', ExportarView.as_view(), name='exportar'),
+
+    # ----- Importações -----
+    path('importar/<str:tipo>/', ImportarView.as_view(), name='importar'),
+
+    # ----- Pesquisa -----
+    path('pesquisa/', PesquisaView.as_view(), name='pesquisa'),
+
+    # ----- Variantes assíncronas (ASGI) -----
+    path('async/residentes/total/', TotalResidentesAsyncView.as_view(), name='total_residentes_async'),
+    path('async/quartos/relatorio/', RelatorioQuartosAsyncView.as_view(), name='relatorio_quartos_async'),
+    path('async/camas/relatorio/', RelatorioCamasAsyncView.as_view(), name='relatorio_camas_async'),
+    path('async/dashboard/', DashboardAsyncView.as_view(), name='dashboard_async'),
 ]
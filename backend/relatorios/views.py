@@ -1,4 +1,9 @@
+import asyncio
+
+from django.conf import settings
+from django.http import JsonResponse
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
 from rest_framework import status, permissions, generics
@@ -8,25 +13,43 @@ from django.db.models import Count, F # Mantido para queries de anotação
 from core.models import Edificio, Quarto, Residente, Cama, Residencia as ResidenciaCore
 from core.serializers import (
     EdificioSerializer, QuartoSerializer, ResidenteSerializer,
-    CamaSerializer, ResidenciaSerializer as ResidenciaCoreSerializer
+    CamaSerializer, ResidenciaSerializer as ResidenciaCoreSerializer,
+    ConfirmacaoReservaSerializer, LibertacaoReservaSerializer,
 )
+from core.filtros import Filtragem
+from core.streaming import ListagemStreamingMixin
+from core.assincrono import ViewAssincrona
+from core.condicional import GetCondicionalMixin
+from .exportacao import EXPORTACOES, resposta_csv, resposta_xlsx
+from .importacao import IMPORTACOES, ErroImportacao, importar
+from . import agregados
+from core import pesquisa, reservas
 
 # Definindo constantes para permissões
 PERM_VIEW_RESIDENTE = 'core.view_residente'
 PERM_VIEW_EDIFICIO = 'core.view_edificio'
 PERM_VIEW_QUARTO = 'core.view_quarto'
 PERM_VIEW_CAMA = 'core.view_cama'
+PERM_CHANGE_CAMA = 'core.change_cama'
+PERM_VIEW_CANDIDATURA = 'candidaturas.view_candidatura'
 
 # ----- RESIDENTES -----
 
-class ResidenteListCreateView(generics.ListCreateAPIView):
+class ResidenteListCreateView(GetCondicionalMixin, ListagemStreamingMixin, generics.ListCreateAPIView):
     """
     Lista todos os residentes e permite a criação de novos.
+    Com ?stream=1 devolve a listagem completa em streaming.
+    Filtros: ?id__in=, ?cama=, ?cama__isnull= (ver core.filtros).
     Requer permissão de visualização (GET) e adição (POST) de residente.
     """
     queryset = Residente.objects.all()
     serializer_class = ResidenteSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Residente,)
+    filtragem = Filtragem(Residente, {
+        'id': ('exact', 'in', 'gte', 'lte'),
+        'cama': ('exact', 'in', 'isnull'),
+    })
 
     def get(self, request, *args, **kwargs):
         # DjangoModelPermissions já verifica 'core.view_residente'
@@ -37,7 +60,7 @@ class ResidenteListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class ResidenteDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ResidenteDetailView(GetCondicionalMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retorna, atualiza ou deleta um residente específico.
     Requer permissões de visualização, alteração ou exclusão de residente.
@@ -45,13 +68,16 @@ class ResidenteDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Residente.objects.all()
     serializer_class = ResidenteSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Residente,)
 
 
-class ResidentesPorQuartoView(APIView):
+class ResidentesPorQuartoView(GetCondicionalMixin, APIView):
     """
     Lista os residentes em um quarto específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_residente
+    modelos_versao = (Residente, Cama)
+    queryset = Residente.objects.all()
 
     def get(self, request, quarto_id, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_RESIDENTE):
@@ -61,24 +87,27 @@ class ResidentesPorQuartoView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class TotalResidentesView(APIView):
+class TotalResidentesView(GetCondicionalMixin, APIView):
     """
     Retorna o número total de residentes.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_residente
+    modelos_versao = (Residente,)
+    queryset = Residente.objects.all()
 
     def get(self, request, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_RESIDENTE):
             return Response({'detail': 'Você não tem permissão para ver o total de residentes.'}, status=status.HTTP_403_FORBIDDEN)
-        total = Residente.objects.count()
-        return Response({'totalResidentes': total}, status=status.HTTP_200_OK)
+        return Response({'totalResidentes': agregados.total_residentes()}, status=status.HTTP_200_OK)
 
 
-class ResidentesPorEdificioView(APIView):
+class ResidentesPorEdificioView(GetCondicionalMixin, APIView):
     """
     Lista residentes de um edifício específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_residente
+    modelos_versao = (Residente, Cama, Quarto)
+    queryset = Residente.objects.all()
 
     def get(self, request, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_RESIDENTE):
@@ -99,14 +128,17 @@ class ResidentesPorEdificioView(APIView):
 
 # ----- EDIFÍCIOS -----
 
-class ListaEdificiosView(generics.ListCreateAPIView):
+class ListaEdificiosView(GetCondicionalMixin, generics.ListCreateAPIView):
     """
     Lista todos os edifícios e permite a criação de novos.
+    Filtros: ?tipo=, ?tipo__in=; ordem por id.
     Requer permissão de visualização (GET) e adição (POST) de edifício.
     """
     queryset = Edificio.objects.all()
     serializer_class = EdificioSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Edificio,)
+    filtragem = Filtragem(Edificio, {'tipo': ('exact', 'in')}, ordenacao=('id',))
 
     def get(self, request, *args, **kwargs):
         # DjangoModelPermissions já verifica 'core.view_edificio'
@@ -117,7 +149,7 @@ class ListaEdificiosView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class DetalheEdificioView(generics.RetrieveUpdateDestroyAPIView):
+class DetalheEdificioView(GetCondicionalMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retorna, atualiza ou deleta um edifício específico.
     Requer permissões de visualização, alteração ou exclusão de edifício.
@@ -125,35 +157,42 @@ class DetalheEdificioView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Edificio.objects.all()
     serializer_class = EdificioSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Edificio,)
 
 
-class EdificiosPorTipoView(APIView):
+class EdificiosPorTipoView(GetCondicionalMixin, APIView):
     """
     Retorna a contagem de edifícios por tipo.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_edificio
+    modelos_versao = (Edificio,)
+    queryset = Edificio.objects.all()
 
     def get(self, request, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_EDIFICIO):
             return Response({'detail': 'Você não tem permissão para ver edifícios por tipo.'}, status=status.HTTP_403_FORBIDDEN)
-        tipos = Edificio.objects.values('tipo').annotate(count=Count('id'))
-        total_por_tipo = [{'name': t['tipo'], 'count': t['count']} for t in tipos]
-        return Response({'totalPorTipo': total_por_tipo}, status=status.HTTP_200_OK)
+        return Response({'totalPorTipo': agregados.edificios_por_tipo()}, status=status.HTTP_200_OK)
 
 
 # ----- QUARTOS -----
 
-class QuartoListCreateView(generics.ListCreateAPIView):
+class QuartoListCreateView(GetCondicionalMixin, generics.ListCreateAPIView):
     """
     Lista todos os quartos e permite a criação de novos.
+    Filtros: ?tipo=, ?edificio= (e __in); ordem por id ou numero.
     Requer permissão de visualização (GET) e adição (POST) de quarto.
     """
-    queryset = Quarto.objects.all()
+    queryset = Quarto.objects.select_related('edificio')
     serializer_class = QuartoSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Quarto, Edificio)
+    filtragem = Filtragem(Quarto, {
+        'tipo': ('exact', 'in'),
+        'edificio': ('exact', 'in'),
+    }, ordenacao=('id', 'numero'))
 
 
-class DetalheQuartoView(generics.RetrieveUpdateDestroyAPIView):
+class DetalheQuartoView(GetCondicionalMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retorna, atualiza ou deleta um quarto específico.
     Requer permissões de visualização, alteração ou exclusão de quarto.
@@ -161,13 +200,16 @@ class DetalheQuartoView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Quarto.objects.all()
     serializer_class = QuartoSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Quarto, Edificio)
 
 
-class QuartosPorEdificioView(APIView):
+class QuartosPorEdificioView(GetCondicionalMixin, APIView):
     """
     Lista os quartos de um edifício específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_quarto
+    modelos_versao = (Quarto, Edificio)
+    queryset = Quarto.objects.all()
 
     def get(self, request, edificio_id, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_QUARTO):
@@ -177,11 +219,13 @@ class QuartosPorEdificioView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class QuartosPorTipoView(APIView):
+class QuartosPorTipoView(GetCondicionalMixin, APIView):
     """
     Lista os quartos de um tipo específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_quarto
+    modelos_versao = (Quarto, Edificio)
+    queryset = Quarto.objects.all()
 
     def get(self, request, tipo, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_QUARTO):
@@ -191,38 +235,43 @@ class QuartosPorTipoView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class RelatorioQuartosView(APIView):
+class RelatorioQuartosView(GetCondicionalMixin, APIView):
     """
     Retorna um relatório sobre o total de quartos, livres e ocupados.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_quarto
+    modelos_versao = (Edificio,)
+    queryset = Quarto.objects.all()
 
     def get(self, request, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_QUARTO):
             return Response({'detail': 'Você não tem permissão para ver o relatório de quartos.'}, status=status.HTTP_403_FORBIDDEN)
-        total_quartos = Quarto.objects.count()
-        quartos_livres = Quarto.objects.filter(camas__residente__isnull=True).distinct().count()
-        quartos_ocupados = total_quartos - quartos_livres
-        return Response({
-            'totalQuartos': total_quartos,
-            'quartosLivres': quartos_livres,
-            'quartosOcupados': quartos_ocupados,
-        }, status=status.HTTP_200_OK)
+        return Response(agregados.ocupacao_quartos(), status=status.HTTP_200_OK)
 
 
 # ----- CAMAS -----
 
-class CamaListCreateView(generics.ListCreateAPIView):
+class CamaListCreateView(GetCondicionalMixin, ListagemStreamingMixin, generics.ListCreateAPIView):
     """
     Lista todas as camas e permite a criação de novas.
+    Com ?stream=1 devolve a listagem completa em streaming.
+    Filtros: ?status=, ?quarto=, ?quarto__edificio= (e __in), ?residente=,
+    ?residente__isnull=; ordem por id.
     Requer permissão de visualização (GET) e adição (POST) de cama.
     """
-    queryset = Cama.objects.all()
+    queryset = Cama.objects.select_related('quarto__edificio', 'residente')
     serializer_class = CamaSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Cama, Quarto, Edificio, Residente)
+    filtragem = Filtragem(Cama, {
+        'status': ('exact', 'in'),
+        'quarto': ('exact', 'in'),
+        'quarto__edificio': ('exact', 'in'),
+        'residente': ('exact', 'isnull'),
+    }, ordenacao=('id',))
 
 
-class DetalheCamaView(generics.RetrieveUpdateDestroyAPIView):
+class DetalheCamaView(GetCondicionalMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retorna, atualiza ou deleta uma cama específica.
     Requer permissões de visualização, alteração ou exclusão de cama.
@@ -230,13 +279,16 @@ class DetalheCamaView(generics.RetrieveUpdateDestroyAPIView):
     queryset = Cama.objects.all()
     serializer_class = CamaSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (Cama, Quarto, Edificio, Residente)
 
 
-class CamasPorQuartoView(APIView):
+class CamasPorQuartoView(GetCondicionalMixin, APIView):
     """
     Lista as camas de um quarto específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_cama
+    modelos_versao = (Cama, Quarto, Edificio, Residente)
+    queryset = Cama.objects.all()
 
     def get(self, request, quarto_id, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_CAMA):
@@ -246,11 +298,13 @@ class CamasPorQuartoView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class CamasPorStatusView(APIView):
+class CamasPorStatusView(GetCondicionalMixin, APIView):
     """
     Lista as camas com um status específico.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_cama
+    modelos_versao = (Cama, Quarto, Edificio, Residente)
+    queryset = Cama.objects.all()
 
     def get(self, request, status_param, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_CAMA):
@@ -260,42 +314,283 @@ class CamasPorStatusView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class RelatorioCamasView(APIView):
+class RelatorioCamasView(GetCondicionalMixin, APIView):
     """
     Retorna um relatório sobre o total de camas, livres e ocupadas.
     """
     permission_classes = [IsAuthenticated, DjangoModelPermissions] # Adicione permissão de modelo para view_cama
+    modelos_versao = (Edificio,)
+    queryset = Cama.objects.all()
 
     def get(self, request, *args, **kwargs):
         if not request.user.has_perm(PERM_VIEW_CAMA):
             return Response({'detail': 'Você não tem permissão para ver o relatório de camas.'}, status=status.HTTP_403_FORBIDDEN)
-        total_camas = Cama.objects.count()
-        camas_livres = Cama.objects.filter(residente__isnull=True).count()
-        camas_ocupadas = total_camas - camas_livres
-        return Response({
-            'totalCamas': total_camas,
-            'camasLivres': camas_livres,
-            'camasOcupadas': camas_ocupadas,
-        }, status=status.HTTP_200_OK)
+        return Response(agregados.ocupacao_camas(), status=status.HTTP_200_OK)
+
+
+class ReservarCamaView(APIView):
+    """
+    Reserva uma cama por tempo limitado (RESERVA_CAMA_DURACAO segundos).
+    Devolve o token a usar para confirmar ou libertar a reserva.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if not request.user.has_perm(PERM_CHANGE_CAMA):
+            return Response({'detail': 'Você não tem permissão para reservar camas.'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            token, expira_em = reservas.reservar(pk, request.user)
+        except reservas.ReservaIndisponivel as e:
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'token': token, 'expiraEm': expira_em}, status=status.HTTP_201_CREATED)
+
+
+class ConfirmarReservaCamaView(APIView):
+    """
+    Atribui a cama reservada a um residente: {"token": "...", "residente": id}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if not request.user.has_perm(PERM_CHANGE_CAMA):
+            return Response({'detail': 'Você não tem permissão para atribuir camas.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = ConfirmacaoReservaSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        residente = get_object_or_404(Residente, pk=serializer.validated_data['residente'])
+        try:
+            reservas.confirmar(pk, serializer.validated_data['token'], residente)
+        except reservas.ReservaIndisponivel:
+            return Response({'detail': 'A reserva não existe ou já expirou.'}, status=status.HTTP_409_CONFLICT)
+        cama = Cama.objects.select_related('quarto__edificio', 'residente').get(pk=pk)
+        return Response(CamaSerializer(cama).data, status=status.HTTP_200_OK)
+
+
+class LibertarReservaCamaView(APIView):
+    """
+    Cancela uma reserva antes de expirar: {"token": "..."}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if not request.user.has_perm(PERM_CHANGE_CAMA):
+            return Response({'detail': 'Você não tem permissão para libertar reservas.'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = LibertacaoReservaSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            reservas.libertar(pk, serializer.validated_data['token'])
+        except reservas.ReservaIndisponivel:
+            return Response({'detail': 'A reserva não existe.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 # ----- RESIDÊNCIAS -----
 
-class ListaResidenciasAPIView(generics.ListCreateAPIView):
+class ListaResidenciasAPIView(GetCondicionalMixin, generics.ListCreateAPIView):
     """
     Lista todas as residências e permite a criação de novas.
+    Filtros: ?edificio=, ?edificio__in=.
     Requer permissão de visualização (GET) e adição (POST) de residência.
     """
-    queryset = ResidenciaCore.objects.all()
+    queryset = ResidenciaCore.objects.select_related('edificio')
     serializer_class = ResidenciaCoreSerializer
     permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (ResidenciaCore, Edificio)
+    filtragem = Filtragem(ResidenciaCore, {'edificio': ('exact', 'in')})
 
 
-class DetalheResidenciaView(generics.RetrieveUpdateDestroyAPIView):
+class DetalheResidenciaView(GetCondicionalMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retorna, atualiza ou deleta uma residência específica.
     Requer permissões de visualização, alteração ou exclusão de residência.
     """
     queryset = ResidenciaCore.objects.all()
     serializer_class = ResidenciaCoreSerializer
-    permission_classes = [IsAuthenticated, DjangoModelPermissions]
\ No newline at end of file
+    permission_classes = [IsAuthenticated, DjangoModelPermissions]
+    modelos_versao = (ResidenciaCore, Edificio)
+
+# ----- DASHBOARD -----
+
+class DashboardView(APIView):
+    """
+    Reúne os números do dashboard num único pedido: candidaturas por estado,
+    residentes por edifício e a ocupação de camas e quartos, cada um calculado
+    com uma query agrupada. Só são incluídas as secções que o utilizador tem
+    permissão para ver.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        dados = {}
+        if user.has_perm(PERM_VIEW_CANDIDATURA):
+            dados['statusCounts'] = agregados.candidaturas_por_estado()
+        if user.has_perm(PERM_VIEW_RESIDENTE):
+            dados['totalResidentes'] = agregados.total_residentes()
+            dados['residentesPorEdificio'] = agregados.residentes_por_edificio()
+        if user.has_perm(PERM_VIEW_CAMA):
+            dados['camas'] = agregados.ocupacao_camas()
+        if user.has_perm(PERM_VIEW_QUARTO):
+            dados['quartos'] = agregados.ocupacao_quartos()
+        if not dados:
+            return Response({'detail': 'Você não tem permissão para ver o dashboard.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(dados, status=status.HTTP_200_OK)
+
+
+# ----- VIEWS ASSÍNCRONAS (ASGI) -----
+# Variantes async def dos relatórios mais consultados, sobre o ORM e a cache
+# assíncronos. Devolvem o mesmo JSON que as views síncronas correspondentes.
+
+class TotalResidentesAsyncView(ViewAssincrona):
+    permissao = PERM_VIEW_RESIDENTE
+    mensagem_sem_permissao = 'Você não tem permissão para ver o total de residentes.'
+
+    async def get(self, request, *args, **kwargs):
+        return JsonResponse({'totalResidentes': await agregados.total_residentes_async()})
+
+
+class RelatorioQuartosAsyncView(ViewAssincrona):
+    permissao = PERM_VIEW_QUARTO
+    mensagem_sem_permissao = 'Você não tem permissão para ver o relatório de quartos.'
+
+    async def get(self, request, *args, **kwargs):
+        return JsonResponse(await agregados.ocupacao_quartos_async())
+
+
+class RelatorioCamasAsyncView(ViewAssincrona):
+    permissao = PERM_VIEW_CAMA
+    mensagem_sem_permissao = 'Você não tem permissão para ver o relatório de camas.'
+
+    async def get(self, request, *args, **kwargs):
+        return JsonResponse(await agregados.ocupacao_camas_async())
+
+
+class DashboardAsyncView(ViewAssincrona):
+    """
+    Variante assíncrona do DashboardView: as secções são calculadas em
+    simultâneo com asyncio.gather.
+    """
+    async def get(self, request, *args, **kwargs):
+        user = request.user
+        seccoes = {}
+        if await user.ahas_perm(PERM_VIEW_CANDIDATURA):
+            seccoes['statusCounts'] = agregados.candidaturas_por_estado_async()
+        if await user.ahas_perm(PERM_VIEW_RESIDENTE):
+            seccoes['totalResidentes'] = agregados.total_residentes_async()
+            seccoes['residentesPorEdificio'] = agregados.residentes_por_edificio_async()
+        if await user.ahas_perm(PERM_VIEW_CAMA):
+            seccoes['camas'] = agregados.ocupacao_camas_async()
+        if await user.ahas_perm(PERM_VIEW_QUARTO):
+            seccoes['quartos'] = agregados.ocupacao_quartos_async()
+        if not seccoes:
+            return JsonResponse({'detail': 'Você não tem permissão para ver o dashboard.'}, status=status.HTTP_403_FORBIDDEN)
+        valores = await asyncio.gather(*seccoes.values())
+        return JsonResponse(dict(zip(seccoes, valores)))
+
+
+# ----- EXPORTAÇÕES -----
+
+class ExportarView(APIView):
+    """
+    Exporta candidaturas, residentes ou a ocupação das camas em CSV ou XLSX.
+    O formato é escolhido com ?formato=csv (padrão) ou ?formato=xlsx.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, tipo, *args, **kwargs):
+        exportacao = EXPORTACOES.get(tipo)
+        if exportacao is None:
+            return Response({'detail': f'Exportação desconhecida: {tipo}.'}, status=status.HTTP_404_NOT_FOUND)
+        if not request.user.has_perm(exportacao.permissao):
+            return Response({'detail': 'Você não tem permissão para exportar estes dados.'}, status=status.HTTP_403_FORBIDDEN)
+
+        formato = request.query_params.get('formato', 'csv').lower()
+        if formato == 'csv':
+            return resposta_csv(exportacao)
+        if formato == 'xlsx':
+            try:
+                return resposta_xlsx(exportacao)
+            except ImportError:
+                return Response({'detail': 'Exportação XLSX indisponível: o pacote openpyxl não está instalado.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return Response({'detail': 'Formato inválido. Use csv ou xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ImportarView(APIView):
+    """
+    Importa edifícios, quartos, camas ou residentes a partir de um ficheiro
+    CSV ou XLSX enviado no campo ``ficheiro`` (multipart). O formato vem de
+    ?formato= ou da extensão do ficheiro; com ?simular=1 as linhas são apenas
+    validadas. Devolve o número de registos criados e os erros de cada linha.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, tipo, *args, **kwargs):
+        importacao = IMPORTACOES.get(tipo)
+        if importacao is None:
+            return Response({'detail': f'Importação desconhecida: {tipo}.'}, status=status.HTTP_404_NOT_FOUND)
+        if not request.user.has_perm(importacao.permissao):
+            return Response({'detail': 'Você não tem permissão para importar estes dados.'}, status=status.HTTP_403_FORBIDDEN)
+
+        ficheiro = request.FILES.get('ficheiro')
+        if ficheiro is None:
+            return Response({'detail': 'Envie o ficheiro no campo "ficheiro".'}, status=status.HTTP_400_BAD_REQUEST)
+        formato = request.query_params.get('formato') or ficheiro.name.rpartition('.')[2]
+        simular = request.query_params.get('simular', '').lower() in ('1', 'true', 'sim')
+        try:
+            resultado = importar(tipo, ficheiro.file, formato.lower(), simular=simular)
+        except ErroImportacao as erro:
+            return Response({'detail': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        codigo = status.HTTP_201_CREATED if resultado.criados and not simular else status.HTTP_200_OK
+        return Response(resultado.como_dict(), status=codigo)
+
+
+# ----- PESQUISA -----
+
+class PesquisaView(APIView):
+    """
+    Pesquisa aproximada (?q=) em residentes, estudantes, residências e
+    candidaturas, sem distinguir acentos e tolerando erros de escrita.
+    ?tipos= limita os grupos (separados por vírgulas; por omissão todos os
+    que o utilizador pode ver) e ?limite= o número de resultados por grupo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        consulta = request.query_params.get('q', '').strip()
+        if len(''.join(pesquisa.palavras(consulta))) < 2:
+            return Response({'detail': 'Indique em ?q= pelo menos 2 letras ou algarismos.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        pedidos = [tipo.strip() for tipo in request.query_params.get('tipos', '').split(',') if tipo.strip()]
+        if desconhecidos := [tipo for tipo in pedidos if tipo not in pesquisa.TIPOS]:
+            return Response({'detail': f"Tipos desconhecidos: {', '.join(desconhecidos)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if pedidos:
+            if proibidos := [tipo for tipo in pedidos if not request.user.has_perm(pesquisa.TIPOS[tipo].permissao)]:
+                return Response({'detail': f"Você não tem permissão para pesquisar: {', '.join(proibidos)}."}, status=status.HTTP_403_FORBIDDEN)
+            tipos = list(dict.fromkeys(pedidos))
+        else:
+            tipos = [nome for nome, tipo in pesquisa.TIPOS.items() if request.user.has_perm(tipo.permissao)]
+            if not tipos:
+                return Response({'detail': 'Você não tem permissão para pesquisar.'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limite = int(request.query_params.get('limite', settings.PESQUISA_LIMITE))
+        except ValueError:
+            return Response({'detail': 'O limite deve ser um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = min(max(limite, 1), settings.PESQUISA_LIMITE_MAXIMO)
+
+        resultados = pesquisa.pesquisar(consulta, tipos, limite)
+        return Response({
+            'q': consulta,
+            'resultados': {
+                nome: [
+                    {**dados, 'relevancia': relevancia}
+                    for dados, (_, relevancia) in zip(
+                        pesquisa.TIPOS[nome].serializer([objeto for objeto, _ in encontrados], many=True).data,
+                        encontrados,
+                    )
+                ]
+                for nome, encontrados in resultados.items()
+            },
+        }, status=status.HTTP_200_OK)
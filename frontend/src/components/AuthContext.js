@@ -72,6 +72,14 @@ export const AuthProvider = ({ children }) => {
         setLoading(true);
         try {
             const response = await AuthService.login(credentials);
+            // O token devolvido com requires_2fa é temporário (pre-2FA) e só
+            // serve para o passo de verificação.
+            if (response.requires_2fa && response.access_token) {
+                localStorage.setItem("tempAccessToken", response.access_token);
+                localStorage.setItem("pre_2fa_email", credentials.email);
+                navigate("/2fa-verification");
+                return { requires2fa: true };
+            }
             if (response.access_token && response.user) {
                 AuthService.setToken(response.access_token);
                 setAuthToken(response.access_token);
@@ -80,12 +88,6 @@ export const AuthProvider = ({ children }) => {
                 setInitialRedirectDone(false); // Resetar para permitir o redirecionamento inicial após um novo login
                 return {};
             }
-            if (response.requires_2fa && response.access_token) {
-                localStorage.setItem("tempAccessToken", response.access_token);
-                localStorage.setItem("pre_2fa_email", credentials.email);
-                navigate("/2fa-verification");
-                return { requires2fa: true };
-            }
             if (response.error) {
                 return { error: `Falha no login: ${response.error}` };
             }
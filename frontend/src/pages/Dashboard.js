@@ -23,47 +23,36 @@ function Dashboard() {
         }
 
         const fetchData = async () => {
-            // Buscar candidaturas por estado
+            let dashboard;
             try {
-                const responseCandidaturas = await ReportService.getCandidaturasPorEstado();
-                // A correção está aqui: acessar responseCandidaturas.statusCounts
-                if (responseCandidaturas && Array.isArray(responseCandidaturas.statusCounts) && responseCandidaturas.statusCounts.length > 0) {
-                    const formatted = responseCandidaturas.statusCounts.map(item => ({
-                        estado: item.status, // A chave correta é 'status'
-                        quantidadeDeCandidaturas: item.count, // A chave correta é 'count'
-                    }));
-                    setCandidaturasPorEstado(formatted);
-                } else {
-                    setErroCandidaturas('Dados de candidaturas por estado não disponíveis.');
-                }
+                dashboard = await ReportService.getDashboard();
             } catch (error) {
-                console.error('Erro ao buscar candidaturas por estado:', error);
+                console.error('Erro ao buscar dados do dashboard:', error);
                 setErroCandidaturas('Erro ao buscar candidaturas por estado.');
+                setErroResidentes('Erro ao buscar dados para o gráfico de residentes.');
+                return;
             }
 
-            // Buscar residentes por edifício (para o gráfico diretamente)
-            try {
-                const responseResidentes = await ReportService.getListaEdificios();
-                if (Array.isArray(responseResidentes) && responseResidentes.length > 0) {
-                    const residentesPorEdificioData = await Promise.all(
-                        responseResidentes.map(async (edificio) => {
-                            try {
-                                const residentes = await ReportService.getResidentesPorEdificio(edificio.id);
-                                return { nome_edificio: edificio.nome, total_residentes: Array.isArray(residentes) ? residentes.length : 0 };
-                            } catch (error) {
-                                console.error(`Erro ao buscar residentes para o edifício ${edificio.nome}:`, error);
-                                return { nome_edificio: edificio.nome, total_residentes: 0 };
-                            }
-                        })
-                    );
-                    setResidentesPorEdificio(residentesPorEdificioData);
-                    setErroResidentes(null);
-                } else {
-                    setErroResidentes('Dados de edifícios não disponíveis para o gráfico de residentes.');
-                }
-            } catch (error) {
-                console.error('Erro ao buscar dados para o gráfico de residentes:', error);
-                setErroResidentes('Erro ao buscar dados para o gráfico de residentes.');
+            // Candidaturas por estado
+            if (Array.isArray(dashboard.statusCounts) && dashboard.statusCounts.length > 0) {
+                const formatted = dashboard.statusCounts.map(item => ({
+                    estado: item.status,
+                    quantidadeDeCandidaturas: item.count,
+                }));
+                setCandidaturasPorEstado(formatted);
+            } else {
+                setErroCandidaturas('Dados de candidaturas por estado não disponíveis.');
+            }
+
+            // Residentes por edifício (já contados no servidor)
+            if (Array.isArray(dashboard.residentesPorEdificio) && dashboard.residentesPorEdificio.length > 0) {
+                setResidentesPorEdificio(dashboard.residentesPorEdificio.map(edificio => ({
+                    nome_edificio: edificio.nome,
+                    total_residentes: edificio.totalResidentes,
+                })));
+                setErroResidentes(null);
+            } else {
+                setErroResidentes('Dados de edifícios não disponíveis para o gráfico de residentes.');
             }
         };
 
@@ -10,6 +10,8 @@ function TwoFactorVerification() {
     const [loading, setLoading] = useState(false);
     const [qrCode, setQrCode] = useState(null);
     const [isFetchingQR, setIsFetchingQR] = useState(true);
+    // O backend responde 409 quando o 2FA já está ativo: só se pede o código.
+    const [isAlreadyEnrolled, setIsAlreadyEnrolled] = useState(false);
     const navigate = useNavigate();
     const { verify2FA, user } = useAuth(); // Importa o estado 'user' do contexto
 
@@ -25,8 +27,12 @@ function TwoFactorVerification() {
             const data = await AuthService.generate2FA(token);
             setQrCode(data.qr_code_base64);
         } catch (err) {
-            console.error('Erro ao obter QR code:', err);
-            setError('Erro ao obter QR code.');
+            if (err?.response?.status === 409) {
+                setIsAlreadyEnrolled(true);
+            } else {
+                console.error('Erro ao obter QR code:', err);
+                setError('Erro ao obter QR code.');
+            }
         } finally {
             setIsFetchingQR(false);
         }
@@ -86,7 +92,7 @@ function TwoFactorVerification() {
 
                 {isFetchingQR ? (
                     <p className="text-center mb-6">Carregando QR Code...</p>
-                ) : qrCode ? (
+                ) : isAlreadyEnrolled ? null : qrCode ? (
                     <div className="flex justify-center mb-6">
                         <img
                             src={`data:image/png;base64,${qrCode}`}
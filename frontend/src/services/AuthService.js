@@ -77,7 +77,8 @@ const AuthService = {
         const response = await apiAccounts.post("/login/", credenciais);
         const { requires_2fa, access_token, refresh_token, user } = response.data; // Adicionado 'user'
 
-        if (access_token) setToken(access_token); // Salva access token
+        // Com requires_2fa o token é temporário; os tokens finais vêm do verify2FA.
+        if (access_token && !requires_2fa) setToken(access_token); // Salva access token
         if (refresh_token) setRefreshToken(refresh_token); // Salva refresh token
         return { requires_2fa: !!requires_2fa, access_token, user }; // Retorna 'user'
     },
@@ -1,6 +1,17 @@
 import AuthService from './AuthService';
 
 const ReportService = {
+    getDashboard: async () => {
+        try {
+            // Todos os números do dashboard num único pedido
+            const response = await AuthService.authenticatedRequest('get', 'relatorios', '/dashboard/');
+            return response.data;
+        } catch (error) {
+            console.error('Erro ao buscar dados do dashboard:', error);
+            throw error;
+        }
+    },
+
     getCandidaturasPorEstado: async () => {
         try {
             // Corrigido: 'candidaturas' e a rota correta